@@ -4,6 +4,7 @@
     const retry = require('retry'); // replace with the actual path to your retry function
     const { getAlpacaConfig } = require('../config/alpacaConfig');
     const process = require('process');
+    const { getTopSentimentAssets } = require('../services/sentimentRankingService');
   
          // Work in progress
          exports.rebalanceAIFund = async (req, res) => {
@@ -35,9 +36,7 @@
           
                       // Scoring
           
-                let scoreResults = require('../data/scoreResults.json');
-                scoreResults.sort((a, b) => b.Score - a.Score);
-                let topAssets = scoreResults.slice(0, 5);
+                let topAssets = getTopSentimentAssets({ count: 5 });
                 let topAssetsTickers = topAssets.map(asset => asset.Ticker);
           
           
@@ -39,6 +39,8 @@ const {
   normalizeExecutionModeOverride: normalizeAlpacaExecutionModeOverride,
 } = require('../services/alpacaExecutionService');
 const { runEquityBackfill, TASK_NAME: EQUITY_BACKFILL_TASK } = require('../services/equityBackfillService');
+const { writeSentimentPriorityList } = require('../services/sentimentPriorityService');
+const { getTopSentimentAssets } = require('../services/sentimentRankingService');
 const {
   addSubscriber,
   removeSubscriber,
@@ -1733,9 +1735,7 @@ exports.enableAIFund = async (req, res) => {
         }
   
         // Scoring
-        let scoreResults = require('../data/scoreResults.json');
-        scoreResults.sort((a, b) => b.Score - a.Score); // Sort by score in descending order
-        let topAssets = scoreResults.slice(0, 5); // Get the top 5 assets
+        let topAssets = getTopSentimentAssets({ count: 5 }); // Get the top 5 assets
   
         // Creating orders
         let orderList = topAssets.map(asset => {
@@ -5334,15 +5334,32 @@ exports.getNewsHeadlines = async (req, res) => {
 };
 exports.getScoreHeadlines = async (req, res) => {
   try {
-    const newsData = await News.find({});
-    const newsDataJson = JSON.stringify(newsData);
     const inputFilePath = './data/newsData.json';
     const outputFilePath = './data/sentimentResults.json';
     const output2FilePath = './data/scoreResults.json';
+    const priorityFilePath = './data/sentimentPriority.json';
+
+    // Held and strategy tickers are scored first and their scores published early,
+    // unless SENTIMENT_PRIORITY=false
+    const args = ['-u', './scripts/sentiment_claude5.py', inputFilePath, outputFilePath, output2FilePath];
+    if (process.env.SENTIMENT_NEWS_FROM_MONGO === 'true') {
+      // The script reads the headlines added since its last run straight from the News collection,
+      // which the scheduled collector fills with --mongo under the same setting
+      args.push('--from-mongo');
+    } else {
+      const newsData = await News.find({}).lean();
+      fs.writeFileSync(inputFilePath, JSON.stringify(newsData));
+    }
+    if (process.env.SENTIMENT_PRIORITY !== 'false') {
+      try {
+        await writeSentimentPriorityList({ filePath: priorityFilePath });
+        args.push('--priority', priorityFilePath);
+      } catch (err) {
+        console.warn('Could not write the sentiment priority list:', err.message);
+      }
+    }
 
-    fs.writeFileSync(inputFilePath, newsDataJson);
-
-    const python = spawn('python3', ['-u', './scripts/sentiment_claude5.py', inputFilePath, outputFilePath, output2FilePath]);
+    const python = spawn('python3', args);
 
     python.stdout.on('data', (data) => {
       const message = data.toString();
@@ -5,12 +5,18 @@ const { spawn } = require('child_process');
 const mongoose = require('mongoose');
 const { runDueRebalances, isRebalanceLocked } = require('./services/rebalanceService');
 const { refreshPolymarketProxyPool } = require('./services/polymarketProxyPoolService');
+const { writeSentimentPriorityList, DEFAULT_PRIORITY_PATH } = require('./services/sentimentPriorityService');
 
 // Schedule news_fromstockslist.py to run every day at 1:00 AM
 function scheduleNewsFromStocksList() {
   cron.schedule('0 1 * * *', () => {
     console.log('Running news_fromstockslist.py...');
-    const python = spawn('python3', ['./scripts//news_fromstockslist.py']);
+    const args = ['./scripts//news_fromstockslist.py'];
+    // Upsert the headlines into the News collection for sentiment runs that read from it
+    if (process.env.SENTIMENT_NEWS_FROM_MONGO === 'true') {
+      args.push('--mongo');
+    }
+    const python = spawn('python3', args);
     
     python.stdout.on('data', (data) => {
       console.log(`stdout: ${data}`);
@@ -28,9 +34,20 @@ function scheduleNewsFromStocksList() {
 
 // Schedule sentiment_vertex.py to run every day at 1:30 AM
 function scheduleSentimentVertex() {
-  cron.schedule('30 1 * * *', () => {
+  cron.schedule('30 1 * * *', async () => {
     console.log('Running sentiment_vertex.py...');
-    const python = spawn('python3', ['./scripts/sentiment_vertex.py']);
+    // Held and strategy tickers are scored first and their scores published early,
+    // unless SENTIMENT_PRIORITY=false
+    const args = ['./scripts/sentiment_vertex.py'];
+    try {
+      if (process.env.SENTIMENT_PRIORITY !== 'false' && mongoose.connection.readyState === 1) {
+        await writeSentimentPriorityList();
+        args.push('--priority', DEFAULT_PRIORITY_PATH);
+      }
+    } catch (error) {
+      console.warn('[Scheduler] Could not write the sentiment priority list:', error.message);
+    }
+    const python = spawn('python3', args);
     
     python.stdout.on('data', (data) => {
       console.log(`stdout: ${data}`);
@@ -0,0 +1,297 @@
+"""Benchmark and quality suite for the headline de-duplication step.
+
+Measures `remove_similar_headlines` (the reference implementation in
+news_fromstockslist.py) or any candidate with the same signature on:
+
+- synthetic corpora with a controlled duplicate rate and known ground truth
+- the recorded corpus in data/newsData.json (the reference output is the truth)
+
+For every (corpus, size, threshold) it reports headlines/s, peak memory and
+precision/recall of the removed set, both against the ground truth (synthetic
+corpora only) and against the reference implementation at the same threshold.
+
+Usage:
+    python3 bench_dedup.py
+    python3 bench_dedup.py --sizes 200 1000 5000 --thresholds 0.5 0.6 0.7
+    python3 bench_dedup.py --candidate my_module:remove_similar_headlines
+    python3 bench_dedup.py --output ../data/benchDedup.json --compare ../data/benchDedup.baseline.json
+"""
+
+import argparse
+import datetime
+import importlib
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from news_fromstockslist import remove_similar_headlines
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RECORDED_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'newsData.json')
+
+SYNTHETIC_TICKERS = ['AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL', 'META', 'TSLA', 'AMD', 'NFLX', 'JPM']
+
+SUBJECTS = ['shares', 'stock', 'the company', 'investors', 'analysts', 'the chipmaker', 'the board', 'Wall Street']
+VERBS = ['jump', 'slide', 'rally', 'plunge', 'climb', 'tumble', 'surge', 'stall', 'rebound', 'sink']
+OBJECTS = [
+    'after earnings beat', 'on guidance cut', 'ahead of product launch', 'as revenue misses estimates',
+    'after analyst upgrade', 'on antitrust probe', 'amid supply chain worries', 'after record quarter',
+    'on buyback announcement', 'as CEO steps down', 'after dividend hike', 'on weak China demand',
+]
+QUALIFIERS = ['', ' in early trading', ' despite market slump', ' for third straight day', ' to all-time high']
+OUTLETS = ['Reuters', 'Bloomberg', 'CNBC', 'MarketWatch', 'Yahoo Finance', 'Barron\'s', 'Motley Fool']
+
+
+def make_headline(rng, ticker):
+    """Build one random, realistic-looking headline for a ticker."""
+    return '{} {} {} {}%{} {}'.format(
+        ticker,
+        rng.choice(SUBJECTS),
+        rng.choice(VERBS),
+        rng.randint(1, 25),
+        rng.choice(QUALIFIERS),
+        rng.choice(OBJECTS),
+    )
+
+
+def perturb_headline(rng, headline):
+    """Rewrite a headline the way a syndicating outlet would."""
+    words = headline.split(' ')
+    edit = rng.random()
+    if edit < 0.3:
+        return f"{headline} - {rng.choice(OUTLETS)}"
+    if edit < 0.5 and len(words) > 4:
+        del words[rng.randrange(1, len(words))]
+        return ' '.join(words)
+    if edit < 0.7:
+        i = rng.randrange(len(words) - 1)
+        words[i], words[i + 1] = words[i + 1], words[i]
+        return ' '.join(words)
+    if edit < 0.85:
+        return headline.upper() if rng.random() < 0.2 else headline.replace(' ', '  ', 1)
+    chars = list(headline)
+    for _ in range(rng.randint(1, 3)):
+        chars[rng.randrange(len(chars))] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    return ''.join(chars)
+
+
+def make_synthetic_corpus(size, duplicate_rate=0.3, tickers=None, days=3, seed=0):
+    """Build a corpus of `size` articles where `duplicate_rate` of them copy an earlier story.
+
+    Returns (news, duplicate_ids): `duplicate_ids` is the ground truth set of
+    article Ids that a perfect de-duplicator would remove. Duplicates always share
+    ticker and day with their original, since that is the scope of the reference.
+    """
+    rng = random.Random(seed)
+    tickers = tickers or SYNTHETIC_TICKERS
+    start = datetime.datetime(2023, 7, 10, 9, 0, 0)
+    news = []
+    originals = []
+    duplicate_ids = set()
+    for i in range(size):
+        if originals and rng.random() < duplicate_rate:
+            source = rng.choice(originals)
+            headline = perturb_headline(rng, source['News headline'])
+            ticker = source['Ticker']
+            date = source['Date'] + datetime.timedelta(minutes=rng.randint(1, 120))
+            if date.date() != source['Date'].date():
+                date = source['Date']
+            duplicate_ids.add(f'syn-{i}')
+        else:
+            ticker = rng.choice(tickers)
+            headline = make_headline(rng, ticker)
+            date = start + datetime.timedelta(days=rng.randrange(days), minutes=rng.randint(0, 420))
+        article = {
+            'Id': f'syn-{i}',
+            'News headline': headline,
+            'Date': date,
+            'Ticker': ticker,
+            'Stock name': ticker,
+            'Source': 'synthetic',
+        }
+        if f'syn-{i}' not in duplicate_ids:
+            originals.append(article)
+        news.append(article)
+    return news, duplicate_ids
+
+
+def load_recorded_corpus(path=DEFAULT_RECORDED_PATH, size=None):
+    """Load recorded articles from newsData.json with their dates parsed."""
+    with open(path) as f:
+        records = json.load(f)
+    news = []
+    for record in records:
+        headline = record.get('News headline')
+        date = record.get('Date')
+        if not headline or not date or not record.get('Ticker'):
+            continue
+        article = dict(record)
+        article['Id'] = record.get('Id') or record.get('newsId') or record.get('_id')
+        article['Date'] = datetime.datetime.fromisoformat(str(date).replace('Z', '+00:00'))
+        news.append(article)
+    if size is not None:
+        news = news[:size]
+    return news
+
+
+def load_candidate(spec):
+    """Resolve a `module:function` spec to a callable."""
+    module_name, _, function_name = spec.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name or 'remove_similar_headlines')
+
+
+def removed_ids(news, kept):
+    """Return the Ids of the articles a de-duplicator dropped."""
+    kept_ids = {article['Id'] for article in kept}
+    return {article['Id'] for article in news if article['Id'] not in kept_ids}
+
+
+def precision_recall(predicted, expected):
+    """Precision, recall and F1 of a predicted removed set against an expected one."""
+    true_positives = len(predicted & expected)
+    precision = true_positives / len(predicted) if predicted else 1.0
+    recall = true_positives / len(expected) if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': round(precision, 4), 'recall': round(recall, 4), 'f1': round(f1, 4)}
+
+
+def measure(dedup, news, threshold, repeat=3):
+    """Time `dedup` (best of `repeat`) and measure its peak traced memory in a separate run."""
+    best = None
+    kept = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        kept = dedup(list(news), similarity_threshold=threshold)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    dedup(list(news), similarity_threshold=threshold)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return kept, {
+        'seconds': round(best, 6),
+        'headlines_per_s': round(len(news) / best, 1) if best else None,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_case(corpus, news, threshold, candidate, repeat, truth=None):
+    """Benchmark the reference and the candidate on one corpus at one threshold."""
+    reference_kept, reference_stats = measure(remove_similar_headlines, news, threshold, repeat)
+    reference_removed = removed_ids(news, reference_kept)
+    result = {
+        'corpus': corpus,
+        'size': len(news),
+        'threshold': threshold,
+        'reference': dict(reference_stats, removed=len(reference_removed)),
+    }
+    if truth is not None:
+        result['reference']['vs_truth'] = precision_recall(reference_removed, truth)
+        result['true_duplicates'] = len(truth)
+
+    if candidate is not remove_similar_headlines:
+        candidate_kept, candidate_stats = measure(candidate, news, threshold, repeat)
+        candidate_removed = removed_ids(news, candidate_kept)
+        result['candidate'] = dict(candidate_stats, removed=len(candidate_removed))
+        result['candidate']['vs_reference'] = precision_recall(candidate_removed, reference_removed)
+        if truth is not None:
+            result['candidate']['vs_truth'] = precision_recall(candidate_removed, truth)
+        if reference_stats['seconds']:
+            result['candidate']['speedup'] = round(reference_stats['seconds'] / candidate_stats['seconds'], 2)
+    return result
+
+
+def compare_reports(current, baseline, tolerance):
+    """List regressions of `current` against `baseline` (slower throughput or lower F1)."""
+    def key(case):
+        return (case['corpus'], case['size'], case['threshold'])
+
+    baseline_cases = {key(case): case for case in baseline.get('results', [])}
+    regressions = []
+    for case in current['results']:
+        previous = baseline_cases.get(key(case))
+        if previous is None:
+            continue
+        for impl in ('reference', 'candidate'):
+            now, before = case.get(impl), previous.get(impl)
+            if not now or not before:
+                continue
+            if before.get('headlines_per_s') and now['headlines_per_s'] < before['headlines_per_s'] * (1 - tolerance):
+                regressions.append(f"{key(case)} {impl}: {now['headlines_per_s']} headlines/s (was {before['headlines_per_s']})")
+            for scope in ('vs_truth', 'vs_reference'):
+                if scope in now and scope in before and now[scope]['f1'] < before[scope]['f1'] - tolerance:
+                    regressions.append(f"{key(case)} {impl} {scope}: F1 {now[scope]['f1']} (was {before[scope]['f1']})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark headline de-duplication speed and quality.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 2000], help='Synthetic corpus sizes.')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.5, 0.6, 0.7], help='Similarity thresholds.')
+    parser.add_argument('--duplicate-rate', type=float, default=0.3, help='Share of synthetic articles that copy an earlier story.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic corpora.')
+    parser.add_argument('--recorded', default=DEFAULT_RECORDED_PATH, help='Recorded corpus to replay ("" to skip).')
+    parser.add_argument('--candidate', default=None, help='Candidate implementation as module:function.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (best is kept).')
+    parser.add_argument('--output', default=None, help='Write the JSON report here instead of stdout.')
+    parser.add_argument('--compare', default=None, help='Baseline report to check for regressions.')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative slowdown / absolute F1 drop.')
+    args = parser.parse_args()
+
+    # remove_similar_headlines logs on every call
+    logging.getLogger().setLevel(logging.WARNING)
+
+    candidate = load_candidate(args.candidate) if args.candidate else remove_similar_headlines
+
+    results = []
+    for size in args.sizes:
+        news, truth = make_synthetic_corpus(size, args.duplicate_rate, seed=args.seed)
+        for threshold in args.thresholds:
+            print(f"synthetic size={size} threshold={threshold}", file=sys.stderr)
+            results.append(run_case('synthetic', news, threshold, candidate, args.repeat, truth))
+
+    if args.recorded and os.path.exists(args.recorded):
+        recorded = load_recorded_corpus(args.recorded)
+        for size in sorted({min(size, len(recorded)) for size in args.sizes} | {len(recorded)}):
+            for threshold in args.thresholds:
+                print(f"recorded size={size} threshold={threshold}", file=sys.stderr)
+                results.append(run_case('recorded', recorded[:size], threshold, candidate, args.repeat))
+
+    report = {
+        'generated_at': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'candidate': args.candidate or 'news_fromstockslist:remove_similar_headlines',
+        'duplicate_rate': args.duplicate_rate,
+        'seed': args.seed,
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print(f"Benchmark report saved to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
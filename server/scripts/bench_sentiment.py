@@ -0,0 +1,179 @@
+"""End-to-end benchmark of the sentiment pipelines against the LLM stand-in.
+
+Starts llm_standin.py in a subprocess with the requested behavior (latency
+distribution, 429 rate, capacity, malformed replies, replay file), then runs
+sentiment_claude5 and/or sentiment_vertex over the recorded corpus in
+data/newsData.json, cycled to the requested number of headlines. Nothing
+leaves the machine and no credentials are needed.
+
+For every pipeline it reports headlines/s, p50/p99 request latency, requests,
+retries, throttled and failed requests, tokens and estimated cost (see
+sentiment_metrics) and peak memory, as JSON (same layout as
+bench_dedup.py).
+
+Usage:
+    python3 bench_sentiment.py
+    python3 bench_sentiment.py --headlines 5000 --latency lognormal:0.8,0.5 --error-rate 0.05 --capacity 16
+    python3 bench_sentiment.py --pipelines vertex --malformed-rate 0.1 --output ../data/benchSentiment.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from llm_standin import StandinProvider
+from request_driver import DEFAULT_MAX_CONCURRENCY, AIMDLimiter, RequestDriver
+from sentiment_metrics import CallRecorder, instrument
+import sentiment_claude5
+import sentiment_vertex
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RECORDED_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'newsData.json')
+
+PIPELINES = {
+    'claude5': (sentiment_claude5, 'claude'),
+    'vertex': (sentiment_vertex, 'vertex'),
+}
+
+
+def load_corpus(path, size):
+    """Return `size` articles from the recorded corpus, cycled with fresh ids if it is too short."""
+    with open(path) as f:
+        recorded = [article for article in json.load(f) if article.get('News headline')]
+    news = []
+    for i in range(size):
+        article = dict(recorded[i % len(recorded)])
+        if i >= len(recorded):
+            article['Id'] = f"{article.get('Id')}-{i // len(recorded)}"
+        news.append(article)
+    return news
+
+
+def start_standin(args):
+    """Start the stand-in on a free port; returns (process, base url)."""
+    command = [sys.executable, '-u', os.path.join(SCRIPT_DIR, 'llm_standin.py'), '--port', '0',
+               '--latency', args.latency, '--error-rate', str(args.error_rate),
+               '--retry-after', str(args.retry_after), '--malformed-rate', str(args.malformed_rate),
+               '--seed', str(args.seed)]
+    if args.capacity:
+        command += ['--capacity', str(args.capacity)]
+    if args.replay:
+        command += ['--replay', args.replay]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('Serving on '):
+        process.kill()
+        raise RuntimeError(f"Stand-in did not start: {line!r}")
+    return process, line.split('Serving on ', 1)[1].strip()
+
+
+def run_pipeline(name, news, base_url, args):
+    """Run one pipeline over `news` against the stand-in and return its measurements."""
+    module, flavor = PIPELINES[name]
+    recorder = CallRecorder()
+    analyzer = module.SentimentAnalyzer(provider=instrument(StandinProvider(base_url, flavor, timeout=args.deadline), recorder, args.deadline))
+    driver = RequestDriver(AIMDLimiter(maximum=args.max_concurrency), backoff=args.backoff)
+    batch_size = args.batch_size or module.DEFAULT_BATCH_SIZE
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = analyzer.process_news([dict(article) for article in news], story_threshold=args.story_threshold,
+                                    batch_size=batch_size, driver=driver, fan_in=args.fan_in)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    driver.close()
+
+    calls = recorder.summary()
+    return {
+        'pipeline': name,
+        'headlines': len(news),
+        'classified': len(results),
+        'batch_size': batch_size,
+        'fan_in': args.fan_in,
+        'seconds': round(elapsed, 4),
+        'headlines_per_second': round(len(news) / elapsed, 2) if elapsed else None,
+        'requests': calls['calls'],
+        'retries': driver.retries,
+        'throttled': calls['outcomes'].get('throttled', 0),
+        'failed': calls['outcomes'].get('error', 0) + calls['outcomes'].get('timeout', 0),
+        'latency_p50': calls['latency_p50'],
+        'latency_p99': calls['latency_p99'],
+        'prompt_tokens': calls['prompt_tokens'],
+        'completion_tokens': calls['completion_tokens'],
+        'estimated_cost': calls['estimated_cost'],
+        'final_concurrency_limit': int(driver.limiter.limit),
+        'peak_memory_bytes': peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the sentiment pipelines against the LLM stand-in.')
+    parser.add_argument('--pipelines', nargs='+', choices=sorted(PIPELINES), default=sorted(PIPELINES))
+    parser.add_argument('--headlines', type=int, default=2000, help='Headlines per run (the corpus is cycled).')
+    parser.add_argument('--recorded', default=DEFAULT_RECORDED_PATH, help='Recorded corpus to replay.')
+    parser.add_argument('--batch-size', type=int, default=None, help="Headlines per request (default: the pipeline's).")
+    parser.add_argument('--story-threshold', type=float, default=0,
+                        help='Story clustering threshold (0 sends every headline).')
+    parser.add_argument('--no-fan-in', dest='fan_in', action='store_false',
+                        help='Send every copy of a headline collected for several tickers separately.')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument('--deadline', type=float, default=30.0, help='Seconds allowed per request.')
+    parser.add_argument('--backoff', type=float, default=0.2, help='Base retry backoff in seconds.')
+    parser.add_argument('--latency', default='lognormal:0.5,0.4',
+                        help='Stand-in latency: fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests refused with 429.')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='Retry-After seconds of refused requests.')
+    parser.add_argument('--capacity', type=int, default=None, help='Concurrent requests the stand-in serves.')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of malformed replies.')
+    parser.add_argument('--replay', default=None, help='Replay file of recorded responses.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    news = load_corpus(args.recorded, args.headlines)
+    process, base_url = start_standin(args)
+    try:
+        results = []
+        for name in args.pipelines:
+            print(f"{name}: {len(news)} headlines against {base_url}", file=sys.stderr)
+            results.append(run_pipeline(name, news, base_url, args))
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = {
+        'generated_at': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'standin': {
+            'latency': args.latency,
+            'error_rate': args.error_rate,
+            'retry_after': args.retry_after,
+            'capacity': args.capacity,
+            'malformed_rate': args.malformed_rate,
+            'replay': args.replay,
+        },
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print(f"Benchmark report saved to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
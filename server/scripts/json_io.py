@@ -0,0 +1,86 @@
+"""JSON reading and writing shared by the scripts.
+
+- orjson is used when it is installed (several times faster on the news and
+  results files), the standard json module otherwise; both give the same output
+- output is compact unless `indent` is asked for
+- datetimes and dates are written as ISO strings, numpy scalars and arrays as
+  numbers and lists
+- files are written through a temporary file and a rename, so a reader never
+  sees half a file and a crash leaves the previous version in place
+
+Usage:
+    news = load_json('../data/newsData.json')      # None if it cannot be read
+    save_json('../data/scoreResults.json', results)
+    write_json_atomic(path, data)                   # raises on failure
+"""
+
+import datetime
+import json
+import logging
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    if hasattr(o, 'tolist'):  # numpy scalars and arrays
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(data, indent=False):
+    """Serialize to a JSON string, compact or indented by 2."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, default=_default, option=option).decode()
+    if indent:
+        return json.dumps(data, default=_default, ensure_ascii=False, indent=2)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def read_json(path):
+    """Load a JSON file; errors are raised."""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def write_json_atomic(path, data, indent=False):
+    """Write JSON through a temporary file and a rename, so readers never see half a file."""
+    # One temporary file per process, so concurrent writers do not clobber each other's
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(dumps(data, indent))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def load_json(path):
+    """Load a JSON file, or return None (and log why) if it cannot be read."""
+    try:
+        return read_json(path)
+    except Exception as e:
+        logging.info(f"Error loading JSON: {e}")
+        return None
+
+
+def save_json(path, data, indent=False):
+    """Save data to a JSON file atomically, logging failures."""
+    try:
+        write_json_atomic(path, data, indent)
+    except Exception as e:
+        logging.info(f"Error saving JSON: {e}")
@@ -0,0 +1,342 @@
+"""Local stand-in for the LLM providers, for benchmarks and offline runs.
+
+A small HTTP server speaking just enough of each provider's API:
+
+    POST /v1/complete                   Anthropic text completions ({"completion": ...})
+    POST /v1/chat/completions           OpenAI chat completions
+    POST /.../models/<model>:predict    Vertex AI text models ({"predictions": [...]})
+
+Answers come from a replay file of recorded responses when the prompt is known,
+and are synthesized otherwise: batch prompts (see sentiment_batch, sentiment_fanin) get one
+well-formed line per headline, single-headline prompts get a verdict and a
+sentence. The verdict of a headline is a hash of its text, so runs are
+reproducible.
+
+The server can misbehave on purpose: latency drawn from a distribution, a share
+of requests refused with 429 and Retry-After, a capacity above which concurrent
+requests are refused, and a share of malformed replies (garbage, or batch
+answers with lines missing).
+
+Usage:
+    python3 llm_standin.py --port 8765 --latency lognormal:0.8,0.5 --error-rate 0.05 --capacity 16
+
+and point a StandinProvider at it:
+    SentimentAnalyzer(provider=StandinProvider('http://127.0.0.1:8765', 'claude'))
+
+RecordingProvider wraps a real provider and appends its answers to a replay
+file, so that real responses can be served back later.
+"""
+
+import argparse
+import hashlib
+import http.server
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+import requests
+
+
+DEFAULT_PORT = 8765
+DEFAULT_RETRY_AFTER = 1.0
+
+BATCH_LINE_RE = re.compile(r'^(\d+)\|([0-9a-f]{8})\|([^|]*)\|(.*)$')
+VERDICTS = ('YES', 'NO', 'UNKNOWN')
+# Anthropic's legacy completion format, as anthropic.HUMAN_PROMPT and AI_PROMPT build it
+HUMAN_PROMPT = '\n\nHuman:'
+AI_PROMPT = '\n\nAssistant:'
+
+
+def prompt_hash(prompt):
+    """Key of a prompt in a replay file."""
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+def load_replay(path):
+    """Return {prompt hash: completion} from a replay file (one JSON object per line)."""
+    recorded = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recorded[entry['prompt_hash']] = entry['completion']
+    return recorded
+
+
+def parse_latency(spec):
+    """Return a function drawing a latency in seconds from a spec.
+
+    Specs: "fixed:SECONDS", "uniform:LOW,HIGH", "lognormal:MEDIAN,SIGMA".
+    """
+    kind, _, values = spec.partition(':')
+    numbers = [float(value) for value in values.split(',') if value]
+    if kind == 'fixed' and len(numbers) == 1:
+        return lambda rng: numbers[0]
+    if kind == 'uniform' and len(numbers) == 2:
+        return lambda rng: rng.uniform(*numbers)
+    if kind == 'lognormal' and len(numbers) == 2:
+        median, sigma = numbers
+        return lambda rng: median * rng.lognormvariate(0.0, sigma)
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def synthetic_verdict(headline):
+    """Deterministic verdict for a headline."""
+    return VERDICTS[int(hashlib.sha1(headline.encode()).hexdigest(), 16) % len(VERDICTS)]
+
+
+def synthesize_answer(prompt):
+    """Answer a sentiment prompt the way a cooperative model would."""
+    lines = [BATCH_LINE_RE.match(line.strip()) for line in prompt.splitlines()]
+    lines = [match for match in lines if match]
+    if lines and 'number|tag|ticker|answer|sentence' in prompt:
+        # Fan-in prompt (see sentiment_fanin): one answer line per ticker
+        return '\n'.join(
+            f"{number}|{tag}|{ticker}|{synthetic_verdict(f'{ticker} {headline}')}|Stand-in verdict for {ticker}."
+            for number, tag, tickers, headline in (match.groups() for match in lines)
+            for ticker in tickers.split(',')
+        )
+    if lines:
+        return '\n'.join(
+            f"{number}|{tag}|{synthetic_verdict(headline)}|Stand-in verdict for {ticker}."
+            for number, tag, ticker, headline in (match.groups() for match in lines)
+        )
+    return f"{synthetic_verdict(prompt)}\nStand-in verdict."
+
+
+class StandinBehavior:
+    """What the stand-in answers and how badly it behaves."""
+
+    def __init__(self, latency='fixed:0', error_rate=0.0, retry_after=DEFAULT_RETRY_AFTER, capacity=None,
+                 malformed_rate=0.0, replay=None, seed=None):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.capacity = capacity
+        self.malformed_rate = malformed_rate
+        self.replay = replay or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'throttled': 0, 'malformed': 0, 'replayed': 0}
+
+    def admit(self):
+        """Return True if a request may be served, False to refuse it with 429."""
+        with self.lock:
+            self.stats['requests'] += 1
+            if (self.capacity and self.in_flight >= self.capacity) or self.random.random() < self.error_rate:
+                self.stats['throttled'] += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def done(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def answer(self, prompt):
+        """Sleep for a drawn latency and return the completion for `prompt`."""
+        with self.lock:
+            delay = self.latency(self.random)
+            malformed = self.random.random() < self.malformed_rate
+            recorded = self.replay.get(prompt_hash(prompt))
+            if recorded is not None:
+                self.stats['replayed'] += 1
+            if malformed:
+                self.stats['malformed'] += 1
+        time.sleep(max(0.0, delay))
+        completion = recorded if recorded is not None else synthesize_answer(prompt)
+        if malformed:
+            lines = completion.splitlines()
+            if len(lines) > 1:
+                # Drop half of the answer lines
+                return '\n'.join(lines[::2])
+            return 'I am sorry, I cannot help with that.'
+        return completion
+
+
+def claude_prompt(text):
+    """The wire prompt of a text sent to Anthropic's completion API."""
+    return f'{HUMAN_PROMPT}{text} {AI_PROMPT}'
+
+
+def claude_text(prompt):
+    """The text of a wire prompt built by claude_prompt (the prompt itself if it is not wrapped)."""
+    suffix = f' {AI_PROMPT}'
+    if prompt.startswith(HUMAN_PROMPT) and prompt.endswith(suffix):
+        return prompt[len(HUMAN_PROMPT):-len(suffix)]
+    return prompt
+
+
+def _prompt_and_reply(path, body):
+    """Extract the prompt of a request and build the reply for its API.
+
+    The prompt is the text the provider was given, as RecordingProvider hashes it.
+    """
+    if path.endswith('/v1/complete'):
+        prompt = claude_text(body.get('prompt', ''))
+        return prompt, lambda completion: {'completion': completion, 'stop_reason': 'stop_sequence'}
+    if path.endswith('/v1/chat/completions'):
+        prompt = '\n'.join(message.get('content', '') for message in body.get('messages', []))
+        return prompt, lambda completion: {
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': completion}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(completion) // 4},
+        }
+    if path.endswith(':predict'):
+        prompt = '\n'.join(instance.get('content', '') for instance in body.get('instances', []))
+        return prompt, lambda completion: {'predictions': [{'content': completion}]}
+    return None, None
+
+
+class StandinHandler(http.server.BaseHTTPRequestHandler):
+    behavior = None
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        except ValueError:
+            self._send(400, {'error': 'invalid JSON'})
+            return
+        prompt, reply = _prompt_and_reply(self.path, body)
+        if prompt is None:
+            self._send(404, {'error': f'unknown endpoint {self.path}'})
+            return
+        if not self.behavior.admit():
+            self._send(429, {'error': 'rate limited'}, {'Retry-After': str(self.behavior.retry_after)})
+            return
+        try:
+            completion = self.behavior.answer(prompt)
+        finally:
+            self.behavior.done()
+        self._send(200, reply(completion))
+
+    def do_GET(self):
+        # Counters, for the benchmark report
+        with self.behavior.lock:
+            self._send(200, dict(self.behavior.stats))
+
+
+def make_server(behavior, host='127.0.0.1', port=DEFAULT_PORT):
+    """Return a threaded HTTP server answering with `behavior` (port 0 picks a free one)."""
+    handler = type('Handler', (StandinHandler,), {'behavior': behavior})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class StandinProvider:
+    """sentiment_providers-compatible client for the stand-in (or any API-compatible server).
+
+    HTTP errors are raised as requests.HTTPError, whose response carries the
+    status code and Retry-After header the request driver looks for.
+    """
+
+    max_output_tokens = None
+
+    def __init__(self, base_url, flavor='claude', model=None, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.name = flavor
+        self.model = model or {'claude': 'claude-v1', 'openai': 'gpt-3.5-turbo', 'vertex': 'text-bison@001'}[flavor]
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.usage = threading.local()
+        if flavor == 'vertex':
+            self.max_output_tokens = 1024
+
+    def _request(self, text, max_tokens):
+        if self.name == 'claude':
+            url = f'{self.base_url}/v1/complete'
+            body = {'prompt': claude_prompt(text), 'model': self.model,
+                    'max_tokens_to_sample': max_tokens or 256, 'temperature': 0}
+            return url, body, lambda reply: reply['completion']
+        if self.name == 'openai':
+            url = f'{self.base_url}/v1/chat/completions'
+            body = {'model': self.model, 'messages': [{'role': 'user', 'content': text}],
+                    'max_tokens': max_tokens or 256, 'temperature': 0}
+            return url, body, lambda reply: reply['choices'][0]['message']['content']
+        url = f'{self.base_url}/v1/models/{self.model}:predict'
+        body = {'instances': [{'content': text}], 'parameters': {'maxOutputTokens': max_tokens or 256}}
+        return url, body, lambda reply: reply['predictions'][0]['content']
+
+    def complete(self, text, max_tokens=None):
+        url, body, extract = self._request(text, max_tokens)
+        response = self.session.post(url, json=body, timeout=self.timeout)
+        response.raise_for_status()
+        reply = response.json()
+        usage = reply.get('usage')
+        self.usage.tokens = (usage['prompt_tokens'], usage['completion_tokens']) if usage else None
+        return extract(reply) or None
+
+    def last_usage(self):
+        """(prompt tokens, completion tokens) of this thread's last call, if the API reported them."""
+        return getattr(self.usage, 'tokens', None)
+
+
+class RecordingProvider:
+    """Wrap a provider and append every answer it gives to a replay file."""
+
+    def __init__(self, provider, path):
+        self.provider = provider
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def complete(self, text, max_tokens=None):
+        completion = self.provider.complete(text, max_tokens)
+        if completion is not None:
+            with self.lock, open(self.path, 'a') as f:
+                f.write(json.dumps({'prompt_hash': prompt_hash(text), 'completion': completion}) + '\n')
+        return completion
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve stand-in LLM provider endpoints.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on (0 picks a free one).')
+    parser.add_argument('--latency', default='fixed:0',
+                        help='Latency distribution: fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests refused with 429.')
+    parser.add_argument('--retry-after', type=float, default=DEFAULT_RETRY_AFTER,
+                        help='Retry-After seconds sent with 429 answers.')
+    parser.add_argument('--capacity', type=int, default=None,
+                        help='Concurrent requests served; any more are refused with 429.')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of replies that are malformed.')
+    parser.add_argument('--replay', default=None, help='Replay file of recorded responses.')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    behavior = StandinBehavior(args.latency, args.error_rate, args.retry_after, args.capacity,
+                               args.malformed_rate, load_replay(args.replay) if args.replay else None, args.seed)
+    server = make_server(behavior, args.host, args.port)
+    host, port = server.server_address[:2]
+    # The benchmark reads this line to find the port
+    print(f"Serving on http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Local lexicon sentiment engine: a zero-API fast tier for headline sentiment.
+
+Scores headlines with the VADER lexicon plus a finance-specific overlay
+("beats", "downgrade", "guidance cut", ...). The lexicon is loaded once per
+process and a whole list of headlines is scored in one pass with array
+operations: tokens are flattened, looked up, adjusted for boosters and
+negations, then summed per headline. The result uses the same YES/NO/UNKNOWN
+schema as sentiment_claude5, so it can stand in for an LLM analyzer.
+
+This replaces archive/stocksight.sentiment_analysis, which built a new VADER
+analyzer and a TextBlob for every single string.
+
+Usage:
+    results = LocalSentimentAnalyzer().process_news(news)
+
+    python3 local_sentiment.py ../data/newsData.json ../data/sentimentResults.json ../data/scoreResults.json
+"""
+
+import argparse
+import functools
+import logging
+import os
+import re
+
+import numpy as np
+import vaderSentiment
+
+from json_io import save_json
+from news_columns import load_records
+from sentiment_stream import ScoreAccumulator
+
+
+VADER_LEXICON_PATH = os.path.join(os.path.dirname(vaderSentiment.__file__), 'vader_lexicon.txt')
+
+# Valences on the VADER scale (-4 .. 4); they override the general-purpose lexicon
+FINANCE_LEXICON = {
+    'beat': 2.0, 'beats': 2.0, 'tops': 1.8, 'exceeds': 1.8, 'outperform': 1.8, 'outperforms': 1.8,
+    'upgrade': 2.3, 'upgrades': 2.3, 'upgraded': 2.3, 'bullish': 2.2, 'buy': 1.2, 'overweight': 1.5,
+    'surge': 2.4, 'surges': 2.4, 'soar': 2.6, 'soars': 2.6, 'jump': 1.8, 'jumps': 1.8, 'rally': 2.0,
+    'rallies': 2.0, 'climb': 1.4, 'climbs': 1.4, 'rebound': 1.6, 'rebounds': 1.6, 'gains': 1.8,
+    'record': 1.2, 'buyback': 1.6, 'dividend': 1.0, 'raises': 1.2, 'raised': 1.2, 'profit': 1.5,
+    'profitable': 1.8, 'approval': 1.8, 'approved': 1.8, 'breakthrough': 2.2, 'expands': 1.2,
+    'miss': -2.0, 'misses': -2.0, 'missed': -2.0, 'underperform': -1.8, 'underperforms': -1.8,
+    'downgrade': -2.3, 'downgrades': -2.3, 'downgraded': -2.3, 'bearish': -2.2, 'sell': -1.2,
+    'underweight': -1.5, 'plunge': -2.8, 'plunges': -2.8, 'tumble': -2.4, 'tumbles': -2.4,
+    'slump': -2.2, 'slumps': -2.2, 'sink': -2.0, 'sinks': -2.0, 'slide': -1.6, 'slides': -1.6,
+    'drop': -1.5, 'drops': -1.5, 'falls': -1.5, 'decline': -1.4, 'declines': -1.4, 'losses': -1.8,
+    'layoffs': -2.0, 'lawsuit': -1.8, 'probe': -1.5, 'investigation': -1.5, 'antitrust': -1.2,
+    'recall': -1.8, 'bankruptcy': -3.2, 'default': -2.5, 'fraud': -3.0, 'warning': -1.6, 'halts': -1.8,
+    'delay': -1.2, 'delays': -1.2, 'shortfall': -2.0, 'writedown': -2.2, 'dilution': -1.8,
+}
+FINANCE_PHRASES = {
+    'guidance cut': -2.6, 'cuts guidance': -2.6, 'lowers guidance': -2.4, 'raises guidance': 2.4,
+    'price target': 0.0, 'target raised': 1.8, 'target cut': -1.8, 'all-time high': 2.0,
+    'new high': 1.8, 'new low': -1.8, 'short seller': -1.6, 'profit warning': -2.8,
+}
+NEGATIONS = {
+    'not', 'no', 'never', 'nor', 'neither', 'without', 'cannot', "can't", "isn't", "aren't", "wasn't",
+    "weren't", "don't", "doesn't", "didn't", "won't", "wouldn't", "hasn't", "haven't", 'fails', 'failed',
+}
+BOOSTERS = {
+    'very': 0.293, 'sharply': 0.293, 'significantly': 0.293, 'hugely': 0.293, 'massive': 0.293,
+    'record': 0.293, 'slightly': -0.293, 'marginally': -0.293, 'modestly': -0.293,
+}
+
+# VADER constants: negation scalar, how far a negation reaches, and the compound normalization
+NEGATION_SCALAR = -0.74
+NEGATION_WINDOW = 3
+NORMALIZATION_ALPHA = 15.0
+
+DEFAULT_DECISION_THRESHOLD = 0.25
+
+TOKEN_RE = re.compile(r"[a-z]+(?:[-'][a-z]+)*|\d+(?:\.\d+)?%?")
+
+
+@functools.lru_cache(maxsize=None)
+def load_vader_lexicon(path=VADER_LEXICON_PATH):
+    """Return {token: valence} from the VADER lexicon file, read once per path and process (do not modify it)."""
+    lexicon = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) >= 2:
+                lexicon[parts[0]] = float(parts[1])
+    return lexicon
+
+
+class LocalSentimentEngine:
+    """Batched lexicon scorer. Build it once and reuse it for every headline list."""
+
+    def __init__(self, lexicon=None, finance_lexicon=FINANCE_LEXICON, phrases=FINANCE_PHRASES,
+                 threshold=DEFAULT_DECISION_THRESHOLD):
+        lexicon = dict(load_vader_lexicon() if lexicon is None else lexicon)
+        lexicon.update(finance_lexicon)
+        # Index 0 is reserved for tokens outside the lexicon
+        self.tokens = {token: i for i, token in enumerate(lexicon, start=1)}
+        self.valences = np.zeros(len(lexicon) + 1, dtype=np.float32)
+        self.valences[1:] = np.fromiter(lexicon.values(), dtype=np.float32, count=len(lexicon))
+        self.phrases = dict(phrases)
+        self.threshold = threshold
+
+    def _tokenize(self, headlines):
+        tokens = []
+        lengths = np.empty(len(headlines), dtype=np.int64)
+        for i, headline in enumerate(headlines):
+            words = TOKEN_RE.findall(str(headline or '').lower())
+            tokens.extend(words)
+            lengths[i] = len(words)
+        return tokens, lengths
+
+    def token_valences(self, headlines):
+        """Return (tokens, doc, valence): flat tokens, their headline index and adjusted valence."""
+        tokens, lengths = self._tokenize(headlines)
+        doc = np.repeat(np.arange(len(headlines)), lengths)
+        lookup = self.tokens.get
+        ids = np.fromiter((lookup(token, 0) for token in tokens), dtype=np.int64, count=len(tokens))
+        valence = self.valences[ids].astype(np.float64)
+        if not tokens:
+            return tokens, doc, valence
+
+        same_doc_next = np.zeros(len(tokens), dtype=bool)
+        same_doc_next[:-1] = doc[1:] == doc[:-1]
+
+        # Two-word phrases replace the valence of both of their words
+        for i in np.flatnonzero(same_doc_next):
+            phrase = self.phrases.get(f'{tokens[i]} {tokens[i + 1]}')
+            if phrase is not None:
+                valence[i] = phrase
+                valence[i + 1] = 0.0
+
+        # Boosters strengthen (or soften) the next word, away from zero
+        boost = np.fromiter((BOOSTERS.get(token, 0.0) for token in tokens), dtype=np.float64, count=len(tokens))
+        boosted = np.flatnonzero(same_doc_next & (boost != 0)) + 1
+        valence[boosted] += np.sign(valence[boosted]) * boost[boosted - 1]
+
+        # A negation flips the words that follow it within the window
+        negation = np.fromiter((token in NEGATIONS for token in tokens), dtype=bool, count=len(tokens))
+        negated = np.zeros(len(tokens), dtype=bool)
+        for k in range(1, NEGATION_WINDOW + 1):
+            negated[k:] |= negation[:-k] & (doc[k:] == doc[:-k])
+        valence[negated] *= NEGATION_SCALAR
+        return tokens, doc, valence
+
+    def score(self, headlines):
+        """Return the VADER-style compound score (-1 .. 1) of every headline."""
+        _, doc, valence = self.token_valences(headlines)
+        total = np.bincount(doc, weights=valence, minlength=len(headlines))
+        return total / np.sqrt(total * total + NORMALIZATION_ALPHA)
+
+    def classify(self, headlines):
+        """Return [(sentiment, description, score)] for every headline.
+
+        `score` is the compound score; its absolute value is the confidence.
+        Headlines between -threshold and +threshold are UNKNOWN.
+        """
+        headlines = list(headlines)
+        tokens, doc, valence = self.token_valences(headlines)
+        total = np.bincount(doc, weights=valence, minlength=len(headlines))
+        compound = total / np.sqrt(total * total + NORMALIZATION_ALPHA)
+
+        # Strongest word of each headline, for the description
+        strongest = {}
+        if len(tokens):
+            order = np.lexsort((-np.abs(valence), doc))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = doc[order][1:] != doc[order][:-1]
+            for position in order[first]:
+                if valence[position] != 0:
+                    strongest[doc[position]] = tokens[position]
+
+        verdicts = []
+        for i, value in enumerate(compound):
+            if value >= self.threshold:
+                sentiment = 'YES'
+            elif value <= -self.threshold:
+                sentiment = 'NO'
+            else:
+                sentiment = 'UNKNOWN'
+            word = strongest.get(i)
+            description = f"Lexicon score {value:+.2f}" + (f", driven by '{word}'." if word else '.')
+            verdicts.append((sentiment, description, float(value)))
+        return verdicts
+
+
+class LocalSentimentAnalyzer:
+    """Drop-in for the LLM SentimentAnalyzer classes, without any network access."""
+
+    def __init__(self, engine=None):
+        self.engine = engine or LocalSentimentEngine()
+
+    def classify_articles(self, articles):
+        """Return {index: (sentiment, description)} for every article."""
+        verdicts = self.engine.classify([article.get('News headline') for article in articles])
+        return {i: (sentiment, description) for i, (sentiment, description, _) in enumerate(verdicts)}
+
+    def process_news(self, news):
+        """Process a list of news articles."""
+        news = [
+            article for article in news
+            if article.get('News headline') is not None and article.get('Stock name') is not None and article.get('Ticker') is not None
+        ]
+        for i, (sentiment, description) in self.classify_articles(news).items():
+            news[i]['Sentiment'] = sentiment
+            news[i]['Description'] = description
+        return news
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze sentiment of news articles with the local lexicon only.')
+    parser.add_argument('input', help='The JSON (or news columns) file to load news articles from.')
+    parser.add_argument('output', help='The JSON file to save results to.')
+    parser.add_argument('output2', help='The JSON file to save scores to.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    news = load_records(args.input)
+    if news is None:
+        print("Failed to load news data.")
+        return
+    results = LocalSentimentAnalyzer().process_news(news)
+    logging.info(f"Scored {len(results)} headlines locally")
+    save_json(args.output, results)
+    accumulator = ScoreAccumulator()
+    for entry in results:
+        accumulator.add(entry)
+    save_json(args.output2, accumulator.results("DATE"))
+    print("Sentiment scores calculated and saved.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""In-memory stand-in for a pymongo collection, for tests and benchmarks without a mongod.
+
+MemoryCollection implements the part of pymongo's Collection API the news
+store uses: create_index (unique single-field indexes), bulk_write with
+InsertOne/UpdateOne ($set, $setOnInsert, upsert) in ordered or unordered mode,
+insert_many, find with a filter, projection, sort and batch size, and
+count_documents. Filters support equality and $gt/$gte/$lt/$lte/$in/$ne.
+Documents get bson ObjectIds, increasing in insertion order like the server's.
+
+Every bulk_write, insert_many and cursor batch counts as a round-trip in
+`round_trips`, so tests can check how chatty a writer or reader is.
+
+Usage:
+    collection = MemoryCollection()
+    NewsWriter(collection).write(news)
+    collection.round_trips
+"""
+
+import copy
+import datetime
+import operator
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, InsertManyResult
+
+
+DUPLICATE_KEY = 11000
+COMPARISONS = {'$gt': operator.gt, '$gte': operator.ge, '$lt': operator.lt, '$lte': operator.le,
+               '$ne': operator.ne, '$in': lambda value, options: value in options}
+
+
+def stored(value):
+    """A value as it comes back from the server: datetimes are naive UTC (pymongo's default)."""
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def matches(document, query):
+    for field, condition in query.items():
+        value = document.get(field)
+        if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+            for name, argument in condition.items():
+                argument = [stored(option) for option in argument] if name == '$in' else stored(argument)
+                if value is None and name != '$ne' or not COMPARISONS[name](value, argument):
+                    return False
+        elif value != stored(condition):
+            return False
+    return True
+
+
+def project(document, projection):
+    if not projection:
+        return copy.deepcopy(document)
+    fields = [field for field, included in projection.items() if included]
+    projected = {field: copy.deepcopy(document[field]) for field in fields if field in document}
+    if projection.get('_id', 1):
+        projected['_id'] = document['_id']
+    return projected
+
+
+class MemoryCursor:
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = projection
+        self.order = []
+        self.size = 101  # the server's default first batch
+
+    def sort(self, key, direction=1):
+        self.order = [(key, direction)] if isinstance(key, str) else list(key)
+        return self
+
+    def batch_size(self, size):
+        self.size = size
+        return self
+
+    def __iter__(self):
+        documents = [document for document in self.collection.documents if matches(document, self.query)]
+        for key, direction in reversed(self.order):
+            documents.sort(key=lambda document: document.get(key), reverse=direction < 0)
+        for start in range(0, len(documents), self.size):
+            self.collection.round_trips += 1
+            for document in documents[start:start + self.size]:
+                yield project(document, self.projection)
+
+
+class MemoryCollection:
+    """A pymongo-like collection held in a list."""
+
+    def __init__(self, name='news'):
+        self.name = name
+        self.documents = []
+        self.unique = {}  # field -> {value: document}
+        self.round_trips = 0
+
+    def create_index(self, keys, unique=False, name=None, **kwargs):
+        field = keys if isinstance(keys, str) else keys[0][0]
+        if unique and field not in self.unique:
+            index = {document.get(field): document for document in self.documents}
+            if len(index) != len(self.documents):
+                raise DuplicateKeyError(f"E11000 duplicate key error building index on {field}", DUPLICATE_KEY)
+            self.unique[field] = index
+        return name or f'{field}_1'
+
+    def _check_unique(self, document, ignore=None):
+        for field, index in self.unique.items():
+            other = index.get(document.get(field))
+            if other is not None and other is not ignore:
+                raise DuplicateKeyError('E11000 duplicate key error', DUPLICATE_KEY)
+
+    def _index(self, document):
+        for field, index in self.unique.items():
+            index[document.get(field)] = document
+
+    def _find_one(self, query):
+        # Equality on a uniquely indexed field is a dictionary lookup, like an index seek
+        for field, index in self.unique.items():
+            value = query.get(field)
+            if value is not None and not isinstance(value, dict):
+                document = index.get(value)
+                return document if document is not None and matches(document, query) else None
+        return next((document for document in self.documents if matches(document, query)), None)
+
+    def _insert(self, document):
+        document = {key: stored(value) for key, value in copy.deepcopy(document).items()}
+        document.setdefault('_id', ObjectId())
+        self._check_unique(document)
+        self.documents.append(document)
+        self._index(document)
+        return document['_id']
+
+    def insert_many(self, documents, ordered=True):
+        self.round_trips += 1
+        return InsertManyResult([self._insert(document) for document in documents], True)
+
+    def bulk_write(self, requests, ordered=True):
+        self.round_trips += 1
+        counts = {'nInserted': 0, 'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0,
+                  'upserted': [], 'writeErrors': [], 'writeConcernErrors': []}
+        for index, request in enumerate(requests):
+            try:
+                self._apply(request, index, counts)
+            except DuplicateKeyError as e:
+                counts['writeErrors'].append({'index': index, 'code': DUPLICATE_KEY, 'errmsg': str(e)})
+                if ordered:
+                    break
+        if counts['writeErrors']:
+            raise BulkWriteError(counts)
+        return BulkWriteResult(counts, True)
+
+    def _apply(self, request, index, counts):
+        if isinstance(request, InsertOne):
+            self._insert(request._doc)
+            counts['nInserted'] += 1
+            return
+        if not isinstance(request, UpdateOne):
+            raise TypeError(f"MemoryCollection does not support {type(request).__name__}")
+        update = request._doc
+        existing = self._find_one(request._filter)
+        if existing is not None:
+            counts['nMatched'] += 1
+            if update.get('$set'):
+                changed = {**existing, **update['$set']}
+                self._check_unique(changed, ignore=existing)
+                counts['nModified'] += int(changed != existing)
+                for field, index in self.unique.items():
+                    index.pop(existing.get(field), None)
+                existing.update({key: stored(value) for key, value in copy.deepcopy(update['$set']).items()})
+                self._index(existing)
+        elif request._upsert:
+            document = {**request._filter, **update.get('$setOnInsert', {}), **update.get('$set', {})}
+            counts['upserted'].append({'index': index, '_id': self._insert(document)})
+            counts['nUpserted'] += 1
+
+    def find(self, filter=None, projection=None, sort=None, batch_size=None):
+        cursor = MemoryCursor(self, filter, projection)
+        if sort:
+            cursor.sort(sort)
+        if batch_size:
+            cursor.batch_size(batch_size)
+        return cursor
+
+    def count_documents(self, filter):
+        return sum(1 for document in self.documents if matches(document, filter))
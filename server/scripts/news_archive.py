@@ -0,0 +1,302 @@
+"""Daily partitioned, compressed archive of collected headlines.
+
+newsData.json is overwritten by every collection run, so past headlines are
+lost. NewsArchive keeps them in one directory, partitioned by the UTC day of
+each headline. Every append adds one part per day it touches:
+
+    2023-07-12.000003.seg   the day's records sorted by (ticker, timestamp), as
+                            NDJSON in independently zlib-compressed blocks of
+                            BLOCK_RECORDS records
+    2023-07-12.000003.idx   sidecar index: b'NEWSIDX1', uint32 header length,
+                            JSON header {"rows", "block_records", "blocks":
+                            [[offset, length]], "tickers": {ticker: [start, end]}},
+                            then the rows' int64 timestamps (ms, UTC), 8-aligned
+
+A query opens only the parts of the days in its range, reads the index
+header, bisects the ticker's timestamps in the mapped index and decompresses
+only the blocks holding matching rows, so one ticker's headlines for a month
+read kilobytes whatever the size of the archive. The .idx is written last: a
+part without one is ignored.
+
+`compact()` merges each day's parts into one, dropping copies of the same
+headline (the latest part wins, as in queries); appends compact a day once it
+has more than MAX_PARTS parts. `retain(days)` deletes the days older than that.
+
+Usage:
+    archive = NewsArchive('../data/newsArchive')
+    archive.append(news)
+    archive.query('AAPL', '2023-03-01', '2023-03-31T23:59:59')
+
+    python3 news_archive.py append ../data/newsData.json
+    python3 news_archive.py query --ticker AAPL --start 2023-03-01 --end 2023-03-31
+    python3 news_archive.py compact --retain-days 365
+"""
+
+import argparse
+import datetime
+import glob
+import logging
+import mmap
+import os
+import re
+import struct
+import zlib
+
+import numpy as np
+
+from json_io import dumps, loads
+from news_columns import NULL_TIMESTAMP, read_records, to_milliseconds
+from news_records import article_id
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARCHIVE_DIR = os.path.join(SCRIPT_DIR, '..', 'data', 'newsArchive')
+INDEX_MAGIC = b'NEWSIDX1'
+BLOCK_RECORDS = 64
+COMPRESSION_LEVEL = 6
+PART_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})\.(\d{6})\.idx$')
+MAX_PARTS = 8  # parts a day may have before an append compacts it
+MS_PER_DAY = 86400 * 1000
+
+
+def day_of(milliseconds):
+    return (datetime.datetime(1970, 1, 1) + datetime.timedelta(milliseconds=int(milliseconds))).date().isoformat()
+
+
+def bound(value, end=False):
+    """Milliseconds of a query bound (ISO string, date or ms); a bare date as `end` covers the whole day."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    milliseconds = to_milliseconds(value)
+    if milliseconds == NULL_TIMESTAMP:
+        raise ValueError(f"Invalid date: {value}")
+    if end and isinstance(value, str) and len(value) == 10:
+        milliseconds += MS_PER_DAY - 1
+    return milliseconds
+
+
+class ArchivePart:
+    """One part of a day: its index mapped, its segment read block by block."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.segment_path = index_path[:-len('.idx')] + '.seg'
+        with open(index_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(f"{index_path} is not a news archive index")
+        (header_length,) = struct.unpack_from('<I', self._map, len(INDEX_MAGIC))
+        start = len(INDEX_MAGIC) + 4
+        header = loads(bytes(self._map[start:start + header_length]))
+        self.rows = header['rows']
+        self.block_records = header['block_records']
+        self.blocks = header['blocks']
+        self.tickers = header['tickers']
+        self.timestamps = np.frombuffer(self._map, dtype=np.int64, count=self.rows,
+                                        offset=_align(start + header_length))
+
+    def row_range(self, ticker=None, start=None, end=None):
+        """[first, last) rows of a ticker (or of the whole part) between two bounds in ms."""
+        if ticker is None:
+            # Rows are in ticker order: without a ticker the bounds are checked on the records
+            return 0, self.rows
+        if ticker not in self.tickers:
+            return 0, 0
+        first, last = self.tickers[ticker]
+        timestamps = self.timestamps[first:last]
+        low = first + int(np.searchsorted(timestamps, start, 'left')) if start is not None else first
+        high = first + int(np.searchsorted(timestamps, end, 'right')) if end is not None else last
+        return low, high
+
+    def read_rows(self, first, last):
+        """Decode rows [first, last), decompressing only their blocks."""
+        if first >= last:
+            return []
+        records = []
+        with open(self.segment_path, 'rb') as segment:
+            for block in range(first // self.block_records, (last - 1) // self.block_records + 1):
+                offset, length = self.blocks[block]
+                segment.seek(offset)
+                lines = zlib.decompress(segment.read(length)).split(b'\n')
+                block_first = block * self.block_records
+                for row in range(max(first, block_first), min(last, block_first + len(lines))):
+                    records.append(loads(lines[row - block_first]))
+        return records
+
+    def close(self):
+        del self.timestamps
+        self._map.close()
+
+
+def _align(position):
+    return (position + 7) // 8 * 8
+
+
+def _within(record, start, end):
+    milliseconds = to_milliseconds(record.get('Date'))
+    return (start is None or milliseconds >= start) and (end is None or milliseconds <= end)
+
+
+def write_part(base_path, records):
+    """Write records (all of one day) as a part: segment, then index."""
+    keyed = sorted(((str(record.get('Ticker') or ''), to_milliseconds(record.get('Date')), record)
+                    for record in records), key=lambda item: (item[0], item[1]))
+    blocks, tickers = [], {}
+    with open(base_path + '.seg', 'wb') as segment:
+        for start in range(0, len(keyed), BLOCK_RECORDS):
+            payload = zlib.compress(
+                '\n'.join(dumps(record) for _, _, record in keyed[start:start + BLOCK_RECORDS]).encode('utf-8'),
+                COMPRESSION_LEVEL,
+            )
+            blocks.append([segment.tell(), len(payload)])
+            segment.write(payload)
+        segment.flush()
+        os.fsync(segment.fileno())
+    for row, (ticker, _, _) in enumerate(keyed):
+        tickers.setdefault(ticker, [row, row])[1] = row + 1
+
+    header = dumps({'rows': len(keyed), 'block_records': BLOCK_RECORDS, 'blocks': blocks,
+                    'tickers': tickers}).encode('utf-8')
+    prefix = INDEX_MAGIC + struct.pack('<I', len(header)) + header
+    timestamps = np.array([timestamp for _, timestamp, _ in keyed], dtype=np.int64)
+    temporary = f'{base_path}.idx.tmp'
+    with open(temporary, 'wb') as index:
+        index.write(prefix + b'\0' * (_align(len(prefix)) - len(prefix)))
+        index.write(timestamps.tobytes())
+        index.flush()
+        os.fsync(index.fileno())
+    os.replace(temporary, base_path + '.idx')
+
+
+class NewsArchive:
+    """Directory of daily parts, appended to by the collector and queried by ticker and time."""
+
+    def __init__(self, directory=DEFAULT_ARCHIVE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def parts(self, day=None):
+        """{day: [index paths, oldest part first]}, for one day or all of them."""
+        days = {}
+        pattern = f'{day}.*.idx' if day else '*.idx'
+        for path in sorted(glob.glob(os.path.join(self.directory, pattern))):
+            match = PART_RE.match(os.path.basename(path))
+            if match:
+                days.setdefault(match.group(1), []).append(path)
+        return days
+
+    def _next_base(self, day):
+        existing = self.parts(day).get(day, [])
+        number = int(PART_RE.match(os.path.basename(existing[-1])).group(2)) + 1 if existing else 1
+        return os.path.join(self.directory, f'{day}.{number:06d}')
+
+    def append(self, records):
+        """Add records as a new part of each day they fall on. Returns the number archived.
+
+        A day with more than MAX_PARTS parts is compacted, so a collector appending
+        the same headlines run after run does not multiply the parts to open.
+        """
+        days = {}
+        skipped = 0
+        for record in records:
+            milliseconds = to_milliseconds(record.get('Date'))
+            if milliseconds == NULL_TIMESTAMP:
+                skipped += 1
+                continue
+            days.setdefault(day_of(milliseconds), []).append(record)
+        for day, day_records in sorted(days.items()):
+            write_part(self._next_base(day), day_records)
+            if len(self.parts(day).get(day, [])) > MAX_PARTS:
+                self.compact(day)
+        archived = sum(len(day_records) for day_records in days.values())
+        logging.info(f"Archived {archived} headlines over {len(days)} days ({skipped} without a date skipped)")
+        return archived
+
+    def query(self, ticker=None, start=None, end=None):
+        """Headlines of `ticker` (all tickers if None) between `start` and `end` (inclusive), oldest first.
+
+        Bounds are ISO dates or datetimes (UTC); a bare `end` date covers its whole day.
+        """
+        start_ms, end_ms = bound(start), bound(end, end=True)
+        first_day = day_of(start_ms) if start_ms is not None else None
+        last_day = day_of(end_ms) if end_ms is not None else None
+        found = {}
+        for day, paths in sorted(self.parts().items()):
+            if first_day and day < first_day or last_day and day > last_day:
+                continue
+            for path in paths:
+                part = ArchivePart(path)
+                try:
+                    for record in part.read_rows(*part.row_range(ticker, start_ms, end_ms)):
+                        if ticker is None and not _within(record, start_ms, end_ms):
+                            continue
+                        # A later part replaces an earlier copy of the same headline
+                        found[(record.get('Ticker'), article_id(record))] = record
+                finally:
+                    part.close()
+        return sorted(found.values(), key=lambda record: to_milliseconds(record.get('Date')))
+
+    def compact(self, day=None):
+        """Merge the parts of each day (or of one day) into one, without duplicates. Returns the days compacted."""
+        compacted = 0
+        for part_day, paths in self.parts(day).items():
+            if len(paths) < 2:
+                continue
+            records = self.query(start=part_day, end=part_day)
+            write_part(self._next_base(part_day), records)
+            for path in paths:
+                os.remove(path)
+                os.remove(path[:-len('.idx')] + '.seg')
+            compacted += 1
+        if compacted:
+            logging.info(f"Compacted {compacted} days of the news archive")
+        return compacted
+
+    def retain(self, days, today=None):
+        """Delete the days more than `days` before `today` (default: the current UTC date). Returns the days removed."""
+        today = today or datetime.datetime.utcnow().date()
+        oldest = (today - datetime.timedelta(days=days)).isoformat()
+        removed = 0
+        for part_day, paths in self.parts().items():
+            if part_day >= oldest:
+                continue
+            for path in paths:
+                os.remove(path)
+                segment = path[:-len('.idx')] + '.seg'
+                if os.path.exists(segment):
+                    os.remove(segment)
+            removed += 1
+        if removed:
+            logging.info(f"Removed {removed} days older than {oldest} from the news archive")
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Append to, query and maintain the headline archive.')
+    parser.add_argument('command', choices=['append', 'query', 'compact'])
+    parser.add_argument('input', nargs='?', help='With append: the JSON (or news columns) file to archive.')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE_DIR, help='Archive directory.')
+    parser.add_argument('--ticker', default=None, help='With query: the ticker.')
+    parser.add_argument('--start', default=None, help='With query: first date or datetime (UTC).')
+    parser.add_argument('--end', default=None, help='With query: last date or datetime (UTC).')
+    parser.add_argument('--retain-days', type=int, default=None, help='With compact: also delete older days.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    archive = NewsArchive(args.archive)
+    if args.command == 'append':
+        if not args.input:
+            parser.error('append needs an input file')
+        archive.append(read_records(args.input))
+    elif args.command == 'query':
+        print(dumps(archive.query(args.ticker, args.start, args.end), indent=True))
+    else:
+        archive.compact()
+        if args.retain_days is not None:
+            archive.retain(args.retain_days)
+
+
+if __name__ == '__main__':
+    main()
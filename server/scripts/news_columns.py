@@ -0,0 +1,335 @@
+"""Binary columnar interchange format for news and sentiment records.
+
+newsData.json and sentimentResults.json repeat every key in every record and
+have to be parsed whole by each stage. A columns file stores the same records
+column by column:
+
+    dictionary  Ticker, Stock name, Source, Sentiment: uint32 codes into a
+                small table of values kept in the header
+    timestamp   Date / DATE: int64 milliseconds since the epoch (UTC),
+                NULL_TIMESTAMP when missing
+    int64       other columns whose values are all integers (e.g. __v):
+                int64 values
+    float64     other columns whose values are all numbers, some not
+                integers: float64 values
+    bool        other columns whose values are all booleans: uint8 flags
+    strings     other columns whose values are all strings (Id, News
+                headline, ...): uint64 offsets into one UTF-8 heap, string i
+                being heap[offsets[i]:offsets[i + 1]]
+
+Values may be None (or missing) in all but dictionary and timestamp columns:
+those columns then also get a null bitmap (bit i of byte i // 8 set, least
+significant bit first, when value i is None). A column mixing kinds of values,
+or holding lists or objects, cannot be stored and write_columns raises
+ValueError.
+
+Layout (little-endian):
+
+    b'NEWSCOL\\x01'   magic
+    uint32           header length
+    header           JSON: {"version", "rows", "columns": [{"name", "kind",
+                     "blocks": {block: [offset, length]}, "values"?}]}
+    blocks           each aligned on 8 bytes, offsets from the start of the file
+
+NewsColumns maps the file and exposes every block as a numpy view of the
+mapping, so selecting the rows of a ticker or the timestamps of a day copies
+nothing; strings are only decoded when asked for. The Node server has a
+reader in utils/newsColumns.js. JSON stays the default everywhere; the
+sentiment scripts also accept a columns file as input.
+
+Values come back with their type: None (or a missing key) as None, not ''
+or 0. Timestamps come back as UTC ISO strings without an offset, like the
+collector writes them; naive ones are taken as UTC.
+
+Usage:
+    write_columns('../data/newsData.cols', news)
+    columns = NewsColumns('../data/newsData.cols')
+    rows = columns.rows_where('Ticker', 'AAPL')
+    headlines = [columns.string('News headline', row) for row in rows]
+
+    python3 news_columns.py ../data/newsData.json ../data/newsData.cols
+    python3 news_columns.py ../data/newsData.cols ../data/newsData.json
+"""
+
+import argparse
+import datetime
+import logging
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from json_io import dumps, loads, read_json, write_json_atomic
+
+
+MAGIC = b'NEWSCOL\x01'
+FORMAT_VERSION = 2
+# Version 1 files only have dictionary, timestamp and strings columns
+READABLE_VERSIONS = (1, 2)
+ALIGNMENT = 8
+DICTIONARY_FIELDS = ('Ticker', 'Stock name', 'Source', 'Sentiment')
+TIMESTAMP_FIELDS = ('Date', 'DATE')
+NULL_TIMESTAMP = np.iinfo(np.int64).min
+BLOCK_TYPES = {'codes': np.uint32, 'offsets': np.uint64, 'heap': np.uint8, 'nulls': np.uint8, 'values': np.int64,
+               'floats': np.float64, 'flags': np.uint8}
+# Block and dtype of the values of each scalar column kind
+SCALAR_BLOCKS = {'int64': 'values', 'float64': 'floats', 'bool': 'flags'}
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def to_milliseconds(value):
+    """Milliseconds since the epoch of a timestamp (ISO string, seconds or milliseconds), or NULL_TIMESTAMP."""
+    if value is None or value == '':
+        return NULL_TIMESTAMP
+    if isinstance(value, (int, float)):
+        return int(value if value > 1e11 else value * 1000)
+    try:
+        moment = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return NULL_TIMESTAMP
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return (moment - EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+def from_milliseconds(value):
+    if value == NULL_TIMESTAMP:
+        return None
+    moment = (EPOCH + datetime.timedelta(milliseconds=int(value))).replace(tzinfo=None)
+    return moment.isoformat(timespec='milliseconds' if moment.microsecond else 'seconds')
+
+
+def column_kind(name, values=()):
+    """Kind of a column, from its name or else from the types of its values (None aside)."""
+    if name in DICTIONARY_FIELDS:
+        return 'dictionary'
+    if name in TIMESTAMP_FIELDS:
+        return 'timestamp'
+    types = {type(value) for value in values if value is not None}
+    if not types or types == {str}:
+        return 'strings'
+    if types == {bool}:
+        return 'bool'
+    if types == {int}:
+        return 'int64'
+    if types <= {int, float}:
+        return 'float64'
+    raise ValueError(f"Column '{name}' holds values of types {sorted(t.__name__ for t in types)}; "
+                     "only strings, integers, numbers or booleans of one kind can be stored")
+
+
+def null_bitmap(values):
+    """Packed bitmap of the None values, or None if there are none."""
+    nulls = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+    return np.packbits(nulls, bitorder='little').tobytes() if nulls.any() else None
+
+
+def encode_column(name, values):
+    """Return (kind, {block: bytes}, dictionary values or None) for one column."""
+    kind = column_kind(name, values)
+    if kind == 'dictionary':
+        codes = {}
+        encoded = np.fromiter((codes.setdefault(value, len(codes)) for value in values), dtype=np.uint32,
+                              count=len(values))
+        return kind, {'codes': encoded.tobytes()}, list(codes)
+    if kind == 'timestamp':
+        return kind, {'values': np.array([to_milliseconds(value) for value in values], dtype=np.int64).tobytes()}, None
+    if kind in SCALAR_BLOCKS:
+        block = SCALAR_BLOCKS[kind]
+        blocks = {block: np.array([0 if value is None else value for value in values],
+                                  dtype=BLOCK_TYPES[block]).tobytes()}
+    else:
+        encoded = [('' if value is None else value).encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        blocks = {'offsets': offsets.tobytes(), 'heap': b''.join(encoded)}
+    nulls = null_bitmap(values)
+    if nulls is not None:
+        blocks['nulls'] = nulls
+    return kind, blocks, None
+
+
+def write_columns(path, records):
+    """Write records (dicts) to a columns file, through a temporary file and a rename."""
+    records = list(records)
+    names = list(dict.fromkeys(name for record in records for name in record))
+    columns, blocks = [], []
+    for name in names:
+        kind, data, values = encode_column(name, [record.get(name) for record in records])
+        column = {'name': name, 'kind': kind, 'blocks': {}}
+        if values is not None:
+            column['values'] = values
+        columns.append(column)
+        blocks.extend((column, block, payload) for block, payload in data.items())
+
+    # Offsets depend on the header length and the header holds the offsets: lay the blocks out
+    # after a header sized with placeholder offsets of the final width
+    def header_bytes():
+        return dumps({'version': FORMAT_VERSION, 'rows': len(records), 'columns': columns}).encode('utf-8')
+
+    for column, block, payload in blocks:
+        column['blocks'][block] = [10 ** 15, len(payload)]
+    start = _align(len(MAGIC) + 4 + len(header_bytes()))
+    position = start
+    for column, block, payload in blocks:
+        column['blocks'][block] = [position, len(payload)]
+        position = _align(position + len(payload))
+    header = header_bytes().ljust(start - len(MAGIC) - 4)
+
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for _, _, payload in blocks:
+            f.write(payload)
+            f.write(b'\0' * (_align(len(payload)) - len(payload)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def is_columns_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class NewsColumns:
+    """Read-only, memory-mapped view of a columns file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a news columns file")
+        (header_length,) = struct.unpack_from('<I', self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = loads(bytes(self._map[start:start + header_length]))
+        if header['version'] not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported news columns version {header['version']} in {path}")
+        self.rows = header['rows']
+        self.columns = {column['name']: column for column in header['columns']}
+        self._lookups = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _block(self, name, block):
+        offset, length = self.columns[name]['blocks'][block]
+        dtype = BLOCK_TYPES[block]
+        return np.frombuffer(self._map, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+
+    def kind(self, name):
+        return self.columns[name]['kind']
+
+    def codes(self, name):
+        """Dictionary codes of a dictionary column (uint32 view)."""
+        return self._block(name, 'codes')
+
+    def values(self, name):
+        """The dictionary of a dictionary column: values[code]."""
+        return self.columns[name]['values']
+
+    def code(self, name, value):
+        """Code of a value in a dictionary column, or None if no row has it."""
+        if name not in self._lookups:
+            self._lookups[name] = {value: code for code, value in enumerate(self.values(name))}
+        return self._lookups[name].get(value)
+
+    def timestamps(self, name='Date'):
+        """Milliseconds since the epoch of a timestamp column (int64 view)."""
+        return self._block(name, 'values')
+
+    def is_null(self, name, row):
+        """Whether a value of a strings or scalar column was None."""
+        if 'nulls' not in self.columns[name]['blocks']:
+            return False
+        return bool(self._block(name, 'nulls')[row >> 3] >> (row & 7) & 1)
+
+    def string(self, name, row):
+        """Decode one value of a strings column (None for a null)."""
+        if self.is_null(name, row):
+            return None
+        offsets = self._block(name, 'offsets')
+        heap_offset = self.columns[name]['blocks']['heap'][0]
+        return self._map[heap_offset + int(offsets[row]):heap_offset + int(offsets[row + 1])].decode('utf-8')
+
+    def scalars(self, name):
+        """Values of an int64, float64 or bool column (numpy view; nulls read as 0)."""
+        return self._block(name, SCALAR_BLOCKS[self.kind(name)])
+
+    def scalar(self, name, row):
+        """One value of an int64, float64 or bool column, as a Python value (None for a null)."""
+        if self.is_null(name, row):
+            return None
+        value = self.scalars(name)[row]
+        return bool(value) if self.kind(name) == 'bool' else value.item()
+
+    def rows_where(self, name, value):
+        """Indices of the rows whose dictionary column equals `value`."""
+        code = self.code(name, value)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.codes(name) == code)
+
+    def value(self, name, row):
+        kind = self.kind(name)
+        if kind == 'dictionary':
+            return self.values(name)[self.codes(name)[row]]
+        if kind == 'timestamp':
+            return from_milliseconds(self.timestamps(name)[row])
+        if kind in SCALAR_BLOCKS:
+            return self.scalar(name, row)
+        return self.string(name, row)
+
+    def record(self, row):
+        return {name: self.value(name, row) for name in self.columns}
+
+    def records(self):
+        """Yield every row as a dict, like the JSON records."""
+        for row in range(self.rows):
+            yield self.record(row)
+
+    def close(self):
+        self._map.close()
+
+
+def read_records(path):
+    """Records of a JSON or columns file, as a list; errors are raised."""
+    if not is_columns_file(path):
+        return read_json(path)
+    columns = NewsColumns(path)
+    try:
+        return list(columns.records())
+    finally:
+        columns.close()
+
+
+def load_records(path):
+    """Records of a JSON or columns file, or None (and log why) if it cannot be read."""
+    try:
+        return read_records(path)
+    except Exception as e:
+        logging.info(f"Error loading records: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert news records between JSON and the columns format.')
+    parser.add_argument('input', help='JSON array or columns file.')
+    parser.add_argument('output', help='Columns file (from JSON) or JSON file (from columns).')
+    args = parser.parse_args()
+
+    if is_columns_file(args.input):
+        write_json_atomic(args.output, read_records(args.input))
+    else:
+        write_columns(args.output, read_json(args.input))
+    print(f"{args.input} ({os.path.getsize(args.input)} bytes) -> {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,8 @@ import requests
 import feedparser
 from pathlib import Path
 
+from json_io import write_json_atomic
+
 
 
 
@@ -31,6 +33,7 @@ STOCKNEWS_API_KEY = os.getenv("STOCKNEWS_API_KEY")
 SCRIPT_DIR = Path(__file__).resolve().parent
 sys.path.append(str(SCRIPT_DIR / "proxy"))
 from proxies import load_proxy_pool  # noqa: E402
+from proxy_health import ProxyHealth, classify_failure  # noqa: E402
 
 
 logging.basicConfig(
@@ -60,10 +63,28 @@ def generate_id(title, date):
     return hashlib.sha256((title + str(date)).encode()).hexdigest()
 
 
+def proxy_attempts(proxies, health=None):
+    """Yield the proxies to try in turn (None for a direct connection), skipping open circuits.
+
+    If proxies were skipped and the pool has no direct connection, one is
+    yielded last, so that open circuits alone never leave a fetch without a route.
+    """
+    proxy_pool = proxies or [None]
+    skipped = False
+    for proxy in proxy_pool:
+        if proxy and health and not health.allows(proxy):
+            skipped = True
+            continue
+        yield proxy
+    if skipped and None not in proxy_pool:
+        logging.info("Proxies with an open circuit were skipped, falling back to a direct connection...")
+        yield None
+
+
 # # TickerTick API
 # Rate limit:
 # All endpoints have a rate limit of 10 requests per minute from the same IP address. The service enforces this. More precisely, an IP will be blocked for one minute if more than 10 requests are sent within any 1 minute time window.
-def fetch_tickertick_news(ticker='AAPL', period=1, proxies=None):
+def fetch_tickertick_news(ticker='AAPL', period=1, proxies=None, health=None):
     try:
         logging.info("Fetching data from TickerTick API...")
         base_url = 'https://api.tickertick.com/feed'
@@ -73,26 +94,35 @@ def fetch_tickertick_news(ticker='AAPL', period=1, proxies=None):
         last_id = None
         tickertick_news = []
 
-        proxy_pool = proxies or [None]
-        i = 0
-        while i < len(proxy_pool):
+        # Each page is fetched through the next proxy
+        for proxy in proxy_attempts(proxies, health):
             try:
                 if last_id:
                     url = base_url + params + f'&last={last_id}'
-                proxy = proxy_pool[i]
+                started = time.monotonic()
                 if proxy:
                     logging.info(f"Using proxy {proxy} for TickerTick API...")
-                    response = requests.get(url, proxies={"http": proxy, "https": proxy})
+                    response = requests.get(url, proxies={"http": proxy, "https": proxy}, timeout=10)
                 else:
                     logging.info("Using direct connection for TickerTick API...")
-                    response = requests.get(url)
+                    response = requests.get(url, timeout=10)
+                if response.status_code == 429:
+                    logging.info(f"TickerTick API rate limit reached with proxy {proxy}. Switching proxy...")
+                    if proxy and health:
+                        health.record_failure(proxy, 'rate_limited')
+                    continue
+                response.raise_for_status()
+                # A malformed body raises here and counts against the proxy
                 tickertick_news_raw = response.json()['stories']
+                if proxy and health:
+                    health.record_success(proxy, time.monotonic() - started)
                 tickertick_news_raw = [n for n in tickertick_news_raw if n['title'].strip()]
-                
+
                 if not tickertick_news_raw:
-                    logging.info(f"No results from TickerTick API with proxy {proxy}. Possibly a 429 status code. Switching proxy...")
-                    i += 1
-                    continue
+                    # Rate limiting comes as a 429 (handled above) or an error body, so an empty page is
+                    # the end of the feed (or a ticker without stories), not a proxy fault
+                    logging.info("No more stories from TickerTick API.")
+                    return tickertick_news
 
                 for news in tickertick_news_raw:
                     news_date = datetime.datetime.fromtimestamp(news.get('time') / 1000)
@@ -110,15 +140,17 @@ def fetch_tickertick_news(ticker='AAPL', period=1, proxies=None):
                     })
                 last_id = tickertick_news_raw[-1]['id']
                 logging.info(f"Fetching next 100 articles. Last ID: {last_id}")
-                i += 1
             except Exception as e:
+                if proxy and health:
+                    health.record_failure(proxy, classify_failure(e))
                 logging.info(f"An error occurred while fetching data from TickerTick API with proxy {proxy}: {e}")
                 logging.info("Retrying with a different proxy...")
-                i += 1
     except Exception as e:
         logging.info(f"An error occurred while fetching data from TickerTick API: {e}")
         return []
-    return []
+    # Out of routes: keep the pages already read
+    logging.info(f"No proxy left for TickerTick API, keeping the {len(tickertick_news)} stories fetched.")
+    return tickertick_news
 
 
 
@@ -127,22 +159,14 @@ def fetch_tickertick_news(ticker='AAPL', period=1, proxies=None):
 # # Google News 
 # https://newscatcherapi.com/blog/google-news-rss-search-parameters-the-missing-documentaiton
 
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, datetime.datetime):
-            return o.isoformat()
-        return super(DateTimeEncoder, self).default(o)
-  
-def fetch_google_news(ticker='AAPL', period=1, proxies=None):
+def fetch_google_news(ticker='AAPL', period=1, proxies=None, health=None):
     try:
         logging.info("Fetching data from Google News RSS feed...")
 
         # Process the results
         google_news = []
 
-        proxy_pool = proxies or [None]
-        for i in range(len(proxy_pool)):
-            proxy = proxy_pool[i]
+        for proxy in proxy_attempts(proxies, health):
             if proxy:
                 logging.info(f"Using proxy {proxy} for Google News...")
                 # Set the proxy environment variables
@@ -151,15 +175,22 @@ def fetch_google_news(ticker='AAPL', period=1, proxies=None):
                 proxy_config = {"http": proxy, "https": proxy}
             else:
                 logging.info("Using direct connection for Google News...")
+                # Do not go through the proxy an earlier attempt left in the environment
+                os.environ.pop('http_proxy', None)
+                os.environ.pop('https_proxy', None)
                 proxy_config = None
 
             try:
                 # Create a GoogleNews object with the current date as the start and end date
                 url = f"https://news.google.com/rss/headlines/section/topic/BUSINESS?q={ticker}%20stock%20when%3A{period}d&hl=en-US&gl=US&ceid=US%3Aen&num=50"
+                started = time.monotonic()
                 if proxy_config:
                     response = requests.get(url, proxies=proxy_config, timeout=10)
                 else:
                     response = requests.get(url, timeout=10)
+                response.raise_for_status()
+                if proxy and health:
+                    health.record_success(proxy, time.monotonic() - started)
                 feed = feedparser.parse(response.text)
 
                 for entry in feed.entries:
@@ -181,6 +212,8 @@ def fetch_google_news(ticker='AAPL', period=1, proxies=None):
                 return google_news
 
             except Exception as e:
+                if proxy and health:
+                    health.record_failure(proxy, classify_failure(e))
                 logging.error(f"An error occurred while fetching data from Google News with proxy {proxy}: {e}")
                 logging.info("Retrying with a different proxy...")
 
@@ -283,12 +316,23 @@ def main(ticker='AAPL', period=1):
     return news_data
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Collect news headlines for the tickers of stocksData.json.')
+    parser.add_argument('--mongo', action='store_true',
+                        help='Also upsert the headlines into the News collection (MONGO_URI in config/.env).')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Headlines per bulk write with --mongo.')
+    parser.add_argument('--archive', default=os.path.join('..', 'data', 'newsArchive'),
+                        help='Headline archive directory the run is appended to ("" to disable).')
+    parser.add_argument('--search-index', default=os.path.join('..', 'data', 'newsSearch'),
+                        help='Full-text index directory the run is added to ("" to disable).')
+    args = parser.parse_args()
+
     # Load the tickers from the stocksData.json file
     with open('../data/stocksData.json', 'r') as file:
         data = json.load(file)
         tickers = data['stocks']
 
-    proxies = load_proxy_pool()
+    proxy_health = ProxyHealth()
+    proxies = load_proxy_pool(health=proxy_health)
     if not proxies:
         logging.warning("No proxies available. Falling back to direct connections.")
 
@@ -297,11 +341,11 @@ if __name__ == '__main__':
     # Fetch news for each ticker
     for i, ticker in enumerate(tickers):
         print(f"Fetching news for {ticker}...")
-        proxies = proxies[i:] + proxies[:i]  # Rotate the proxies list
+        ranked_proxies = proxy_health.rank(proxies)  # Fastest live proxies first, as of the last requests
         with ThreadPoolExecutor() as executor:
             try:
-                tickertick_news_future = executor.submit(fetch_tickertick_news, ticker, 1, proxies)
-                google_news_future = executor.submit(fetch_google_news, ticker, 1, proxies)
+                tickertick_news_future = executor.submit(fetch_tickertick_news, ticker, 1, ranked_proxies, proxy_health)
+                google_news_future = executor.submit(fetch_google_news, ticker, 1, ranked_proxies, proxy_health)
 
                 # Get the results from the futures
                 tickertick_news = tickertick_news_future.result()
@@ -321,17 +365,42 @@ if __name__ == '__main__':
         all_news_data.extend(news_data)
 
 
+    proxy_health.save()
+
     # Remove duplicates from all_news_data
     all_news_data = list({news['Id']: news for news in all_news_data}.values())
 
     try:
-        json_output = json.dumps(all_news_data, cls=DateTimeEncoder, ensure_ascii=False, indent=4)
-        
         # Save the JSON output to the data folder
         file_path = os.path.join('..', 'data', 'newsData.json')
-        with open(file_path, 'w') as file:
-            file.write(json_output)
+        write_json_atomic(file_path, all_news_data)
             
         print("JSON output saved successfully.")
     except Exception as e:
         print(f"Error generating JSON or saving the output: {e}")
+
+    if args.archive:
+        from news_archive import NewsArchive
+        try:
+            NewsArchive(args.archive).append(all_news_data)
+        except Exception as e:
+            print(f"Error archiving the news: {e}")
+
+    if args.search_index:
+        from news_search import NewsSearch
+        try:
+            index = NewsSearch(args.search_index)
+            index.add(all_news_data)
+            index.close()
+        except Exception as e:
+            print(f"Error indexing the news: {e}")
+
+    if args.mongo:
+        from news_store import NewsWriter, news_collection
+        try:
+            writer = NewsWriter(news_collection(), batch_size=args.batch_size)
+            writer.ensure_indexes()
+            stats = writer.write(all_news_data)
+            print(f"News saved to Mongo: {stats['inserted']} new, {stats['existing']} already stored.")
+        except Exception as e:
+            print(f"Error saving the news to Mongo: {e}")
@@ -0,0 +1,58 @@
+"""Helpers shared by the scripts that handle news article records.
+
+Records come either from the Python collector (`Id`) or from a dump of the
+Mongo `News` collection (`newsId`, `_id`), so lookups go through these helpers.
+"""
+
+import datetime
+import unicodedata
+
+
+TYPOGRAPHIC_PUNCTUATION = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"', '\u2013': '-', '\u2014': '-', '\u00a0': ' ',
+})
+
+
+def article_id(article):
+    """Return the stable identifier of a news article record."""
+    return article.get('Id') or article.get('newsId') or article.get('_id') or article.get('News headline')
+
+
+def record_key(article):
+    """(ticker, article id) of a record: a headline collected for several tickers is one record per ticker."""
+    return article.get('Ticker'), article_id(article)
+
+
+def without_story(article):
+    """Copy of a record without the internal 'Story' key set by story clustering."""
+    return {key: value for key, value in article.items() if key != 'Story'}
+
+
+def canonical_headline(headline):
+    """Normalize a headline so that trivially different copies compare equal.
+
+    Unicode is NFKC-normalized, typographic quotes and dashes are folded to
+    ASCII, case is folded and whitespace collapsed.
+    """
+    text = unicodedata.normalize('NFKC', str(headline or ''))
+    text = text.translate(TYPOGRAPHIC_PUNCTUATION)
+    return ' '.join(text.casefold().split())
+
+
+def article_timestamp(article):
+    """Seconds since the epoch of an article's Date, or 0 if it has none.
+
+    Dates without an offset are taken as UTC, as in news_columns, whatever the
+    machine's time zone.
+    """
+    value = article.get('Date')
+    if isinstance(value, (int, float)):
+        # Mongo exports dates in milliseconds
+        return value / 1000 if value > 1e11 else float(value)
+    try:
+        moment = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return 0.0
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
@@ -0,0 +1,438 @@
+"""Embedded full-text index over collected headlines.
+
+Past headlines could only be searched by loading JSON files or with unindexed
+Mongo queries (archive/stocksight.py used to push them into Elasticsearch).
+NewsSearch keeps an inverted index on disk instead, in one directory:
+
+    manifest.json        {"version", "next_doc", "segments": [names]}: the commit point
+    seg-000001.fts ...   immutable segments, one per batch of added headlines
+
+Every headline gets a global doc id, in the order added. For each term of the
+headlines (NFKC, case-folded words, see tokenize) and for each ticker (the
+term 'ticker:AAPL'), a segment stores three streams of LEB128 varints:
+
+    docs        doc ids, delta-encoded from the segment's base, so most take one byte
+    freqs       occurrences of the term in each of those docs
+    positions   word positions of every occurrence, doc after doc
+
+Segment layout (little-endian): b'NEWSFTS1', uint32 header length, JSON
+header {"version", "base", "docs", "block_records", "blocks", "arrays"}, then
+8-aligned arrays: `terms` (sorted, '\\n'-joined UTF-8), `term_table` (offset
+and stream lengths of each term), `postings`, `timestamps` (int64 ms of each
+doc) and `keys` (hashes of (ticker, article id), to skip headlines already
+indexed). The records themselves follow as zlib-compressed NDJSON blocks of
+BLOCK_RECORDS docs.
+
+Varint streams are decoded with numpy, so a term's posting list costs a few
+array operations whatever its length. A query intersects the doc ids of its
+terms (and of the ticker filter); phrases then intersect (doc, position - i)
+pairs of their i-th words. Matches are returned newest first, and only their
+blocks are decompressed.
+
+`add()` writes a new segment and then the manifest, so an interrupted add
+leaves the index as it was. When there are more than MAX_SEGMENTS segments,
+they are merged into one.
+
+Usage:
+    index = NewsSearch('../data/newsSearch')
+    index.add(news)
+    index.search('"interest rates" fed', ticker='JPM', limit=10)
+
+    python3 news_search.py add ../data/newsData.json
+    python3 news_search.py search '"rate hike"' --ticker JPM
+"""
+
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import zlib
+
+import numpy as np
+
+from json_io import dumps, loads, read_json, write_json_atomic
+from news_columns import read_records, to_milliseconds
+from news_records import article_id, canonical_headline
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SEARCH_DIR = os.path.join(SCRIPT_DIR, '..', 'data', 'newsSearch')
+MAGIC = b'NEWSFTS1'
+FORMAT_VERSION = 1
+BLOCK_RECORDS = 64
+MAX_SEGMENTS = 10
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+TERM_TABLE = np.dtype([('offset', '<u8'), ('docs', '<u4'), ('freqs', '<u4'), ('positions', '<u4'), ('df', '<u4')])
+ARRAY_TYPES = {'terms': np.uint8, 'term_table': TERM_TABLE, 'postings': np.uint8,
+               'timestamps': np.int64, 'keys': np.uint64}
+
+
+def tokenize(text):
+    """Words of a headline or query, normalized like canonical_headline."""
+    return TOKEN_RE.findall(canonical_headline(text))
+
+
+def ticker_term(ticker):
+    return f'ticker:{ticker}'
+
+
+def record_key(record):
+    """64-bit hash of (ticker, article id), identifying a headline in the index."""
+    digest = hashlib.blake2b(f"{record.get('Ticker')}\0{article_id(record)}".encode('utf-8'), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little')
+
+
+def encode_varints(values):
+    """LEB128 encoding of non-negative integers, vectorized."""
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b''
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+    starts = np.cumsum(lengths) - lengths
+    out = np.zeros(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max())):
+        mask = lengths > k
+        chunk = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = np.where(lengths[mask] > k + 1, 0x80, 0).astype(np.uint64)
+        out[starts[mask] + k] = (chunk | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def decode_varints(data):
+    """Integers of a LEB128 stream (bytes or uint8 array), vectorized."""
+    data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray, memoryview)) else data
+    if not len(data):
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shifts = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(np.uint64) << (7 * shifts).astype(np.uint64)
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+def _align(position):
+    return (position + 7) // 8 * 8
+
+
+class Postings:
+    """Decoded posting list of one term in one segment (local doc ids)."""
+
+    def __init__(self, docs, freqs, positions):
+        self.docs = docs
+        self._freqs = freqs
+        self._positions = positions
+
+    def pairs(self, shift=0):
+        """(doc << 16 | position - shift) of every occurrence, for phrase matching."""
+        freqs = decode_varints(self._freqs)
+        positions = decode_varints(self._positions) - shift
+        docs = np.repeat(self.docs, freqs)
+        keep = positions >= 0
+        return (docs[keep] << 16) | positions[keep]
+
+
+EMPTY = Postings(np.empty(0, dtype=np.int64), b'', b'')
+
+
+class Segment:
+    """One immutable, memory-mapped segment."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a news search segment")
+        (header_length,) = struct.unpack_from('<I', self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = loads(bytes(self._map[start:start + header_length]))
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported news search version {header['version']} in {path}")
+        self.base = header['base']
+        self.docs = header['docs']
+        self.block_records = header['block_records']
+        self.blocks = header['blocks']
+        self._arrays = header['arrays']
+        self.term_table = self._array('term_table')
+        self.postings_data = self._array('postings')
+        self.timestamps = self._array('timestamps')
+        self.keys = self._array('keys')
+        terms = bytes(self._array('terms')).decode('utf-8')
+        self.terms = {term: row for row, term in enumerate(terms.split('\n'))} if terms else {}
+
+    def _array(self, name):
+        offset, length = self._arrays[name]
+        dtype = np.dtype(ARRAY_TYPES[name])
+        return np.frombuffer(self._map, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+    def postings(self, term):
+        row = self.terms.get(term)
+        if row is None:
+            return EMPTY
+        entry = self.term_table[row]
+        offset = int(entry['offset'])
+        docs_end = offset + int(entry['docs'])
+        freqs_end = docs_end + int(entry['freqs'])
+        return Postings(
+            np.cumsum(decode_varints(self.postings_data[offset:docs_end])),
+            self.postings_data[docs_end:freqs_end],
+            self.postings_data[freqs_end:freqs_end + int(entry['positions'])],
+        )
+
+    def records(self, docs):
+        """Records of local doc ids (sorted), decompressing only their blocks."""
+        records, block, lines = {}, None, None
+        for doc in docs:
+            if doc // self.block_records != block:
+                block = doc // self.block_records
+                offset, length = self.blocks[block]
+                lines = zlib.decompress(self._map[offset:offset + length]).split(b'\n')
+            records[doc] = loads(lines[doc - block * self.block_records])
+        return records
+
+    def all_records(self):
+        return self.records(range(self.docs))
+
+    def close(self):
+        self.term_table = self.postings_data = self.timestamps = self.keys = None
+        self._map.close()
+
+
+def write_segment(path, base, records):
+    """Index records as doc ids base, base + 1, ... in a new segment file."""
+    postings = {}
+    for doc, record in enumerate(records):
+        words = tokenize(record.get('News headline'))
+        occurrences = {}
+        for position, word in enumerate(words):
+            occurrences.setdefault(word, []).append(position)
+        occurrences[ticker_term(record.get('Ticker'))] = [0]
+        for term, positions in occurrences.items():
+            postings.setdefault(term, []).append((doc, positions))
+
+    terms = sorted(postings)
+    table = np.zeros(len(terms), dtype=TERM_TABLE)
+    streams = []
+    offset = 0
+    for row, term in enumerate(terms):
+        entries = postings[term]
+        docs = np.array([doc for doc, _ in entries], dtype=np.int64)
+        encoded = (
+            encode_varints(np.diff(docs, prepend=0)),
+            encode_varints([len(positions) for _, positions in entries]),
+            encode_varints([position for _, positions in entries for position in positions]),
+        )
+        table[row] = (offset, len(encoded[0]), len(encoded[1]), len(encoded[2]), len(entries))
+        streams.extend(encoded)
+        offset += sum(len(stream) for stream in encoded)
+
+    blocks, payloads, position = [], [], 0
+    for start in range(0, len(records), BLOCK_RECORDS):
+        payload = zlib.compress('\n'.join(dumps(record) for record in records[start:start + BLOCK_RECORDS])
+                                .encode('utf-8'))
+        payloads.append(payload)
+        blocks.append([position, len(payload)])
+        position += len(payload)
+
+    arrays = {
+        'terms': '\n'.join(terms).encode('utf-8'),
+        'term_table': table.tobytes(),
+        'postings': b''.join(streams),
+        'timestamps': np.array([to_milliseconds(record.get('Date')) for record in records], dtype=np.int64).tobytes(),
+        'keys': np.array([record_key(record) for record in records], dtype=np.uint64).tobytes(),
+        'records': b''.join(payloads),
+    }
+
+    def header_bytes(placements):
+        return dumps({'version': FORMAT_VERSION, 'base': base, 'docs': len(records),
+                      'block_records': BLOCK_RECORDS, 'blocks': blocks, 'arrays': placements}).encode('utf-8')
+
+    # As in news_columns: size the header with placeholder offsets, then lay the arrays out after it
+    start = _align(len(MAGIC) + 4 + len(header_bytes({name: [10 ** 15, len(data)] for name, data in arrays.items()})))
+    placements, position = {}, start
+    for name, data in arrays.items():
+        placements[name] = [position, len(data)]
+        position = _align(position + len(data))
+    for block in blocks:
+        block[0] += placements['records'][0]
+    header = header_bytes(placements).ljust(start - len(MAGIC) - 4)
+
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for data in arrays.values():
+            f.write(data)
+            f.write(b'\0' * (_align(len(data)) - len(data)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def parse_query(query):
+    """Split a query into single words and phrases (quoted, or words joined by punctuation)."""
+    words, phrases = [], []
+    for quoted, bare in QUERY_RE.findall(query):
+        tokens = tokenize(quoted or bare)
+        if len(tokens) > 1:
+            phrases.append(tokens)
+        else:
+            words.extend(tokens)
+    return words, phrases
+
+
+class NewsSearch:
+    """Inverted index of headlines in a directory, updated incrementally."""
+
+    def __init__(self, directory=DEFAULT_SEARCH_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        try:
+            self.manifest = read_json(self.manifest_path)
+        except FileNotFoundError:
+            self.manifest = {'version': FORMAT_VERSION, 'next_doc': 0, 'segments': []}
+        self.segments = [Segment(os.path.join(directory, name)) for name in self.manifest['segments']]
+
+    def __len__(self):
+        return self.manifest['next_doc']
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def _segment_name(self):
+        numbers = [int(name[4:10]) for name in self.manifest['segments']]
+        return f'seg-{max(numbers, default=0) + 1:06d}.fts'
+
+    def _commit(self, segments):
+        """Switch to new segments through the manifest, then delete the files no longer listed."""
+        names = [os.path.basename(segment.path) for segment in segments]
+        dropped = [segment for segment in self.segments if os.path.basename(segment.path) not in names]
+        self.manifest = {**self.manifest, 'segments': names}
+        write_json_atomic(self.manifest_path, self.manifest)
+        self.segments = segments
+        for segment in dropped:
+            segment.close()
+            os.remove(segment.path)
+
+    def add(self, records):
+        """Index the headlines not indexed yet. Returns how many were added."""
+        known = set()
+        for segment in self.segments:
+            known.update(segment.keys.tolist())
+        new = []
+        for record in records:
+            key = record_key(record)
+            if record.get('News headline') and key not in known:
+                known.add(key)
+                new.append(record)
+        if not new:
+            return 0
+
+        path = os.path.join(self.directory, self._segment_name())
+        write_segment(path, self.manifest['next_doc'], new)
+        self.manifest['next_doc'] += len(new)
+        self._commit(self.segments + [Segment(path)])
+        logging.info(f"Indexed {len(new)} headlines ({len(self)} in the search index)")
+        if len(self.segments) > MAX_SEGMENTS:
+            self.merge()
+        return len(new)
+
+    def merge(self):
+        """Rewrite all segments as one; doc ids are global, so they are kept."""
+        if len(self.segments) < 2:
+            return
+        records = [record for segment in self.segments
+                   for _, record in sorted(segment.all_records().items())]
+        path = os.path.join(self.directory, self._segment_name())
+        write_segment(path, self.segments[0].base, records)
+        self._commit([Segment(path)])
+        logging.info(f"Merged the search index into one segment of {len(records)} headlines")
+
+    def _matches(self, segment, words, phrases, ticker):
+        """Local doc ids of a segment matching every word, phrase and the ticker."""
+        terms = words + [word for phrase in phrases for word in phrase]
+        if ticker:
+            terms.append(ticker_term(ticker))
+        lists = {term: segment.postings(term) for term in set(terms)}
+        # Intersect the shortest lists first
+        docs = None
+        for term in sorted(lists, key=lambda term: len(lists[term].docs)):
+            docs = lists[term].docs if docs is None else np.intersect1d(docs, lists[term].docs, assume_unique=True)
+            if not len(docs):
+                return docs
+        for phrase in phrases:
+            pairs = None
+            for shift, word in enumerate(phrase):
+                shifted = lists[word].pairs(shift)
+                shifted = shifted[np.isin(shifted >> 16, docs)]
+                pairs = shifted if pairs is None else np.intersect1d(pairs, shifted)
+            docs = np.unique(pairs >> 16)
+        return docs
+
+    def search(self, query, ticker=None, limit=20):
+        """Headlines matching all words and "quoted phrases" of `query`, newest first.
+
+        `ticker` restricts matches to one ticker; with an empty query it lists
+        the ticker's headlines.
+        """
+        words, phrases = parse_query(query or '')
+        if not words and not phrases and not ticker:
+            return []
+        found = []
+        for segment in self.segments:
+            docs = self._matches(segment, words, phrases, ticker)
+            found.extend((int(segment.timestamps[doc]), segment.base + int(doc), segment, int(doc)) for doc in docs)
+        found.sort(key=lambda match: (match[0], match[1]), reverse=True)
+        found = found[:limit] if limit else found
+
+        wanted = {}
+        for _, _, segment, doc in found:
+            wanted.setdefault(segment.path, (segment, []))[1].append(doc)
+        records = {}
+        for segment, docs in wanted.values():
+            for doc, record in segment.records(sorted(docs)).items():
+                records[segment.base + doc] = record
+        return [records[global_doc] for _, global_doc, _, _ in found]
+
+    def count(self, query, ticker=None):
+        words, phrases = parse_query(query or '')
+        if not words and not phrases and not ticker:
+            return 0
+        return sum(len(self._matches(segment, words, phrases, ticker)) for segment in self.segments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index headlines and search them.')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    add = subcommands.add_parser('add', help='Index the headlines of a JSON (or news columns) file.')
+    add.add_argument('input')
+    search = subcommands.add_parser('search', help='Search headlines: words, "quoted phrases".')
+    search.add_argument('query', nargs='?', default='')
+    search.add_argument('--ticker', default=None, help='Only headlines of this ticker.')
+    search.add_argument('--limit', type=int, default=20, help='Most recent matches to show (0 for all).')
+    parser.add_argument('--index', default=DEFAULT_SEARCH_DIR, help='Index directory.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    index = NewsSearch(args.index)
+    if args.command == 'add':
+        index.add(read_records(args.input))
+    else:
+        print(f"{index.count(args.query, args.ticker)} matches")
+        for record in index.search(args.query, args.ticker, args.limit):
+            print(f"{record.get('Date')}  {record.get('Ticker'):<6} {record.get('News headline')}")
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""Writing collected headlines into the Mongo `News` collection, and reading them back.
+
+The Node server used to save headlines one by one (`new News(...).save()`
+after a `find` per headline). NewsWriter sends them as unordered bulk upserts
+keyed by newsId, `batch_size` per round-trip:
+
+    UpdateOne({'newsId': id}, {'$setOnInsert': document}, upsert=True)
+
+so a headline already stored is left as it is, and one bad document does not
+stop the rest of the batch. A unique index on newsId makes the upsert a single
+index lookup and keeps concurrent collectors from inserting duplicates; the
+duplicate-key errors such a race produces count as already stored.
+
+The connection comes from the server's settings in config/.env (MONGO_URI with
+its <password> placeholder, MONGO_PASSWORD). Any object with pymongo's
+Collection API works, such as mongo_standin.MemoryCollection for tests.
+
+NewsReader feeds the sentiment stage from the collection directly, instead of
+Node dumping the whole collection to newsData.json first. It reads only the
+fields the stage needs, through a batched cursor sorted by _id, and only the
+documents after a watermark: an _id (ObjectIds grow with insertion time) or a
+Date. The watermark of a completed run is kept in sentimentWatermark.json, so
+the next run only classifies what was added since. Headlines a run read but
+could not classify (the provider failed) are kept with the watermark and read
+again by the next run, up to MAX_RETRIES times. Records come out shaped as the
+Node export was (`_id` as a string, Date as an ISO string in UTC).
+
+Usage:
+    writer = NewsWriter(news_collection())
+    writer.ensure_indexes()
+    writer.write(news)          # {'inserted': ..., 'existing': ..., 'invalid': ..., 'batches': ...}
+
+    reader = NewsReader(news_collection(), since=load_watermark(), retry=load_retry())
+    for article in reader:
+        ...
+    save_watermark(reader.watermark, reader.unresolved(classified_ids))
+"""
+
+import datetime
+import logging
+import os
+import urllib.parse
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from json_io import read_json, write_json_atomic
+from news_records import article_timestamp, record_key
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+NEWS_COLLECTION = 'news'  # mongoose's collection for the News model
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_WATERMARK_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'sentimentWatermark.json')
+PROJECTION = {'newsId': 1, 'News headline': 1, 'Date': 1, 'Ticker': 1, 'Stock name': 1, 'Source': 1}
+DUPLICATE_KEY = 11000
+REQUIRED_FIELDS = ('newsId', 'News headline', 'Date', 'Ticker', 'Stock name', 'Source')
+CLASSIFIED_FIELDS = ('News headline', 'Ticker', 'Stock name')  # what process_news needs to classify a record
+MAX_RETRIES = 5
+
+
+def mongo_uri():
+    """The server's Mongo URI, with its password filled in."""
+    load_dotenv(os.path.join(SCRIPT_DIR, '..', 'config', '.env'))
+    uri = os.getenv('MONGO_URI') or os.getenv('MONGODB_URI')
+    if not uri:
+        raise RuntimeError('MONGO_URI is not set')
+    password = os.getenv('MONGO_PASSWORD') or os.getenv('MONGODB_PASSWORD') or ''
+    return uri.replace('<password>', urllib.parse.quote(password, safe=''))
+
+
+def news_collection(uri=None):
+    """The News collection of the database named in the URI (mongoose's default 'test' otherwise)."""
+    client = MongoClient(uri or mongo_uri())
+    return client.get_default_database('test')[NEWS_COLLECTION]
+
+
+def news_document(article):
+    """The News document of a collected headline, or None if a required field is missing."""
+    timestamp = article_timestamp(article)
+    document = {
+        'newsId': article.get('Id') or article.get('newsId'),
+        'News headline': article.get('News headline'),
+        'Date': datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc) if timestamp else None,
+        'Ticker': article.get('Ticker'),
+        'Stock name': article.get('Stock name'),
+        'Source': article.get('Source'),
+    }
+    if any(not document[field] for field in REQUIRED_FIELDS):
+        return None
+    document['__v'] = 0  # as mongoose saves it
+    return document
+
+
+class NewsWriter:
+    """Bulk, idempotent writer of headlines into the News collection."""
+
+    def __init__(self, collection, batch_size=DEFAULT_BATCH_SIZE):
+        self.collection = collection
+        self.batch_size = batch_size
+
+    def ensure_indexes(self):
+        """Create the unique newsId index; logged and skipped if existing duplicates prevent it."""
+        try:
+            self.collection.create_index('newsId', unique=True, name='newsId_unique')
+        except OperationFailure as e:
+            logging.warning(f"Could not create the unique newsId index: {e}")
+
+    def _write_batch(self, operations):
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            return result.upserted_count, result.matched_count
+        except BulkWriteError as e:
+            details = e.details
+            errors = details.get('writeErrors', [])
+            duplicates = sum(1 for error in errors if error.get('code') == DUPLICATE_KEY)
+            for error in errors:
+                if error.get('code') != DUPLICATE_KEY:
+                    logging.error(f"Error writing a headline: {error.get('errmsg')}")
+            return details.get('nUpserted', 0), details.get('nMatched', 0) + duplicates
+
+    def write(self, articles):
+        """Upsert headlines, `batch_size` per round-trip. Returns the counts of the run."""
+        stats = {'inserted': 0, 'existing': 0, 'invalid': 0, 'batches': 0}
+        operations = []
+        seen = set()
+        for article in articles:
+            document = news_document(article)
+            if document is None:
+                stats['invalid'] += 1
+                continue
+            if document['newsId'] in seen:
+                stats['existing'] += 1
+                continue
+            seen.add(document['newsId'])
+            operations.append(UpdateOne({'newsId': document['newsId']}, {'$setOnInsert': document}, upsert=True))
+            if len(operations) == self.batch_size:
+                self._flush(operations, stats)
+                operations = []
+        if operations:
+            self._flush(operations, stats)
+        logging.info(f"News written in {stats['batches']} batches: {stats['inserted']} new, "
+                     f"{stats['existing']} already stored, {stats['invalid']} invalid")
+        return stats
+
+    def _flush(self, operations, stats):
+        inserted, existing = self._write_batch(operations)
+        stats['inserted'] += inserted
+        stats['existing'] += existing
+        stats['batches'] += 1
+
+
+def watermark_filter(since):
+    """Mongo filter for the documents after `since`: an ObjectId (or its hex string), a datetime or an ISO date."""
+    if not since:
+        return {}
+    if isinstance(since, ObjectId) or ObjectId.is_valid(str(since)):
+        return {'_id': {'$gt': ObjectId(str(since))}}
+    if not isinstance(since, datetime.datetime):
+        since = datetime.datetime.fromisoformat(str(since).replace('Z', '+00:00'))
+    return {'Date': {'$gt': since}}
+
+
+def article_record(document):
+    """A News document as the sentiment stage reads it, like Node's JSON export."""
+    record = {key: document.get(key) for key in ('newsId', 'News headline', 'Ticker', 'Stock name', 'Source')}
+    record['_id'] = str(document['_id'])
+    date = document.get('Date')
+    if isinstance(date, datetime.datetime):
+        if date.tzinfo is not None:
+            date = date.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        date = date.isoformat(timespec='milliseconds') + 'Z'
+    record['Date'] = date
+    return record
+
+
+class NewsReader:
+    """Iterable over the News documents after a watermark, in _id order, `batch_size` per round-trip.
+
+    The documents of `retry` ({_id: attempts so far}, from load_retry) are
+    read first. `watermark` is the _id of the last document read after the
+    starting watermark (or that watermark), to be saved once the records are
+    processed, along with `unresolved()`.
+    """
+
+    def __init__(self, collection, since=None, batch_size=DEFAULT_BATCH_SIZE, retry=None):
+        self.collection = collection
+        self.filter = watermark_filter(since)
+        self.batch_size = batch_size
+        self.watermark = since
+        self.retry = dict(retry or {})
+        self.count = 0
+        self.pending = {}  # record_key -> _id of the classifiable records read
+
+    def _read(self, cursor):
+        for document in cursor:
+            self.count += 1
+            record = article_record(document)
+            if all(record.get(field) is not None for field in CLASSIFIED_FIELDS):
+                self.pending[record_key(record)] = record['_id']
+            yield record
+
+    def __iter__(self):
+        if self.retry:
+            retry_filter = {'_id': {'$in': [ObjectId(_id) for _id in self.retry]}}
+            yield from self._read(self.collection.find(retry_filter, PROJECTION).sort('_id', ASCENDING)
+                                  .batch_size(self.batch_size))
+        cursor = self.collection.find(self.filter, PROJECTION).sort('_id', ASCENDING).batch_size(self.batch_size)
+        for record in self._read(cursor):
+            self.watermark = ObjectId(record['_id'])
+            yield record
+        logging.info(f"Read {self.count} headlines from Mongo")
+
+    def unresolved(self, classified_ids):
+        """{_id: attempts} of the records read but not in `classified_ids` (record_key), to read again.
+
+        Records that failed MAX_RETRIES times are given up on.
+        """
+        unresolved = {}
+        for key, _id in self.pending.items():
+            if key in classified_ids:
+                continue
+            attempts = self.retry.get(_id, 0) + 1
+            if attempts >= MAX_RETRIES:
+                logging.warning(f"Giving up on headline {_id} after {attempts} failed runs")
+                continue
+            unresolved[_id] = attempts
+        if unresolved:
+            logging.info(f"{len(unresolved)} headlines could not be classified and will be read again")
+        return unresolved
+
+
+def load_watermark(path=DEFAULT_WATERMARK_PATH):
+    """The watermark saved by the last completed run, or None."""
+    try:
+        return read_json(path).get('since')
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.info(f"Error loading the sentiment watermark: {e}")
+        return None
+
+
+def load_retry(path=DEFAULT_WATERMARK_PATH):
+    """{_id: attempts} of the headlines the last run could not classify."""
+    try:
+        return read_json(path).get('retry') or {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.info(f"Error loading the sentiment watermark: {e}")
+        return {}
+
+
+def save_watermark(since, retry=None, path=DEFAULT_WATERMARK_PATH):
+    if since is None and not retry:
+        return
+    write_json_atomic(path, {'since': str(since) if isinstance(since, ObjectId) else since,
+                             'retry': retry or {},
+                             'savedAt': datetime.datetime.now().isoformat()})
@@ -4,8 +4,9 @@ import time
 import threading
 import os
 from datetime import datetime, timedelta
-import concurrent.futures
 
+from proxy_health import ProxyHealth
+from proxy_validator import validate_proxies
 
 
 # Get the directory of the current script
@@ -62,7 +63,7 @@ def get_proxies(url):
         print(f"Error retrieving proxies from {url}: {e}")
         return []
 
-def load_proxy_pool(min_size=1):
+def load_proxy_pool(min_size=1, health=None):
     proxy_pool = []
     for url in load_proxy_source_urls():
         proxy_pool.extend(get_proxies(url))
@@ -77,7 +78,10 @@ def load_proxy_pool(min_size=1):
         with open(working_proxies_file, "w") as file:
             for proxy in proxy_pool:
                 file.write(proxy + "\n")
-    return proxy_pool
+    # Best proxies first by their health records; proxies whose circuit is open are left out
+    if health is None:
+        health = ProxyHealth()
+    return health.rank(proxy_pool)
 
 def test_google_news(proxy):
     global last_tested_proxies
@@ -86,55 +90,34 @@ def test_google_news(proxy):
     if proxy in last_tested_proxies:
         return None
 
-    print(f"Testing proxy {proxy} ")  
-    try:
-        url = "http://httpbin.org/ip"
-        response = requests.get(url, timeout=10, proxies={"http": proxy, "https": proxy})
-        if response.status_code == 200:
-            print("Proxy working")
-        else:
-            print("Proxy does not work")
-            # Add the proxy to the start of the list
-            last_tested_proxies.insert(0, proxy)
-            # If the list has more than 50 proxies, remove the oldest one
-            if len(last_tested_proxies) > 50:
-                last_tested_proxies.pop()
-            return False  # If the proxy is not working, return False
-    except Exception as e:
-        print("Proxy does not work")
+    print(f"Testing proxy {proxy} ")
+    result = validate_proxies([proxy])[0]
+    if result['ok']:
+        print(f"Proxy {proxy} successfully accessed Google News RSS 😃")
+        return True
+    print(f"Proxy {proxy} does not work ({result['stage']}: {result['failure']})")
+    if result['stage'] in ('connect', 'http'):
         # Add the proxy to the start of the list
         last_tested_proxies.insert(0, proxy)
         # If the list has more than 50 proxies, remove the oldest one
         if len(last_tested_proxies) > 50:
             last_tested_proxies.pop()
-        return False  # If an exception occurs, the proxy is not working, return False
-
-    try:
-        # Attempting to get news for AAPL
-        print(f"Testing proxy {proxy} with Google News RSS")  # Add this line
-        url = "https://news.google.com/rss/search?q=AAPL"
-        response = requests.get(url, timeout=10, proxies={"http": proxy, "https": proxy})
-        if response.status_code == 200:
-            print(f"Proxy {proxy} successfully accessed Google News RSS 😃")
-            return True
-        else:
-            return False
-    except requests.exceptions.RequestException as e:
-        print(f"Error with proxy {proxy}: {e}")  # Modify this line
-        if "Failed to establish a new connection" in str(e) or "[Errno 54] Connection reset by peer" in str(e):
-            return None  # Return None if this specific error occurs
         return False
+    if result['failure'] in ('refused', 'unreachable'):
+        return None
+    return False
 
 
 
-def check_working_proxies():
+def check_working_proxies(health):
     print("Checking proxies for working status")
     while True:
         with open(working_proxies_file, "r") as file:
             working_proxies = [proxy.strip() for proxy in file.readlines()]
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            results = list(executor.map(test_google_news, working_proxies))
-        working_proxies = [proxy for proxy, result in zip(working_proxies, results) if result]
+        results = validate_proxies(working_proxies)
+        health.record_results(results)
+        health.save()
+        working_proxies = [result['proxy'] for result in results if result['ok']]
         with open(working_proxies_file, "w") as file:
             for proxy in working_proxies:
                 file.write(proxy + "\n")
@@ -145,7 +128,9 @@ def check_working_proxies():
         
         
 def main():
-    threading.Thread(target=check_working_proxies).start()
+    # Shared by both loops, so neither overwrites the records of the other when saving
+    health = ProxyHealth()
+    threading.Thread(target=check_working_proxies, args=(health,)).start()
     check_proxies_done.wait()  # Wait for the check to be done
     while True:
         if not check_proxies_done.is_set():
@@ -166,16 +151,19 @@ def main():
         if not proxies:  # If get_proxies returned an empty list, skip this iteration
             continue
         working_proxies_found = False
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:  # Add max_workers here
-            results = list(executor.map(test_google_news, proxies))
-        for proxy, result in zip(proxies, results):
-            with open(blacklist_file, "r") as file:
-                blacklist = file.readlines()
-            if proxy + "\n" in blacklist:
-                continue
+        with open(blacklist_file, "r") as file:
+            blacklist = file.readlines()
+        proxies = [proxy for proxy in proxies if proxy + "\n" not in blacklist]
+        # Every proxy of the list at once: dead ones fail the TCP stage within seconds
+        results = validate_proxies(proxies)
+        health.record_results(results)
+        health.save()
+        print(f"{sum(result['ok'] for result in results)} of {len(results)} proxies from {url} work")
+        for result in results:
+            proxy = result['proxy']
             with open(working_proxies_file, "r") as file:
                 working_proxies = file.readlines()
-            if result:
+            if result['ok']:
                 with open(working_proxies_file, "a") as file:
                     if proxy + "\n" not in working_proxies:
                         print(f"Adding new working proxy: {proxy}")
@@ -0,0 +1,212 @@
+"""Per-proxy health records, kept between runs and used to rank proxies.
+
+load_proxy_pool returned proxies in list order and the collector rotated them
+by ticker, so dead and slow proxies were tried as often as good ones.
+ProxyHealth keeps, for every proxy it has seen used or validated:
+
+    latency        EWMA (weight LATENCY_ALPHA) of the seconds successful requests took
+    outcomes       the last WINDOW outcomes, '1' success / '0' failure, oldest first
+    last_failure   class of the last failure ('timeout', 'refused', 'proxy_error',
+                   'rate_limited', ...) and its time
+    circuit        'closed', 'open' or 'half_open'
+
+A circuit opens after FAILURE_THRESHOLD consecutive failures and stays open
+for a cooldown that doubles with each trip (BASE_COOLDOWN up to MAX_COOLDOWN).
+Once the cooldown has passed the circuit is half open: one trial request at a
+time may use the proxy, and its outcome closes or reopens the circuit.
+
+rank() leaves out proxies with an open circuit and sorts the others by the
+expected time to a success, latency / success ratio, with PRIOR_LATENCY and
+PRIOR_RATIO standing in for proxies never used, so fast live routes come
+first and untried ones before known bad ones. Records are saved to
+proxyhealth.json next to workingproxies.txt; the methods are thread-safe.
+
+Usage:
+    health = ProxyHealth()
+    for proxy in health.rank(proxies):
+        started = time.monotonic()
+        try:
+            response = requests.get(url, proxies={"http": proxy, "https": proxy}, timeout=10)
+        except Exception as e:
+            health.record_failure(proxy, classify_failure(e))
+            continue
+        health.record_success(proxy, time.monotonic() - started)
+        break
+    health.save()
+"""
+
+import json
+import os
+import threading
+import time
+
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_HEALTH_PATH = os.path.join(script_dir, "proxyhealth.json")
+
+LATENCY_ALPHA = 0.3
+WINDOW = 20
+FAILURE_THRESHOLD = 3
+BASE_COOLDOWN = 300  # seconds
+MAX_COOLDOWN = 6 * 3600
+TRIAL_TIMEOUT = 60  # a half-open trial not reported within this is considered lost
+PRIOR_LATENCY = 3.0
+PRIOR_RATIO = 0.5
+MIN_RATIO = 0.05
+STALE_AFTER = 30 * 86400  # records unused this long are dropped on save
+
+
+def classify_failure(error):
+    """Failure class of an exception raised by a request through a proxy."""
+    import requests
+
+    if isinstance(error, requests.exceptions.ProxyError):
+        return "proxy_error"
+    if isinstance(error, requests.exceptions.SSLError):
+        return "tls"
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        if "refused" in str(error).lower():
+            return "refused"
+        return "unreachable"
+    if isinstance(error, requests.exceptions.HTTPError):
+        return "http_status"
+    if isinstance(error, (ValueError, KeyError)):
+        return "protocol"  # e.g. a proxy's error page instead of the JSON expected
+    return "error"
+
+
+def new_record():
+    return {"latency": None, "outcomes": "", "consecutive_failures": 0, "last_failure": None,
+            "last_failure_at": None, "circuit": "closed", "opened_at": None, "trips": 0,
+            "trial_at": None, "last_used": None}
+
+
+class ProxyHealth:
+    """Health records of proxies, loaded from and saved to a JSON file."""
+
+    def __init__(self, path=DEFAULT_HEALTH_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as file:
+                    self.records = json.load(file).get("proxies", {})
+            except (OSError, ValueError) as e:
+                print(f"Error loading proxy health from {path}: {e}")
+
+    def _record(self, proxy):
+        record = self.records.get(proxy)
+        if record is None:
+            record = self.records[proxy] = new_record()
+        return record
+
+    def _outcome(self, record, success, now):
+        record["outcomes"] = (record["outcomes"] + ("1" if success else "0"))[-WINDOW:]
+        record["last_used"] = now
+        record["trial_at"] = None
+
+    def record_success(self, proxy, latency, now=None):
+        now = now or time.time()
+        with self.lock:
+            record = self._record(proxy)
+            self._outcome(record, True, now)
+            previous = record["latency"]
+            record["latency"] = latency if previous is None else LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * previous
+            record["consecutive_failures"] = 0
+            record["circuit"] = "closed"
+            record["opened_at"] = None
+            record["trips"] = 0
+
+    def record_failure(self, proxy, failure, now=None):
+        now = now or time.time()
+        with self.lock:
+            record = self._record(proxy)
+            self._outcome(record, False, now)
+            record["consecutive_failures"] += 1
+            record["last_failure"] = failure
+            record["last_failure_at"] = now
+            if record["circuit"] == "half_open" or record["consecutive_failures"] >= FAILURE_THRESHOLD:
+                if record["circuit"] != "open":
+                    record["trips"] += 1
+                record["circuit"] = "open"
+                record["opened_at"] = now
+
+    def record_results(self, results, now=None):
+        """Record the result dicts of proxy_validator (cancelled probes are not outcomes)."""
+        for result in results:
+            if result["ok"]:
+                self.record_success(result["proxy"], result["latency"], now)
+            elif result["failure"] != "cancelled":
+                self.record_failure(result["proxy"], result["failure"], now)
+
+    def _cooldown(self, record):
+        return min(BASE_COOLDOWN * 2 ** max(record["trips"] - 1, 0), MAX_COOLDOWN)
+
+    def _state(self, record, now):
+        """Circuit state at `now`, moving an open circuit whose cooldown passed to half open."""
+        if record["circuit"] == "open" and now - record["opened_at"] >= self._cooldown(record):
+            record["circuit"] = "half_open"
+        return record["circuit"]
+
+    def allows(self, proxy, now=None):
+        """Whether a request may use the proxy now; a half-open proxy allows one trial at a time."""
+        now = now or time.time()
+        with self.lock:
+            record = self.records.get(proxy)
+            if record is None:
+                return True
+            state = self._state(record, now)
+            if state == "closed":
+                return True
+            if state == "half_open" and (record["trial_at"] is None or now - record["trial_at"] > TRIAL_TIMEOUT):
+                record["trial_at"] = now
+                return True
+            return False
+
+    def success_ratio(self, proxy):
+        record = self.records.get(proxy)
+        if not record or not record["outcomes"]:
+            return None
+        return record["outcomes"].count("1") / len(record["outcomes"])
+
+    def expected_cost(self, proxy):
+        """Expected seconds to a successful request: latency over success ratio."""
+        record = self.records.get(proxy)
+        latency = record["latency"] if record and record["latency"] is not None else PRIOR_LATENCY
+        ratio = self.success_ratio(proxy)
+        return latency / max(PRIOR_RATIO if ratio is None else ratio, MIN_RATIO)
+
+    def rank(self, proxies, now=None):
+        """Proxies whose circuit is not open, best first (ties keep the given order)."""
+        now = now or time.time()
+        with self.lock:
+            usable = [proxy for proxy in dict.fromkeys(proxies)
+                      if proxy not in self.records or self._state(self.records[proxy], now) != "open"]
+            return sorted(usable, key=self.expected_cost)
+
+    def summary(self):
+        with self.lock:
+            circuits = {}
+            for record in self.records.values():
+                circuits[record["circuit"]] = circuits.get(record["circuit"], 0) + 1
+            return {"proxies": len(self.records), "circuits": circuits}
+
+    def save(self, now=None):
+        """Write the records (dropping stale ones) through a temporary file and a rename."""
+        if not self.path:
+            return
+        now = now or time.time()
+        with self.lock:
+            self.records = {proxy: record for proxy, record in self.records.items()
+                            if now - (record["last_used"] or now) < STALE_AFTER}
+            data = {"savedAt": now, "proxies": self.records}
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temporary, "w") as file:
+                    json.dump(data, file)
+                os.replace(temporary, self.path)
+            except OSError as e:
+                print(f"Error saving proxy health to {self.path}: {e}")
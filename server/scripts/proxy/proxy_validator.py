@@ -0,0 +1,242 @@
+"""Asynchronous, staged validation of proxy lists.
+
+test_google_news checks one proxy with two sequential requests of up to 10 s
+each, so a list of thousands of free proxies takes hours on ten threads. Here
+every proxy goes through three stages, all proxies at once on one event loop:
+
+    connect   TCP connection to the proxy, with a short deadline: most of a
+              free list is dead and fails here in a few seconds
+    http      on that same connection, a plain GET through the proxy (HTTP_PROBE_URL)
+    target    a fresh connection fetching the target (Google News RSS by
+              default; CONNECT and TLS for https targets)
+
+A proxy stops at its first failing stage, so the slower probes only run for
+the survivors. Up to `concurrency` sockets are open at a time (capped below
+the open files limit). `want` cancels the rest once that many proxies passed,
+`deadline` once the whole run has taken that long.
+
+Each result is a dict: {'proxy', 'ok', 'stage' (where it stopped), 'failure'
+(None, or the class of failure: 'timeout', 'refused', 'unreachable',
+'http_status', 'tunnel', 'tls', 'protocol', 'unsupported', 'cancelled'),
+'latency' (seconds of the target fetch, when it passed)}.
+
+Usage:
+    results = validate_proxies(proxies, want=50)
+    working = [result['proxy'] for result in results if result['ok']]
+
+    python3 proxy_validator.py https://example.com/proxies.txt --want 50
+"""
+
+import argparse
+import asyncio
+import ssl
+import time
+import urllib.parse
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+HTTP_PROBE_URL = "http://httpbin.org/ip"
+DEFAULT_TARGET_URL = "https://news.google.com/rss/search?q=AAPL"
+DEFAULT_TIMEOUTS = {'connect': 3.0, 'http': 6.0, 'target': 8.0}
+DEFAULT_CONCURRENCY = 2000
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0 Safari/537.36"
+SUPPORTED_SCHEMES = ('http', 'https')
+
+
+class ProbeFailure(Exception):
+    def __init__(self, failure, message=''):
+        super().__init__(message or failure)
+        self.failure = failure
+
+
+def proxy_address(proxy):
+    """(host, port) of an HTTP proxy URL, or None for other kinds of proxies."""
+    parsed = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    if parsed.scheme not in SUPPORTED_SCHEMES or not parsed.hostname:
+        return None
+    try:
+        return parsed.hostname, parsed.port or 8080
+    except ValueError:
+        return None
+
+
+def socket_limit(concurrency):
+    """`concurrency`, lowered to leave headroom under the soft limit of open files."""
+    if resource is None:
+        return concurrency
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return concurrency
+    return max(1, min(concurrency, soft - 64))
+
+
+async def _read_status(reader):
+    """Status code of an HTTP response; the headers are consumed."""
+    line = await reader.readline()
+    parts = line.decode('latin-1').split()
+    if len(parts) < 2 or not parts[0].startswith('HTTP/') or not parts[1].isdigit():
+        raise ProbeFailure('protocol', f"Unexpected response {line[:40]!r}")
+    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+        pass
+    return int(parts[1])
+
+
+def _request(url, absolute):
+    parsed = urllib.parse.urlsplit(url)
+    target = url if absolute else (parsed.path or '/') + (f'?{parsed.query}' if parsed.query else '')
+    return (f"GET {target} HTTP/1.1\r\nHost: {parsed.netloc}\r\nUser-Agent: {USER_AGENT}\r\n"
+            f"Accept: */*\r\nConnection: close\r\n\r\n").encode('latin-1')
+
+
+async def _fetch_status(reader, writer, url):
+    """Status of `url` fetched through a connected proxy: CONNECT and TLS for https, an absolute GET otherwise."""
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme == 'https':
+        authority = f"{parsed.hostname}:{parsed.port or 443}"
+        writer.write(f"CONNECT {authority} HTTP/1.1\r\nHost: {authority}\r\n\r\n".encode('latin-1'))
+        await writer.drain()
+        status = await _read_status(reader)
+        if status != 200:
+            raise ProbeFailure('tunnel', f"CONNECT answered {status}")
+        await writer.start_tls(ssl.create_default_context(), server_hostname=parsed.hostname)
+        writer.write(_request(url, absolute=False))
+    else:
+        writer.write(_request(url, absolute=True))
+    await writer.drain()
+    return await _read_status(reader)
+
+
+def _close(writer):
+    try:
+        writer.close()
+    except Exception:
+        pass
+
+
+async def probe_proxy(proxy, target_url=DEFAULT_TARGET_URL, timeouts=None):
+    """Run one proxy through the connect, http and target stages; returns its result dict."""
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    result = {'proxy': proxy, 'ok': False, 'stage': 'connect', 'failure': None, 'latency': None}
+    address = proxy_address(proxy)
+    if address is None:
+        result['failure'] = 'unsupported'
+        return result
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(*address), timeouts['connect'])
+
+        result['stage'] = 'http'
+        status = await asyncio.wait_for(_fetch_status(reader, writer, HTTP_PROBE_URL), timeouts['http'])
+        _close(writer)
+        if status != 200:
+            raise ProbeFailure('http_status', f"HTTP probe answered {status}")
+
+        result['stage'] = 'target'
+        started = time.monotonic()
+
+        async def fetch_target():
+            nonlocal writer
+            reader, writer = await asyncio.open_connection(*address)
+            return await _fetch_status(reader, writer, target_url)
+
+        status = await asyncio.wait_for(fetch_target(), timeouts['target'])
+        if status != 200:
+            raise ProbeFailure('http_status', f"Target answered {status}")
+        result['ok'] = True
+        result['latency'] = time.monotonic() - started
+    except asyncio.TimeoutError:
+        result['failure'] = 'timeout'
+    except ProbeFailure as e:
+        result['failure'] = e.failure
+    except ConnectionRefusedError:
+        result['failure'] = 'refused'
+    except ssl.SSLError:
+        result['failure'] = 'tls'
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        result['failure'] = 'unreachable'
+    finally:
+        if writer is not None:
+            _close(writer)
+    return result
+
+
+async def probe_proxies(proxies, target_url=DEFAULT_TARGET_URL, timeouts=None, concurrency=DEFAULT_CONCURRENCY,
+                        want=None, deadline=None):
+    """Validate proxies concurrently. Results are in the order of `proxies` (duplicates dropped)."""
+    proxies = list(dict.fromkeys(proxies))
+    slots = asyncio.Semaphore(socket_limit(concurrency))
+
+    async def limited(proxy):
+        async with slots:
+            return await probe_proxy(proxy, target_url, timeouts)
+
+    tasks = {asyncio.ensure_future(limited(proxy)): proxy for proxy in proxies}
+    results = {}
+    passed = 0
+    stop_at = time.monotonic() + deadline if deadline else None
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = max(0.0, stop_at - time.monotonic()) if stop_at else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break  # deadline
+            for task in done:
+                result = task.result()
+                results[tasks[task]] = result
+                passed += result['ok']
+            if want and passed >= want:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    for proxy in proxies:
+        results.setdefault(proxy, {'proxy': proxy, 'ok': False, 'stage': None, 'failure': 'cancelled', 'latency': None})
+    return [results[proxy] for proxy in proxies]
+
+
+def validate_proxies(proxies, **options):
+    """Synchronous probe_proxies, for callers outside an event loop."""
+    return asyncio.run(probe_proxies(proxies, **options))
+
+
+def main():
+    from proxies import get_proxies, normalize_proxy
+
+    parser = argparse.ArgumentParser(description='Validate proxy lists (URLs of lists, or files) concurrently.')
+    parser.add_argument('sources', nargs='+', help='URLs or files of proxy lists, one proxy per line.')
+    parser.add_argument('--target', default=DEFAULT_TARGET_URL, help='URL the proxies must be able to fetch.')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Open sockets at most.')
+    parser.add_argument('--want', type=int, default=None, help='Stop once this many proxies passed.')
+    parser.add_argument('--deadline', type=float, default=None, help='Stop after this many seconds.')
+    args = parser.parse_args()
+
+    proxies = []
+    for source in args.sources:
+        if "://" in source:
+            proxies.extend(get_proxies(source))
+        else:
+            with open(source, "r") as file:
+                proxies.extend(filter(None, (normalize_proxy(line) for line in file)))
+
+    started = time.monotonic()
+    results = validate_proxies(proxies, target_url=args.target, concurrency=args.concurrency,
+                               want=args.want, deadline=args.deadline)
+    failures = {}
+    for result in results:
+        if result['ok']:
+            print(f"{result['proxy']} {result['latency']:.2f}s")
+        else:
+            failures[result['failure']] = failures.get(result['failure'], 0) + 1
+    print(f"{sum(result['ok'] for result in results)} of {len(results)} proxies passed in "
+          f"{time.monotonic() - started:.1f}s; failures: {failures}")
+
+
+if __name__ == "__main__":
+    main()
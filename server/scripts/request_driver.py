@@ -0,0 +1,202 @@
+"""Concurrent request driver with AIMD concurrency control.
+
+Provider calls run on a thread pool. How many may be in flight at once is
+decided by an additive-increase / multiplicative-decrease limiter: every
+successful call nudges the limit up, every overload signal (HTTP 429/503/529,
+rate limit or resource exhausted errors, request timeouts) cuts it in half and,
+when the provider sent a retry-after hint, pauses all new calls until then.
+This keeps the provider near its highest sustained throughput without piling
+retries onto it and tipping into a long lockout.
+
+The deadline of a call is the request timeout of the provider's client (see
+sentiment_providers): a call holds its slot until it has really ended, so a
+retry is never sent while the first attempt is still in flight. Errors must
+be raised by `fn`; a returned value, even None, counts as a success.
+
+The driver owns the thread pool its calls run on: build one per run, share it
+between the calls of the run so that the limiter keeps what it learned, and
+close it (or use it as a context manager) at the end. `fn` must not call
+`map` of the same driver.
+
+Usage:
+    with RequestDriver() as driver:
+        answers = driver.map(analyzer.complete, prompts)
+"""
+
+import concurrent.futures
+import datetime
+import email.utils
+import logging
+import random
+import threading
+import time
+
+
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MAX_CONCURRENCY = 32
+# Seconds, given to the provider clients as their request timeout
+DEFAULT_DEADLINE = 60.0
+DEFAULT_MAX_ATTEMPTS = 5
+# Never pause longer than this on a single retry-after hint
+MAX_PAUSE = 120.0
+
+OVERLOAD_STATUS_CODES = {429, 503, 529}
+OVERLOAD_ERROR_NAMES = {
+    'RateLimitError', 'OverloadedError', 'ResourceExhausted', 'ServiceUnavailable', 'TooManyRequests',
+}
+
+
+def _status_code(exc):
+    for candidate in (exc, getattr(exc, 'response', None)):
+        for attribute in ('status_code', 'http_status', 'status', 'code'):
+            value = getattr(candidate, attribute, None)
+            if callable(value):
+                continue
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header value (delta seconds or HTTP date)."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.datetime.now(when.tzinfo)).total_seconds())
+
+
+def retry_after_hint(exc):
+    """Return the retry-after delay carried by a provider exception, if any."""
+    hint = getattr(exc, 'retry_after', None)
+    if hint is not None:
+        return parse_retry_after(hint)
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or getattr(exc, 'headers', None)
+    if not headers:
+        return None
+    if headers.get('retry-after-ms') is not None:
+        delay = parse_retry_after(headers.get('retry-after-ms'))
+        return delay / 1000 if delay is not None else None
+    return parse_retry_after(headers.get('retry-after'))
+
+
+def is_overload(exc):
+    """True if the exception means the provider is throttling, overloaded or too slow to answer."""
+    if isinstance(exc, (DeadlineExceeded, TimeoutError)) or 'timeout' in type(exc).__name__.lower():
+        return True
+    if type(exc).__name__ in OVERLOAD_ERROR_NAMES:
+        return True
+    return _status_code(exc) in OVERLOAD_STATUS_CODES
+
+
+class DeadlineExceeded(Exception):
+    """A provider call did not answer within its deadline."""
+
+
+class AIMDLimiter:
+    """Concurrency limit adjusted by additive increase and multiplicative decrease."""
+
+    def __init__(self, initial=DEFAULT_INITIAL_CONCURRENCY, minimum=1, maximum=DEFAULT_MAX_CONCURRENCY,
+                 decrease=0.5):
+        self.limit = float(min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """Block until a call may start."""
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self.condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        """Mark a call as finished, whatever its outcome."""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        # Roughly +1 per window of `limit` successful calls
+        with self.condition:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def on_overload(self, retry_after=None):
+        with self.condition:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + min(retry_after, MAX_PAUSE))
+            logging.info(f"Provider overloaded, concurrency limit lowered to {int(self.limit)}")
+
+
+class RequestDriver:
+    """Run provider calls concurrently under an AIMD limiter, with retries."""
+
+    def __init__(self, limiter=None, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=1.0):
+        self.limiter = limiter or AIMDLimiter()
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retries = 0
+        self.callers = concurrent.futures.ThreadPoolExecutor(max_workers=self.limiter.maximum)
+
+    def _attempt(self, fn, item):
+        self.limiter.acquire()
+        try:
+            return fn(item)
+        finally:
+            self.limiter.release()
+
+    def call(self, fn, item):
+        """Call fn(item) with retries; returns None once every attempt failed."""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = self._attempt(fn, item)
+                self.limiter.on_success()
+                return result
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logging.info(f"Giving up after {attempt} attempts: {e}")
+                    return None
+                self.retries += 1
+                if is_overload(e):
+                    hint = retry_after_hint(e)
+                    self.limiter.on_overload(hint)
+                    delay = hint if hint is not None else self.backoff * 2 ** (attempt - 1)
+                else:
+                    logging.info(f"Request failed ({e}), retrying")
+                    delay = self.backoff * 2 ** (attempt - 1)
+                # Jitter so that throttled callers do not come back in lockstep
+                time.sleep(min(delay, MAX_PAUSE) * random.uniform(0.5, 1.0))
+        return None
+
+    def map(self, fn, items):
+        """Return [fn(item) for item in items], computed concurrently, in input order."""
+        items = list(items)
+        if not items:
+            return []
+        return list(self.callers.map(lambda item: self.call(fn, item), items))
+
+    def close(self):
+        """Shut the call pool down once the calls submitted have ended."""
+        self.callers.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,205 @@
+"""Append-only, memory-mapped history of the daily sentiment scores.
+
+scoreResults.json only holds the latest scores and is overwritten by every run.
+ScoreHistory keeps one row per day of a (day x ticker) float32 matrix:
+
+    scoreHistory.f32              rows of `capacity` float32 scores, NaN where a ticker has none
+    scoreHistory.f32.index.json   {"version", "first_day", "days", "capacity", "tickers": [...],
+                                   "file": name of the data file}
+
+The small index is the commit point: a day's row is written and synced first,
+then the index is replaced atomically, so readers never see a half-written
+day. Appending a day writes one row (O(1)); a rerun on the same day replaces
+the last row. New tickers take free columns; when the columns run out the
+matrix is rewritten with twice the capacity, which amortizes to O(1) too.
+The grown matrix goes to a new file (scoreHistory.f32.<capacity>) that the
+index switches to when it commits the new capacity, so a crash while growing
+leaves the old file and index in use.
+
+Readers map the file and slice it without copying: `history(ticker)` is a
+strided view of one column, `matrix()` the whole (days x tickers) table.
+
+Usage:
+    history = ScoreHistory('../data/scoreHistory.f32')
+    history.append(datetime.date.today(), {'AAPL': 61.5, 'MSFT': 48.0})
+    history.dates(), history.history('AAPL')
+
+    python3 score_history.py --append ../data/scoreResults.json
+    python3 score_history.py --ticker AAPL
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+
+import numpy as np
+
+from json_io import read_json, write_json_atomic
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'scoreHistory.f32')
+FORMAT_VERSION = 1
+INITIAL_CAPACITY = 256
+DTYPE = np.float32
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def day_number(day):
+    """Days since the Unix epoch of a date, datetime or ISO date string."""
+    if isinstance(day, str):
+        day = datetime.date.fromisoformat(day[:10])
+    elif isinstance(day, datetime.datetime):
+        day = day.date()
+    return (day - EPOCH).days
+
+
+def day_number_to_date(day):
+    return EPOCH + datetime.timedelta(days=day)
+
+
+class ScoreHistory:
+    """Day x ticker matrix of scores, appended one day at a time."""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self.index_path = f'{path}.index.json'
+        try:
+            self.index = read_json(self.index_path)
+        except FileNotFoundError:
+            self.index = {'version': FORMAT_VERSION, 'first_day': None, 'days': 0,
+                          'capacity': INITIAL_CAPACITY, 'tickers': []}
+        if self.index['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported score history version {self.index['version']} in {self.index_path}")
+        self.columns = {ticker: column for column, ticker in enumerate(self.index['tickers'])}
+
+    @property
+    def tickers(self):
+        return list(self.index['tickers'])
+
+    @property
+    def row_size(self):
+        return self.index['capacity'] * np.dtype(DTYPE).itemsize
+
+    @property
+    def data_path(self):
+        """The data file the index points to (indexes written before growth had a name: the history path)."""
+        return os.path.join(os.path.dirname(self.path), self.index.get('file') or os.path.basename(self.path))
+
+    def _commit(self):
+        write_json_atomic(self.index_path, self.index)
+
+    def _grow(self, needed):
+        """Rewrite the matrix with enough columns for `needed` tickers."""
+        capacity = self.index['capacity']
+        while capacity < needed:
+            capacity *= 2
+        grown = np.full((self.index['days'], capacity), np.nan, dtype=DTYPE)
+        grown[:, :self.index['capacity']] = self.matrix(all_columns=True)
+        previous = self.data_path
+        name = f'{os.path.basename(self.path)}.{capacity}'
+        with open(os.path.join(os.path.dirname(self.path), name), 'wb') as f:
+            f.write(grown.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        # The index switches file and capacity together: until it is replaced, the old pair stays in use
+        self.index['capacity'] = capacity
+        self.index['file'] = name
+        self._commit()
+        if os.path.exists(previous) and previous != self.data_path:
+            os.remove(previous)
+        logging.info(f"Score history grown to {capacity} tickers")
+
+    def append(self, day, scores):
+        """Record {ticker: score} as the scores of `day`.
+
+        `day` may be the last recorded day (its row is replaced) or any later
+        day (days in between are left empty); earlier days raise ValueError.
+        """
+        day = day_number(day)
+        if self.index['first_day'] is None:
+            self.index['first_day'] = day
+        row = day - self.index['first_day']
+        if row < self.index['days'] - 1 or row < 0:
+            raise ValueError(f"Score history already runs past {day_number_to_date(day)}")
+
+        new_tickers = [ticker for ticker in scores if ticker not in self.columns]
+        if len(self.columns) + len(new_tickers) > self.index['capacity']:
+            self._grow(len(self.columns) + len(new_tickers))
+        for ticker in new_tickers:
+            self.columns[ticker] = len(self.index['tickers'])
+            self.index['tickers'].append(ticker)
+
+        values = np.full(self.index['capacity'], np.nan, dtype=DTYPE)
+        for ticker, score in scores.items():
+            values[self.columns[ticker]] = score
+        # Rows of skipped days stay empty
+        gap = max(row - self.index['days'], 0)
+        first_row = min(row, self.index['days'])
+        with open(self.data_path, 'r+b' if os.path.exists(self.data_path) else 'wb') as f:
+            f.seek(first_row * self.row_size)
+            if gap:
+                f.write(np.full((gap, self.index['capacity']), np.nan, dtype=DTYPE).tobytes())
+            f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.index['days'] = row + 1
+        self._commit()
+
+    def matrix(self, all_columns=False):
+        """Read-only (days x tickers) view of the mapped file."""
+        days, capacity = self.index['days'], self.index['capacity']
+        if not days:
+            return np.empty((0, capacity if all_columns else len(self.columns)), dtype=DTYPE)
+        mapped = np.memmap(self.data_path, dtype=DTYPE, mode='r', shape=(days, capacity))
+        return mapped if all_columns else mapped[:, :len(self.columns)]
+
+    def history(self, ticker):
+        """Scores of one ticker, one per day (NaN where it had none); None for an unknown ticker."""
+        column = self.columns.get(ticker)
+        return None if column is None else self.matrix()[:, column]
+
+    def dates(self):
+        """The dates of the rows, as numpy datetime64[D]."""
+        first_day = self.index['first_day'] or 0
+        return np.arange(first_day, first_day + self.index['days']).astype('datetime64[D]')
+
+
+def append_score_file(history_path, scores_path, day=None):
+    """Append the scores of a scoreResults.json file to the history, as the scores of `day` (default: today)."""
+    try:
+        scores = {entry['Ticker']: entry['Score'] for entry in read_json(scores_path) if entry.get('Ticker')}
+        ScoreHistory(history_path).append(day or datetime.date.today(), scores)
+        logging.info(f"Appended {len(scores)} scores to the score history {history_path}")
+    except Exception as e:
+        logging.info(f"Error appending to the score history: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Append to or read the daily score history.')
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH, help='Score history file.')
+    parser.add_argument('--append', default=None, metavar='SCORES', help='scoreResults.json file to append as today.')
+    parser.add_argument('--day', default=None, help='Date (YYYY-MM-DD) of the appended scores (default: today).')
+    parser.add_argument('--ticker', default=None, help='Print the history of one ticker.')
+    args = parser.parse_args()
+
+    if args.append:
+        logging.basicConfig(level=logging.INFO)
+        append_score_file(args.history, args.append, args.day)
+    history = ScoreHistory(args.history)
+    if args.ticker:
+        scores = history.history(args.ticker)
+        if scores is None:
+            parser.exit(1, f"No history for {args.ticker}\n")
+        print(json.dumps([
+            {'day': str(day), 'score': None if np.isnan(score) else round(float(score), 2)}
+            for day, score in zip(history.dates(), scores)
+        ], indent=4))
+    elif not args.append:
+        print(f"{history.index['days']} days from {history.dates()[:1]}, {len(history.tickers)} tickers")
+
+
+if __name__ == '__main__':
+    main()
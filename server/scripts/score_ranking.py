@@ -0,0 +1,81 @@
+"""Small, versioned top-K ranking of the sentiment scores, for the Node consumers.
+
+The AI Fund code used to load the whole scoreResults.json and sort it to pick
+five tickers. The sentiment scripts now also publish:
+
+    {"generation": 42, "generatedAt": "...", "k": 25,
+     "universes": {"all": [{"Ticker", "Stock Name", "Score"}, ...], "held": [...], "strategies": [...]}}
+
+Each universe holds its K best scores, picked with a heap, best first (ties in
+score file order, as a stable sort would). The generation goes up by one with
+every publication and the file is swapped in atomically, so a consumer only
+re-reads it when it changed (services/sentimentRankingService.js). The
+generation is written first, so that the consumer can compare it from the
+first bytes of the file.
+
+The 'held' and 'strategies' universes come from the priority list (see
+sentiment_priority) and are only published when it names tickers.
+"""
+
+import datetime
+import heapq
+import logging
+import os
+
+from json_io import read_json, write_json_atomic
+from sentiment_priority import HELD, STRATEGY, TIER_NAMES
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RANKING_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'scoreRanking.json')
+DEFAULT_TOP_K = 25
+
+
+def top_k(scores, k, tickers=None):
+    """The `k` best score records, best first, optionally restricted to `tickers`."""
+    candidates = [entry for entry in scores if tickers is None or str(entry.get('Ticker')).upper() in tickers]
+    return heapq.nlargest(k, candidates, key=lambda entry: entry['Score'])
+
+
+def priority_universes(priorities):
+    """{universe: set of tickers} of the held and strategy tickers of a priority list."""
+    universes = {}
+    for ticker, tier in priorities.items():
+        if tier in (HELD, STRATEGY):
+            universes.setdefault(TIER_NAMES[tier], set()).add(ticker)
+    return universes
+
+
+def read_generation(path):
+    try:
+        return int(read_json(path).get('generation', 0))
+    except Exception:
+        return 0
+
+
+def publish_ranking(path, scores, k=DEFAULT_TOP_K, universes=None):
+    """Publish the top-`k` scores overall and of each of `universes` ({name: tickers}). Returns the generation."""
+    generation = read_generation(path) + 1
+    ranking = {'all': top_k(scores, k)}
+    for name, tickers in (universes or {}).items():
+        ranking[name] = top_k(scores, k, tickers)
+    write_json_atomic(path, {
+        'generation': generation,
+        'generatedAt': datetime.datetime.now().isoformat(),
+        'k': k,
+        'universes': {
+            name: [{'Ticker': entry['Ticker'], 'Stock Name': entry.get('Stock Name'), 'Score': entry['Score']}
+                   for entry in entries]
+            for name, entries in ranking.items()
+        },
+    })
+    logging.info(f"Published ranking generation {generation} to {path}")
+    return generation
+
+
+def publish_ranking_file(path, scores_path, k=DEFAULT_TOP_K, universes=None):
+    """Publish the ranking of a scoreResults.json file; errors are logged, not raised."""
+    try:
+        return publish_ranking(path, read_json(scores_path), k, universes)
+    except Exception as e:
+        logging.info(f"Error publishing the score ranking: {e}")
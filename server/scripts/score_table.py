@@ -0,0 +1,193 @@
+"""Columnar table of classified headlines and vectorized rolling-window scores.
+
+The classified headlines are loaded once into typed arrays:
+
+    ticker   int32 code into `tickers`
+    day      int32 days since the Unix epoch (UTC)
+    verdict  int8: 1 YES, -1 NO, 0 UNKNOWN
+
+and every ticker's daily counts are laid out as a (ticker x day) matrix with a
+single bincount. Rolling windows are differences of cumulative sums along the
+day axis, so the positive ratio, story count and z-score of every ticker, for
+every window and every day, come out of one vectorized pass.
+
+The z-score compares a window's positive count with the ticker's own positive
+rate over the whole history (binomial standard error): far above 0 means an
+unusually positive week for that name, not just a name that is always liked.
+
+Each story counts once per stock, as in calculate_sentiment_score. Records
+without a usable Date are left out, as in the news archive: they have no day.
+
+Usage:
+    table = HeadlineTable.from_file('../data/sentimentResults.json')
+    scores = rolling_scores(table)
+    scores['ratio'][7][table.code('AAPL')]     # 7-day ratio of AAPL, per day
+
+    python3 score_table.py ../data/sentimentResults.json --windows 1 7 30 --ticker AAPL
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+
+from news_records import article_id, article_timestamp
+from sentiment_stream import iter_json_records
+
+
+DEFAULT_WINDOWS = (1, 7, 30)
+VERDICT_CODES = {'YES': 1, 'NO': -1, 'UNKNOWN': 0}
+
+
+class HeadlineTable:
+    """Classified headlines as parallel typed arrays."""
+
+    def __init__(self, tickers, ticker, day, verdict):
+        self.tickers = np.asarray(tickers)
+        self.ticker = np.asarray(ticker, dtype=np.int32)
+        self.day = np.asarray(day, dtype=np.int32)
+        self.verdict = np.asarray(verdict, dtype=np.int8)
+        self._codes = {str(name): code for code, name in enumerate(self.tickers)}
+
+    def __len__(self):
+        return len(self.ticker)
+
+    def code(self, ticker):
+        """Code of a ticker, or None if it has no headline."""
+        return self._codes.get(ticker)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the table from classified records, counting each story once per stock."""
+        codes = {}
+        ticker, day, verdict = [], [], []
+        counted = set()
+        undated = 0
+        for entry in records:
+            sentiment = entry.get('Sentiment')
+            if entry.get('Ticker') is None or entry.get('Stock name') is None or sentiment is None:
+                continue
+            timestamp = article_timestamp(entry)
+            if not timestamp:
+                undated += 1
+                continue
+            story = (entry.get('Stock name'), entry.get('Ticker'), entry.get('Story') or article_id(entry))
+            if story in counted:
+                continue
+            counted.add(story)
+            ticker.append(codes.setdefault(entry['Ticker'], len(codes)))
+            day.append(int(timestamp // 86400))
+            verdict.append(VERDICT_CODES.get(str(sentiment).upper(), 0))
+        if undated:
+            logging.info(f"Skipped {undated} classified headlines without a date")
+        return cls(list(codes) or np.empty(0, dtype=str), ticker, day, verdict)
+
+    @classmethod
+    def from_file(cls, path):
+        """Build the table from a JSON array or NDJSON results file, read incrementally."""
+        return cls.from_records(iter_json_records(path))
+
+
+def daily_matrix(table, weights=None):
+    """(ticker x day) matrix of counts (or summed weights), and the first day index."""
+    if not len(table):
+        return np.zeros((len(table.tickers), 0)), 0
+    first_day = int(table.day.min())
+    days = int(table.day.max()) - first_day + 1
+    cells = table.ticker.astype(np.int64) * days + (table.day - first_day)
+    matrix = np.bincount(cells, weights=weights, minlength=len(table.tickers) * days)
+    return matrix.reshape(len(table.tickers), days), first_day
+
+
+def rolling_sum(matrix, window):
+    """Sum over the trailing `window` days (inclusive) of every cell, along the day axis."""
+    cumulative = np.cumsum(matrix, axis=1)
+    rolled = cumulative.copy()
+    rolled[:, window:] -= cumulative[:, :-window]
+    return rolled
+
+
+def rolling_scores(table, windows=DEFAULT_WINDOWS):
+    """Rolling counts, positive ratios and z-scores for every ticker, window and day.
+
+    Returns {'first_day', 'days', 'count': {window: matrix}, 'positive': {...},
+    'ratio': {...}, 'zscore': {...}} where matrices are (ticker x day) and
+    ratios/z-scores are NaN where a window has no headline.
+    """
+    counts, first_day = daily_matrix(table)
+    positives, _ = daily_matrix(table, (table.verdict == 1).astype(np.float64))
+
+    # Each ticker's positive rate over its whole history is the baseline of the z-score
+    totals = counts.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base_rate = np.where(totals > 0, positives.sum(axis=1, keepdims=True) / totals, np.nan)
+
+    scores = {'first_day': first_day, 'days': counts.shape[1], 'count': {}, 'positive': {}, 'ratio': {}, 'zscore': {}}
+    for window in windows:
+        count = rolling_sum(counts, window)
+        positive = rolling_sum(positives, window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(count > 0, positive / count, np.nan)
+            spread = np.sqrt(count * base_rate * (1 - base_rate))
+            zscore = np.where((count > 0) & (spread > 0), (positive - count * base_rate) / spread, np.nan)
+        scores['count'][window] = count
+        scores['positive'][window] = positive
+        scores['ratio'][window] = ratio
+        scores['zscore'][window] = zscore
+    return scores
+
+
+def _number(value, digits=4):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def latest_snapshot(table, scores, day=None):
+    """Per-ticker records of every window's count, ratio and z-score on `day` (default: the last day)."""
+    column = scores['days'] - 1 if day is None else day - scores['first_day']
+    snapshot = []
+    for code, ticker in enumerate(table.tickers):
+        record = {'Ticker': str(ticker)}
+        for window in scores['count']:
+            record[f'count_{window}d'] = int(scores['count'][window][code, column])
+            record[f'ratio_{window}d'] = _number(scores['ratio'][window][code, column])
+            record[f'zscore_{window}d'] = _number(scores['zscore'][window][code, column])
+        snapshot.append(record)
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rolling-window sentiment scores over the classified headlines.')
+    parser.add_argument('input', help='Classified headlines (JSON array or NDJSON).')
+    parser.add_argument('--windows', type=int, nargs='+', default=list(DEFAULT_WINDOWS), help='Window lengths in days.')
+    parser.add_argument('--ticker', default=None, help='Print the daily history of one ticker instead of the snapshot.')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = HeadlineTable.from_file(args.input)
+    loaded = time.perf_counter()
+    scores = rolling_scores(table, args.windows)
+    computed = time.perf_counter()
+    print(f"{len(table)} stories, {len(table.tickers)} tickers, {scores['days']} days: "
+          f"loaded in {loaded - started:.3f}s, scored in {(computed - loaded) * 1000:.1f}ms", file=sys.stderr)
+
+    if args.ticker:
+        code = table.code(args.ticker)
+        if code is None:
+            sys.exit(f"No headline for {args.ticker}")
+        history = []
+        for column in range(scores['days']):
+            record = {'day': str(np.datetime64(scores['first_day'] + column, 'D'))}
+            for window in args.windows:
+                record[f'ratio_{window}d'] = _number(scores['ratio'][window][code, column])
+                record[f'zscore_{window}d'] = _number(scores['zscore'][window][code, column])
+            history.append(record)
+        print(json.dumps(history, indent=4))
+    else:
+        print(json.dumps(latest_snapshot(table, scores), indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Batched headline classification.
+
+Instead of one completion request per headline, N numbered headlines go into a
+single prompt and the model answers one line per headline in a fixed schema:
+
+    <number>|<tag>|<YES, NO or UNKNOWN>|<one short sentence>
+
+Answers are matched back by tag first (so a renumbered or reordered answer is
+still understood) and by position otherwise. Headlines missing from the answer
+are re-queued into the next round, and whatever is still missing after the last
+round is classified one by one with the analyzer's single-headline path.
+"""
+
+import hashlib
+import logging
+import re
+
+from news_records import article_id
+
+
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_MAX_ROUNDS = 3
+# Completion budget per answered line, plus some slack for the whole answer
+TOKENS_PER_ITEM = 40
+TOKENS_OVERHEAD = 50
+
+BATCH_PROMPT = """Forget all your previous instructions. Pretend you are a financial expert. You are a financial expert with stock recommendation experience. Below are numbered news headlines, one per line, in the format number|tag|ticker|headline. For every headline, answer “YES” if good news for the ticker, “NO” if bad news, or “UNKNOWN” if uncertain, then elaborate with one short and concise sentence. Reply with exactly one line per headline, in the same order, in the format number|tag|answer|sentence and nothing else.
+"""
+
+ANSWER_RE = re.compile(
+    r'^\W*(\d+)\s*[|.):]\s*(?:([0-9a-f]{8})\s*\|\s*)?(YES|NO|UNKNOWN)\b\s*[|:\-–]?\s*(.*)$',
+    re.IGNORECASE,
+)
+
+
+def item_tag(article):
+    """Short, stable tag identifying an article (and its ticker) inside a batch prompt."""
+    key = f"{article_id(article)}|{article.get('Ticker')}"
+    return hashlib.sha1(key.encode()).hexdigest()[:8]
+
+
+def build_batch_prompt(articles, prompt=BATCH_PROMPT):
+    """Return the prompt asking for a verdict on every article, numbered from 1."""
+    lines = []
+    for number, article in enumerate(articles, start=1):
+        headline = ' '.join(str(article.get('News headline')).split())
+        lines.append(f"{number}|{item_tag(article)}|{article.get('Ticker')}|{headline}")
+    return prompt + '\n'.join(lines)
+
+
+def parse_batch_reply(reply, articles):
+    """Map the answer lines of `reply` back to positions in `articles`.
+
+    Returns {position: (sentiment, description)}. Lines are matched by tag when
+    the tag is known and unambiguous, by number otherwise; the first answer for
+    a position wins.
+    """
+    positions_by_tag = {}
+    for position, article in enumerate(articles):
+        positions_by_tag.setdefault(item_tag(article), []).append(position)
+
+    verdicts = {}
+    for line in (reply or '').splitlines():
+        match = ANSWER_RE.match(line.strip())
+        if not match:
+            continue
+        number, tag, sentiment, description = match.groups()
+        tagged = positions_by_tag.get((tag or '').lower(), [])
+        if len(tagged) == 1:
+            position = tagged[0]
+        elif 1 <= int(number) <= len(articles):
+            position = int(number) - 1
+        else:
+            continue
+        verdicts.setdefault(position, (sentiment.upper(), description.strip().lstrip('|').strip()))
+    return verdicts
+
+
+class BatchClassifier:
+    """Classify articles N at a time through a `complete(prompt, max_tokens)` callable.
+
+    `fallback(headline)` is the single-headline classifier returning
+    (sentiment, description) or None; it handles what batching could not.
+    With a `driver` (see request_driver.RequestDriver) the batches of a round
+    are sent concurrently.
+    """
+
+    def __init__(self, complete, batch_size=DEFAULT_BATCH_SIZE, max_rounds=DEFAULT_MAX_ROUNDS, fallback=None,
+                 max_tokens=None, prompt=BATCH_PROMPT, driver=None):
+        self.complete = complete
+        self.driver = driver
+        self.batch_size = batch_size
+        self.max_rounds = max_rounds
+        self.fallback = fallback
+        self.max_tokens = max_tokens
+        self.prompt = prompt
+        self.requests = 0
+
+    def _tokens_for(self, count):
+        tokens = TOKENS_OVERHEAD + TOKENS_PER_ITEM * count
+        return min(tokens, self.max_tokens) if self.max_tokens else tokens
+
+    def _map(self, fn, items):
+        if self.driver is not None:
+            return self.driver.map(fn, items)
+        return [fn(item) for item in items]
+
+    def classify_batch(self, articles):
+        """Send one batch and return {position: (sentiment, description)} for what was answered."""
+        reply = self.complete(build_batch_prompt(articles, self.prompt), self._tokens_for(len(articles)))
+        if reply is None:
+            return {}
+        return parse_batch_reply(reply, articles)
+
+    def classify(self, articles):
+        """Classify `articles`; returns {index in articles: (sentiment, description)}."""
+        verdicts = {}
+        pending = list(range(len(articles)))
+        for round_number in range(1, self.max_rounds + 1):
+            if not pending:
+                break
+            missing = []
+            batches = [pending[start:start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+            self.requests += len(batches)
+            answers = self._map(self.classify_batch, [[articles[i] for i in batch] for batch in batches])
+            for batch, answered in zip(batches, answers):
+                answered = answered or {}
+                for position, index in enumerate(batch):
+                    if position in answered:
+                        verdicts[index] = answered[position]
+                    else:
+                        missing.append(index)
+            if missing:
+                logging.info(f"Batch round {round_number}: {len(missing)} headlines missing from the answers, re-queueing")
+            pending = missing
+
+        if pending and self.fallback is not None:
+            logging.info(f"Classifying {len(pending)} remaining headlines one by one")
+            self.requests += len(pending)
+            answers = self._map(self.fallback, [articles[index].get('News headline') for index in pending])
+            for index, verdict in zip(pending, answers):
+                if verdict is not None:
+                    verdicts[index] = verdict
+
+        logging.info(f"Classified {len(verdicts)}/{len(articles)} headlines with {self.requests} requests")
+        return verdicts
@@ -0,0 +1,141 @@
+"""Persistent, content-addressed cache of sentiment verdicts.
+
+Verdicts are keyed by (hash of the canonical headline, ticker, model, prompt
+version), so the same text is only ever sent to a provider once per ticker,
+model and prompt, and changing either invalidates the cache naturally. The
+ticker is part of the key because the fan-in prompt asks for a verdict per
+ticker: good news for one stock can be bad news for another. The cache is a
+SQLite file; lookups and inserts are done in bulk.
+
+Usage:
+    cache = SentimentCache(path, model='claude-v1', prompt_version='1')
+    verdicts = classify_with_cache(cache, articles, classify)
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+from news_records import canonical_headline
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'sentimentCache.sqlite3')
+DEFAULT_MAX_AGE_DAYS = 90
+# Stay well under SQLite's limit on bound parameters per statement
+LOOKUP_CHUNK = 500
+
+
+def headline_hash(headline):
+    """SHA-256 of the canonical form of a headline."""
+    return hashlib.sha256(canonical_headline(headline).encode()).hexdigest()
+
+
+class SentimentCache:
+    """Verdict store for one (model, prompt version) pair."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, model='', prompt_version=''):
+        self.path = path
+        self.model = model
+        self.prompt_version = prompt_version
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(verdicts)")]
+        if columns and 'ticker' not in columns:
+            # Verdicts cached before they were kept per ticker may belong to another ticker
+            logging.info("Dropping the sentiment cache of verdicts not keyed by ticker")
+            self.connection.execute("DROP TABLE verdicts")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                headline_hash TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                sentiment TEXT NOT NULL,
+                description TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (headline_hash, ticker, model, prompt_version)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS verdicts_created_at ON verdicts (created_at)")
+        self.connection.commit()
+
+    def get_many(self, keys):
+        """Return {(headline, ticker): (sentiment, description)} for the cached (headline, ticker) pairs."""
+        hashes = {}
+        for headline, ticker in keys:
+            hashes.setdefault(headline_hash(headline), []).append((headline, ticker))
+        found = {}
+        digests = list(hashes)
+        for start in range(0, len(digests), LOOKUP_CHUNK):
+            chunk = digests[start:start + LOOKUP_CHUNK]
+            rows = self.connection.execute(
+                f"SELECT headline_hash, ticker, sentiment, description FROM verdicts "
+                f"WHERE model = ? AND prompt_version = ? AND headline_hash IN ({','.join('?' * len(chunk))})",
+                [self.model, self.prompt_version, *chunk],
+            )
+            for digest, ticker, sentiment, description in rows:
+                for headline, wanted in hashes[digest]:
+                    if str(wanted) == ticker:
+                        found[(headline, wanted)] = (sentiment, description)
+        return found
+
+    def put_many(self, verdicts):
+        """Store {(headline, ticker): (sentiment, description)}."""
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (headline_hash(headline), str(ticker), self.model, self.prompt_version, sentiment, description, now)
+                for (headline, ticker), (sentiment, description) in verdicts.items()
+            ],
+        )
+        self.connection.commit()
+
+    def evict(self, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """Drop verdicts older than `max_age_days`, for every model and prompt version."""
+        cursor = self.connection.execute(
+            "DELETE FROM verdicts WHERE created_at < ?", (time.time() - max_age_days * 86400,)
+        )
+        self.connection.commit()
+        if cursor.rowcount:
+            logging.info(f"Evicted {cursor.rowcount} cached verdicts older than {max_age_days} days")
+        return cursor.rowcount
+
+    def close(self):
+        self.connection.close()
+
+
+def classify_with_cache(cache, articles, classify):
+    """Classify articles, only calling the provider for (headline, ticker) pairs missing from the cache.
+
+    `classify(articles)` returns {index: (sentiment, description)}; so does this
+    function, with indexes into `articles`. New verdicts are written back.
+    """
+    keys = [(article.get('News headline'), article.get('Ticker')) for article in articles]
+    cached = cache.get_many(keys)
+    verdicts = {}
+    misses = []
+    for index, key in enumerate(keys):
+        verdict = cached.get(key)
+        if verdict is not None:
+            verdicts[index] = verdict
+        else:
+            misses.append(index)
+    cache.hits += len(verdicts)
+    cache.misses += len(misses)
+    logging.info(f"Sentiment cache: {len(verdicts)} hits, {len(misses)} misses")
+
+    if misses:
+        answered = classify([articles[index] for index in misses])
+        fresh = {}
+        for position, verdict in answered.items():
+            if verdict is None:
+                continue
+            verdicts[misses[position]] = verdict
+            fresh[keys[misses[position]]] = verdict
+        cache.put_many(fresh)
+    return verdicts
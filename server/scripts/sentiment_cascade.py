@@ -0,0 +1,100 @@
+"""Confidence-based cascade: local lexicon first, LLM only for ambiguous headlines.
+
+Every headline is scored by local_sentiment.LocalSentimentEngine. Headlines
+whose compound score falls inside the uncertainty band (exclusive) are escalated
+to the LLM classifier; the others keep the local verdict. An optional audit
+rate also escalates a random share of confident headlines, so that agreement
+between the two tiers outside the band keeps being measured.
+
+Each run records the escalation rate, the agreement rate between local and LLM
+verdicts, timings and an estimated cost per headline.
+"""
+
+import logging
+import random
+import time
+
+from local_sentiment import LocalSentimentEngine
+
+
+DEFAULT_BAND = (-0.5, 0.5)
+DEFAULT_AUDIT_RATE = 0.0
+# Rough provider cost of classifying one headline in a batched request, in USD
+DEFAULT_LLM_COST_PER_HEADLINE = 0.0002
+
+
+class CascadeAnalyzer:
+    """Route headlines between the local engine and an LLM classifier."""
+
+    def __init__(self, engine=None, band=DEFAULT_BAND, audit_rate=DEFAULT_AUDIT_RATE,
+                 llm_cost_per_headline=DEFAULT_LLM_COST_PER_HEADLINE, seed=None):
+        self.engine = engine or LocalSentimentEngine()
+        self.band = band
+        self.audit_rate = audit_rate
+        self.llm_cost_per_headline = llm_cost_per_headline
+        self.random = random.Random(seed)
+        self.stats = {
+            'headlines': 0,
+            'escalated': 0,
+            'audited': 0,
+            'llm_answered': 0,
+            'agreements': 0,
+            'local_seconds': 0.0,
+            'llm_seconds': 0.0,
+        }
+
+    def needs_llm(self, score):
+        """True if a local compound score is inside the uncertainty band."""
+        low, high = self.band
+        return low < score < high
+
+    def classify_articles(self, articles, classify):
+        """Return {index: (sentiment, description)}, calling `classify(articles)` only for escalated ones."""
+        started = time.perf_counter()
+        local = self.engine.classify([article.get('News headline') for article in articles])
+        self.stats['local_seconds'] += time.perf_counter() - started
+
+        verdicts = {}
+        escalated = []
+        for index, (sentiment, description, score) in enumerate(local):
+            if self.needs_llm(score):
+                escalated.append(index)
+                continue
+            if self.audit_rate and self.random.random() < self.audit_rate:
+                escalated.append(index)
+                self.stats['audited'] += 1
+            verdicts[index] = (sentiment, description)
+
+        started = time.perf_counter()
+        answered = classify([articles[index] for index in escalated]) if escalated else {}
+        self.stats['llm_seconds'] += time.perf_counter() - started
+
+        for position, verdict in answered.items():
+            if verdict is None:
+                continue
+            index = escalated[position]
+            self.stats['llm_answered'] += 1
+            if verdict[0].upper() == local[index][0]:
+                self.stats['agreements'] += 1
+            verdicts[index] = verdict
+
+        self.stats['headlines'] += len(articles)
+        self.stats['escalated'] += len(escalated)
+        logging.info(f"Cascade: {len(escalated)}/{len(articles)} headlines escalated to the LLM")
+        return verdicts
+
+    def summary(self):
+        """Escalation rate, agreement rate, timings and cost per headline so far."""
+        stats = self.stats
+        headlines = stats['headlines'] or 1
+        llm_cost = stats['llm_answered'] * self.llm_cost_per_headline
+        return dict(
+            stats,
+            band=list(self.band),
+            escalation_rate=round(stats['escalated'] / headlines, 4),
+            agreement_rate=round(stats['agreements'] / stats['llm_answered'], 4) if stats['llm_answered'] else None,
+            estimated_cost=round(llm_cost, 6),
+            cost_per_headline=round(llm_cost / headlines, 8),
+            local_seconds=round(stats['local_seconds'], 4),
+            llm_seconds=round(stats['llm_seconds'], 4),
+        )
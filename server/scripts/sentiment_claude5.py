@@ -1,11 +1,26 @@
 import os
-import json
-import anthropic
-import datetime
 from dotenv import load_dotenv
 import argparse
 import logging
 import sys
+import functools
+
+from json_io import load_json, save_json
+from news_columns import load_records
+from news_records import record_key, without_story
+from request_driver import DEFAULT_DEADLINE, DEFAULT_MAX_CONCURRENCY, AIMDLimiter, RequestDriver
+from score_history import DEFAULT_HISTORY_PATH, append_score_file
+from score_ranking import DEFAULT_RANKING_PATH, DEFAULT_TOP_K, priority_universes, publish_ranking, publish_ranking_file
+from sentiment_batch import DEFAULT_BATCH_SIZE, BatchClassifier
+from sentiment_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_AGE_DAYS, SentimentCache, classify_with_cache
+from sentiment_cascade import DEFAULT_AUDIT_RATE, DEFAULT_BAND, CascadeAnalyzer
+from sentiment_fanin import FanInClassifier, group_by_headline
+from sentiment_metrics import DEFAULT_METRICS_PATH, CallRecorder, append_run_summary, instrument
+from sentiment_priority import load_priority_list, process_by_priority
+from sentiment_providers import ClaudeProvider, build_router, normalize_reply
+from sentiment_scores import DEFAULT_HALF_LIVES, DEFAULT_STATE_PATH, DecayedScoreAggregator
+from sentiment_stream import DEFAULT_CHUNK_SIZE, ScoreAccumulator, merge_results, stream_sentiment
+from story_clusters import DEFAULT_STORY_THRESHOLD, assign_stories, spread_story_verdicts
 
 
 # Load .env file
@@ -26,129 +41,272 @@ logging.basicConfig(
 
 logging.getLogger().setLevel(logging.INFO)
 
+MODEL = 'claude-v1'
+# Bump when the prompts change so that cached verdicts are not reused
+PROMPT_VERSION = '2'
+
 
 
 class SentimentAnalyzer:
-    def __init__(self, api_key):
-        self.claude = anthropic.Client(api_key=api_key)
+    def __init__(self, api_key=None, provider=None):
+        # Any sentiment_providers provider (or a WeightedRouter) can stand in for Claude
+        self.provider = provider or ClaudeProvider(api_key, MODEL)
+
+    def complete(self, text, max_tokens=100):
+        """Send one completion request and return the raw answer; errors are raised for the request driver."""
+        return self.provider.complete(text, max_tokens)
 
     def analyze_sentiment(self, headline):
         prompt_base = """Forget all your previous instructions. Pretend you are a financial expert. You are a financial expert with stock recommendation experience. Answer “YES” if good news, “NO” if bad news, or “UNKNOWN” if uncertain in the first line. Then elaborate with one short and concise sentence on the next line. """
-        prompt = f'{anthropic.HUMAN_PROMPT}{prompt_base} {headline} {anthropic.AI_PROMPT}'
-        try:
-            response = self.claude.completion(
-                prompt=prompt,
-                stop_sequences=[anthropic.HUMAN_PROMPT],
-                model='claude-v1',
-                max_tokens_to_sample=100,
-                temperature=0
-            )
-            sentiment = response['completion']
-            return sentiment
-        except Exception as e:
-            logging.info(f"Error during sentiment analysis: {e}")
+        return self.complete(f'{prompt_base} {headline}')
+
+    def classify_headline(self, headline):
+        """Return (sentiment, description) for one headline, or None."""
+        sentiment = self.analyze_sentiment(headline)
+        if sentiment is None:
             return None
+        return normalize_reply(sentiment)
+
+    def classify_articles(self, articles, batch_size=1, driver=None, fan_in=False):
+        """Return {index: (sentiment, description)} for the articles the provider answered.
 
-    def process_news(self, news):
-        """Process a list of news articles."""
+        With `fan_in`, each unique headline is sent once for all of its tickers.
+        """
+        if driver is None:
+            with RequestDriver() as driver:
+                return self.classify_articles(articles, batch_size, driver, fan_in)
+        if batch_size > 1:
+            classifier_class = FanInClassifier if fan_in else BatchClassifier
+            classifier = classifier_class(self.complete, batch_size, fallback=self.classify_headline,
+                                          max_tokens=self.provider.max_output_tokens, driver=driver)
+            return classifier.classify(articles)
+        if not fan_in:
+            return dict(enumerate(driver.map(self.classify_headline, [a.get('News headline') for a in articles])))
+        # The single-headline prompt does not mention the ticker, so each text is asked once
+        groups = group_by_headline(articles)
+        answers = driver.map(self.classify_headline, [group['News headline'] for group in groups])
+        return {index: answer for group, answer in zip(groups, answers) for index in group['members']}
+
+    def process_news(self, news, story_threshold=0, batch_size=1, driver=None,
+                     cache=None, cascade=None, fan_in=False):
+        """Process a list of news articles.
+
+        With a `story_threshold` (e.g. DEFAULT_STORY_THRESHOLD), copies of the
+        same story are grouped first and only one headline per story is
+        analyzed; its verdict is copied to the others. By default every
+        headline is analyzed. Headlines are sent `batch_size` at a time (e.g.
+        DEFAULT_BATCH_SIZE); the default of 1 sends one request each.
+        Requests run concurrently through `driver` (a default RequestDriver).
+        With a SentimentCache, only headlines it does not know are sent.
+        With a CascadeAnalyzer, only headlines the local engine is unsure
+        about are sent.
+        With `fan_in`, a headline collected for several tickers is sent once,
+        asking for a verdict per ticker.
+        """
+        news = [
+            article for article in news
+            if article.get('News headline') is not None and article.get('Stock name') is not None and article.get('Ticker') is not None
+        ]
+        to_analyze = assign_stories(news, story_threshold) if story_threshold else news
+        classify = functools.partial(self.classify_articles, batch_size=batch_size, driver=driver, fan_in=fan_in)
+        if cache is not None:
+            classify = functools.partial(classify_with_cache, cache, classify=classify)
+        if cascade is not None:
+            classify = functools.partial(cascade.classify_articles, classify=classify)
+        verdicts = classify(to_analyze)
         results = []
-        for article in news:
-            headline = article.get('News headline')
-            stock_name = article.get('Stock name')
-            ticker = article.get('Ticker')
-            if headline is not None and stock_name is not None and ticker is not None:
-                sentiment = self.analyze_sentiment(headline)
-                if sentiment is not None:
-                    sentiment, description = sentiment.split('\n')
-                    article['Sentiment'] = sentiment.strip()
-                    article['Description'] = description
-                    results.append(article)
+        for i, article in enumerate(to_analyze):
+            verdict = verdicts.get(i)
+            if verdict is not None:
+                article['Sentiment'], article['Description'] = verdict
+                results.append(article)
+        if story_threshold:
+            results = spread_story_verdicts(news, results)
         return results
 
-import datetime
 
-def calculate_sentiment_score(path, output_path):
-    """Load the JSON data, calculate the sentiment score for each stock, and save the results."""
-    try:
-        with open(path) as f:
-            data = json.load(f)
-    except Exception as e:
-        logging.info(f"Error loading JSON: {e}")
+def calculate_sentiment_score(path, output_path, data=None):
+    """Load the JSON data (or take `data`), calculate the sentiment score for each stock, and save the results.
+
+    Pass the records of the run as `data` to count copies of a story once: the
+    file is written without their 'Story' key.
+    """
+    data = load_json(path) if data is None else data
+    if data is None:
         return
 
-    stock_counts = {}
-    positive_counts = {}
+    accumulator = ScoreAccumulator()
     for entry in data:
-        stock_name = entry.get('Stock name')
-        ticker = entry.get('Ticker')
-        sentiment = entry.get('Sentiment')
-
-        if stock_name is not None and ticker is not None and sentiment is not None:
-            # Increment the count for this stock
-            stock_counts[(stock_name, ticker)] = stock_counts.get((stock_name, ticker), 0) + 1
-            # If the sentiment is positive, increment the positive count
-            if sentiment.lower() == 'yes':
-                positive_counts[(stock_name, ticker)] = positive_counts.get((stock_name, ticker), 0) + 1
-
-    # Calculate the sentiment scores and save the results
-    results = []
-    for (stock_name, ticker), positive_count in positive_counts.items():
-        total_count = stock_counts[(stock_name, ticker)]
-        score = (positive_count / total_count) * 100  # score as a percentage
-        result = {
-            "ID": len(results) + 1,
-            "DATE": datetime.datetime.now().isoformat(),
-            "Stock Name": stock_name,
-            "Ticker": ticker,
-            "Score": round(score, 2)
-        }
-        results.append(result)
+        accumulator.add(entry)
+    results = accumulator.results("DATE")
 
     save_json(output_path, results)
 
 
-def load_json(path):
-    """Load a JSON file."""
-    try:
-        with open(path) as f:
-            return json.load(f)
-    except Exception as e:
-        logging.info(f"Error loading JSON: {e}")
-        return None
-
-
-def save_json(path, data):
-    """Save data to a JSON file."""
-    try:
-        with open(path, 'w') as f:
-            json.dump(data, f, indent=4)
-    except Exception as e:
-        logging.info(f"Error saving JSON: {e}")
-
 def main():
     print("Starting sentiment analysis...")
     parser = argparse.ArgumentParser(description='Analyze sentiment of news articles.')
-    parser.add_argument('input', help='The JSON file to load news articles from.')
+    parser.add_argument('input', help='The JSON (or news columns) file to load news articles from '
+                                      '(ignored with --from-mongo).')
     parser.add_argument('output', help='The JSON file to save results to.')
     parser.add_argument('output2', help='The JSON file to save results to.')
+    parser.add_argument('--story-threshold', type=float, default=0,
+                        help='Similarity above which headlines count as one story, e.g. '
+                             f'{DEFAULT_STORY_THRESHOLD} (0, the default, analyzes every headline).')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help=f'Headlines sent per request, e.g. {DEFAULT_BATCH_SIZE} (1, the default, sends one '
+                             'request per headline).')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help='Upper bound for concurrent requests; the actual level adapts to throttling.')
+    parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE,
+                        help='Seconds allowed per request (the request timeout of the provider clients).')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH, default='',
+                        help='Reuse verdicts from a sentiment cache file (the shared cache if no file is given); '
+                             'off by default.')
+    parser.add_argument('--cache-max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help='Cached verdicts older than this are evicted.')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Score headlines locally first and only send uncertain ones to Claude.')
+    parser.add_argument('--band', type=float, nargs=2, default=list(DEFAULT_BAND), metavar=('LOW', 'HIGH'),
+                        help='Local scores strictly between LOW and HIGH are sent to Claude (0 0 never escalates).')
+    parser.add_argument('--audit-rate', type=float, default=DEFAULT_AUDIT_RATE,
+                        help='Share of confident headlines also sent to Claude to measure agreement.')
+    parser.add_argument('--cascade-stats', default=None, help='JSON file to save the cascade statistics to.')
+    parser.add_argument('--fan-in', action='store_true',
+                        help='Send a headline collected for several tickers once instead of once per ticker.')
+    parser.add_argument('--priority', default=None,
+                        help='Priority list (see sentiment_priority): held and strategy tickers are scored first '
+                             'and their scores published early. Ignored with --stream.')
+    parser.add_argument('--stream', action='store_true',
+                        help='Classify the input chunk by chunk, appending results to the output as NDJSON and '
+                             'skipping records already in it.')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Records per chunk in --stream mode.')
+    parser.add_argument('--from-mongo', action='store_true',
+                        help='Read the headlines added since the last completed run straight from the News '
+                             'collection instead of the input file.')
+    parser.add_argument('--since', default=None,
+                        help='With --from-mongo: an _id or ISO date to read after instead of the saved watermark '
+                             '("all" reads the whole collection).')
+    parser.add_argument('--score-state', nargs='?', const=DEFAULT_STATE_PATH, default='',
+                        help='Give "Score" as a time-decayed score kept in a persistent state (the shared state if '
+                             'no file is given) and updated with each run\'s new results. By default "Score" is the '
+                             'share of positive headlines among all results.')
+    parser.add_argument('--half-life', type=float, nargs='+', default=list(DEFAULT_HALF_LIVES),
+                        help='With --score-state: half-lives in days for the decayed scores; the first one gives '
+                             '"Score".')
+    parser.add_argument('--ranking', default=DEFAULT_RANKING_PATH,
+                        help='Versioned top-K ranking published for the Node consumers ("" disables it).')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Tickers per universe in the ranking.')
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH,
+                        help='Daily score history the run\'s scores are appended to ("" disables it).')
+    parser.add_argument('--metrics', default=DEFAULT_METRICS_PATH,
+                        help='File the run summary (tokens, latency, cost) is appended to ("" disables it).')
+    parser.add_argument('--call-log', default=None, help='NDJSON file to record every provider call to.')
+    parser.add_argument('--providers', nargs='+', choices=['claude', 'vertex', 'openai'], default=['claude'],
+                        help='Providers to spread requests over; several enable weighted routing and failover.')
     args = parser.parse_args()
 
-    analyzer = SentimentAnalyzer(anthropic_key)
+    if args.providers == ['claude']:
+        analyzer = SentimentAnalyzer(provider=ClaudeProvider(anthropic_key, MODEL, timeout=args.deadline))
+    else:
+        analyzer = SentimentAnalyzer(provider=build_router(args.providers, timeout=args.deadline))
+    recorder = CallRecorder(call_log=args.call_log)
+    analyzer.provider = instrument(analyzer.provider, recorder, args.deadline)
     print("SentimentAnalyzer initialized.")
 
-    news = load_json(args.input)
-    if news is not None:
+    cache = None
+    if args.cache:
+        cache = SentimentCache(args.cache, analyzer.provider.model, PROMPT_VERSION)
+        cache.evict(args.cache_max_age_days)
+
+    cascade = CascadeAnalyzer(band=tuple(args.band), audit_rate=args.audit_rate) if args.cascade else None
+
+    driver = RequestDriver(AIMDLimiter(maximum=args.max_concurrency))
+    aggregator = DecayedScoreAggregator(args.score_state, args.half_life) if args.score_state else None
+    priorities = load_priority_list(args.priority) if args.priority else load_priority_list()
+    universes = priority_universes(priorities)
+    publish = functools.partial(publish_ranking, args.ranking, k=args.top_k, universes=universes) if args.ranking else None
+
+    reader = None
+    if args.from_mongo:
+        from news_store import NewsReader, load_retry, load_watermark, news_collection
+        if args.since:
+            since, retry = None if args.since == 'all' else args.since, {}
+        else:
+            since, retry = load_watermark(), load_retry()
+        reader = NewsReader(news_collection(), since=since, retry=retry)
+    # Keys of the records read that have a result, so the watermark does not skip failed ones
+    classified_ids = set()
+
+    if args.stream:
+        print("Starting streaming sentiment analysis")
+        classified = stream_sentiment(
+            analyzer, reader if reader is not None else args.input, args.output, args.output2, args.chunk_size,
+            "DATE", aggregator, story_threshold=args.story_threshold, batch_size=args.batch_size, driver=driver, cache=cache,
+            cascade=cascade, fan_in=args.fan_in, classified_ids=classified_ids,
+        )
+        print(f"Sentiment analysis completed: {classified} new results appended, scores saved.")
+        headlines = None
+    else:
+        news = list(reader) if reader is not None else load_records(args.input)
+        if news is None:
+            print("Failed to load news data.")
+            driver.close()
+            return
         print("News data loaded successfully.")
         print("Starting sentiment analysis")
-        results = analyzer.process_news(news)
+        options = dict(story_threshold=args.story_threshold, batch_size=args.batch_size, driver=driver, cache=cache,
+                       cascade=cascade, fan_in=args.fan_in)
+        if args.priority:
+            results = process_by_priority(analyzer, news, args.output2, priorities, "DATE", aggregator, publish,
+                                          **options)
+        else:
+            results = analyzer.process_news(news, **options)
+            if aggregator is not None:
+                for entry in results:
+                    aggregator.add(entry)
         print("Sentiment analysis completed.")
-        save_json(args.output, results)
+        headlines, classified = len(news), len(results)
+        classified_ids.update(record_key(entry) for entry in results)
+        if reader is not None and os.path.exists(args.output):
+            # Only the new headlines were read: keep the results of earlier runs
+            results = merge_results(load_json(args.output) or [], results)
+        save_json(args.output, [without_story(entry) for entry in results])
         print("Sentiment analysis results saved.")
         print("Starting sentiment score calculation")
-        calculate_sentiment_score(args.output, args.output2)
+        if aggregator is not None:
+            save_json(args.output2, aggregator.results("DATE"))
+        else:
+            calculate_sentiment_score(args.output, args.output2, results)
         print("Sentiment scores calculated and saved.")
-    else:
-        print("Failed to load news data.")
+
+    driver.close()
+    if aggregator is not None:
+        aggregator.save()
+        aggregator.close()
+    if reader is not None:
+        from news_store import save_watermark
+        save_watermark(reader.watermark, reader.unresolved(classified_ids))
+    if args.ranking:
+        publish_ranking_file(args.ranking, args.output2, args.top_k, universes)
+    if args.history:
+        append_score_file(args.history, args.output2)
+
+    if len(args.providers) > 1:
+        logging.info(f"Provider statistics: {analyzer.provider.summary()}")
+    if cascade is not None:
+        logging.info(f"Cascade statistics: {cascade.summary()}")
+        if args.cascade_stats:
+            save_json(args.cascade_stats, cascade.summary())
+    if args.metrics:
+        append_run_summary(args.metrics, recorder.summary(
+            script='sentiment_claude5',
+            headlines=headlines,
+            classified=classified,
+            cache_hits=cache.hits if cache is not None else None,
+            cache_misses=cache.misses if cache is not None else None,
+            escalated=cascade.stats['escalated'] if cascade is not None else None,
+        ))
 
     print("Sentiment analysis process finished.")
 
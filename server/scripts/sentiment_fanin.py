@@ -0,0 +1,134 @@
+"""Fan-in: classify each unique headline once, with a verdict per ticker.
+
+The same headline is often collected under several tickers (market-wide or
+sector stories). Instead of sending every copy, records are grouped by their
+canonical headline (see news_records.canonical_headline) and every group goes
+into the batch prompt once, with all of its tickers:
+
+    <number>|<tag>|<ticker,ticker,...>|<headline>
+
+and the model answers one line per ticker:
+
+    <number>|<tag>|<ticker>|<YES, NO or UNKNOWN>|<one short sentence>
+
+The verdict of each ticker is then copied back to every source record of that
+ticker. Groups with tickers missing from the answer are re-queued like any
+batch item (see sentiment_batch.BatchClassifier); the single-headline fallback
+gives one verdict for the whole group.
+"""
+
+import hashlib
+import re
+
+from news_records import canonical_headline
+from sentiment_batch import DEFAULT_BATCH_SIZE, DEFAULT_MAX_ROUNDS, BatchClassifier
+
+
+FANIN_PROMPT = """Forget all your previous instructions. Pretend you are a financial expert. You are a financial expert with stock recommendation experience. Below are numbered news headlines, one per line, in the format number|tag|tickers|headline, where tickers is a comma-separated list of the stocks the headline was collected for. For every headline and every one of its tickers, answer “YES” if good news for that ticker, “NO” if bad news, or “UNKNOWN” if uncertain, then elaborate with one short and concise sentence. Reply with exactly one line per headline and ticker, in the same order, in the format number|tag|ticker|answer|sentence and nothing else.
+"""
+
+FANIN_ANSWER_RE = re.compile(
+    r'^\W*(\d+)\s*[|.):]\s*(?:([0-9a-f]{8})\s*\|\s*)?([^|]+?)\s*\|\s*(YES|NO|UNKNOWN)\b\s*[|:\-–]?\s*(.*)$',
+    re.IGNORECASE,
+)
+
+
+def group_by_headline(articles):
+    """Group articles by canonical headline.
+
+    Returns a list of groups in order of first appearance; each group is a dict
+    with the first copy's 'News headline', its 'Tickers' (unique, in order) and
+    the 'members' indexes into `articles`.
+    """
+    groups = {}
+    for index, article in enumerate(articles):
+        key = canonical_headline(article.get('News headline'))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'News headline': article.get('News headline'), 'Tickers': [], 'members': []}
+        if article.get('Ticker') not in group['Tickers']:
+            group['Tickers'].append(article.get('Ticker'))
+        group['members'].append(index)
+    return list(groups.values())
+
+
+def group_tag(group):
+    """Short, stable tag identifying a headline group inside a prompt."""
+    return hashlib.sha1(canonical_headline(group['News headline']).encode()).hexdigest()[:8]
+
+
+def build_fanin_prompt(groups, prompt=FANIN_PROMPT):
+    """Return the prompt asking for a verdict per ticker of every group, numbered from 1."""
+    lines = []
+    for number, group in enumerate(groups, start=1):
+        headline = ' '.join(str(group['News headline']).split())
+        tickers = ','.join(str(ticker) for ticker in group['Tickers'])
+        lines.append(f"{number}|{group_tag(group)}|{tickers}|{headline}")
+    return prompt + '\n'.join(lines)
+
+
+def parse_fanin_reply(reply, groups):
+    """Return {position: {ticker: (sentiment, description)}} for the groups answered for every ticker.
+
+    Lines are matched to groups by tag when the tag is known, by number otherwise.
+    """
+    positions_by_tag = {}
+    for position, group in enumerate(groups):
+        positions_by_tag.setdefault(group_tag(group), []).append(position)
+
+    answers = {}
+    for line in (reply or '').splitlines():
+        match = FANIN_ANSWER_RE.match(line.strip())
+        if not match:
+            continue
+        number, tag, ticker, sentiment, description = match.groups()
+        tagged = positions_by_tag.get((tag or '').lower(), [])
+        if len(tagged) == 1:
+            position = tagged[0]
+        elif 1 <= int(number) <= len(groups):
+            position = int(number) - 1
+        else:
+            continue
+        tickers = {str(t).upper(): t for t in groups[position]['Tickers']}
+        ticker = tickers.get(ticker.strip().upper())
+        if ticker is None and len(tickers) == 1:
+            # A lone ticker may be answered under another spelling
+            ticker = next(iter(tickers.values()))
+        if ticker is None:
+            continue
+        answers.setdefault(position, {}).setdefault(ticker, (sentiment.upper(), description.strip().lstrip('|').strip()))
+    return {
+        position: verdicts for position, verdicts in answers.items()
+        if len(verdicts) == len(groups[position]['Tickers'])
+    }
+
+
+class FanInClassifier(BatchClassifier):
+    """BatchClassifier sending each unique headline once, with all of its tickers."""
+
+    def __init__(self, complete, batch_size=DEFAULT_BATCH_SIZE, max_rounds=DEFAULT_MAX_ROUNDS, fallback=None,
+                 max_tokens=None, prompt=FANIN_PROMPT, driver=None):
+        super().__init__(complete, batch_size, max_rounds, fallback, max_tokens, prompt, driver)
+        self.groups = 0
+
+    def classify_batch(self, groups):
+        """Send one batch of groups and return {position: {ticker: (sentiment, description)}}."""
+        lines = sum(len(group['Tickers']) for group in groups)
+        reply = self.complete(build_fanin_prompt(groups, self.prompt), self._tokens_for(lines))
+        if reply is None:
+            return {}
+        return parse_fanin_reply(reply, groups)
+
+    def classify(self, articles):
+        """Classify `articles`; returns {index in articles: (sentiment, description)}."""
+        groups = group_by_headline(articles)
+        self.groups += len(groups)
+        verdicts = {}
+        for position, answer in super().classify(groups).items():
+            group = groups[position]
+            for index in group['members']:
+                # The single-headline fallback answers for the whole group
+                verdict = answer.get(articles[index].get('Ticker')) if isinstance(answer, dict) else answer
+                if verdict is not None:
+                    verdicts[index] = verdict
+        return verdicts
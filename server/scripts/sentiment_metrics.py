@@ -0,0 +1,200 @@
+"""Per-call instrumentation of sentiment providers and per-run summaries.
+
+Wrap any provider (or every backend of a WeightedRouter) with `instrument` and
+each call is recorded with its provider, model, prompt and completion tokens,
+latency, attempt number and outcome class:
+
+    ok          an answer came back
+    empty       the provider answered with nothing
+    throttled   rate limited or overloaded (429/503/529 and the like)
+    timeout     the call timed out, or answered after the request deadline
+    error       any other failure
+
+Token counts come from the provider when it reports usage (`last_usage()`),
+and are estimated from the text length otherwise. `CallRecorder.summary()`
+gives totals, latency percentiles and estimated cost, overall and per
+provider; `append_run_summary` keeps one line per run so that runs can be
+compared over time.
+
+Usage:
+    recorder = CallRecorder()
+    analyzer = SentimentAnalyzer(provider=instrument(provider, recorder))
+    ...
+    append_run_summary(DEFAULT_METRICS_PATH, recorder.summary())
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from request_driver import DeadlineExceeded, is_overload
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_METRICS_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'sentimentRuns.ndjson')
+
+# USD per 1,000 (prompt, completion) tokens, from the providers' list prices.
+# Vertex bills per character; 4 characters per token is assumed.
+PRICES_PER_1K_TOKENS = {
+    'claude-v1': (0.01102, 0.03268),
+    'text-bison@001': (0.002, 0.002),
+    'gpt-3.5-turbo': (0.0015, 0.002),
+}
+CHARACTERS_PER_TOKEN = 4
+PERCENTILES = (50, 90, 99)
+
+
+def estimate_tokens(text):
+    """Rough token count of a text, for providers that do not report usage."""
+    return (len(text or '') + CHARACTERS_PER_TOKEN - 1) // CHARACTERS_PER_TOKEN
+
+
+def outcome_class(exc):
+    """Outcome class of a failed call."""
+    if isinstance(exc, DeadlineExceeded) or 'timeout' in type(exc).__name__.lower():
+        return 'timeout'
+    if is_overload(exc):
+        return 'throttled'
+    return 'error'
+
+
+class CallRecorder:
+    """Thread-safe collection of call records."""
+
+    def __init__(self, prices=PRICES_PER_1K_TOKENS, call_log=None):
+        self.prices = prices
+        self.call_log = call_log
+        self.lock = threading.Lock()
+        self.records = []
+        self.attempts = {}
+        self.started_at = datetime.datetime.now()
+
+    def attempt(self, provider, text):
+        """Return the attempt number of this prompt on this provider (1 for the first call)."""
+        key = (provider, hashlib.sha1(text.encode()).digest())
+        with self.lock:
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+            return self.attempts[key]
+
+    def record(self, **record):
+        with self.lock:
+            self.records.append(record)
+            if self.call_log:
+                with open(self.call_log, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+
+    def cost(self, model, prompt_tokens, completion_tokens):
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def _summarize(self, records):
+        latencies = np.array([record['latency'] for record in records]) if records else np.zeros(1)
+        outcomes = {}
+        for record in records:
+            outcomes[record['outcome']] = outcomes.get(record['outcome'], 0) + 1
+        prompt_tokens = sum(record['prompt_tokens'] for record in records)
+        completion_tokens = sum(record['completion_tokens'] for record in records)
+        summary = {
+            'calls': len(records),
+            'retries': sum(1 for record in records if record['attempt'] > 1),
+            'outcomes': outcomes,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'calls_with_estimated_tokens': sum(1 for record in records if record['estimated']),
+            'latency_total': round(float(sum(record['latency'] for record in records)), 4),
+            'estimated_cost': round(sum(
+                self.cost(record['model'], record['prompt_tokens'], record['completion_tokens']) for record in records
+            ), 6),
+        }
+        for percentile in PERCENTILES:
+            summary[f'latency_p{percentile}'] = round(float(np.percentile(latencies, percentile)), 4)
+        return summary
+
+    def summary(self, **extra):
+        """Totals, percentiles and cost of the run so far, overall and per provider.
+
+        `extra` (headline counts, cache statistics, ...) is added as is.
+        """
+        with self.lock:
+            records = list(self.records)
+        providers = {}
+        for record in records:
+            providers.setdefault(f"{record['provider']}:{record['model']}", []).append(record)
+        return dict(
+            started_at=self.started_at.isoformat(),
+            finished_at=datetime.datetime.now().isoformat(),
+            **self._summarize(records),
+            providers={name: self._summarize(calls) for name, calls in sorted(providers.items())},
+            **extra,
+        )
+
+
+class InstrumentedProvider:
+    """Provider wrapper recording every call into a CallRecorder."""
+
+    def __init__(self, provider, recorder, deadline=None, label=None):
+        self.provider = provider
+        self.recorder = recorder
+        self.deadline = deadline
+        self.label = label or provider.name
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def complete(self, text, max_tokens=None):
+        attempt = self.recorder.attempt(self.label, text)
+        answer, error = None, None
+        started = time.perf_counter()
+        try:
+            answer = self.provider.complete(text, max_tokens)
+            return answer
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            if error is not None:
+                # Failed calls are not billed
+                outcome, usage = outcome_class(error), (0, 0)
+            else:
+                outcome = 'timeout' if self.deadline and latency > self.deadline else 'ok' if answer else 'empty'
+                usage = self.provider.last_usage() if hasattr(self.provider, 'last_usage') else None
+            self.recorder.record(
+                provider=self.label,
+                model=self.provider.model,
+                prompt_tokens=usage[0] if usage else estimate_tokens(text),
+                completion_tokens=usage[1] if usage else estimate_tokens(answer),
+                estimated=usage is None,
+                latency=round(latency, 6),
+                attempt=attempt,
+                outcome=outcome,
+                error=type(error).__name__ if error is not None else None,
+            )
+
+
+def instrument(provider, recorder, deadline=None):
+    """Instrument a provider, or each backend of a router so that providers are told apart."""
+    backends = getattr(provider, 'backends', None)
+    if backends is None:
+        return InstrumentedProvider(provider, recorder, deadline)
+    for backend in backends:
+        backend.provider = InstrumentedProvider(backend.provider, recorder, deadline, backend.label)
+    return provider
+
+
+def append_run_summary(path, summary):
+    """Append one run summary to an NDJSON file."""
+    try:
+        with open(path, 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+        logging.info(f"Run metrics: {summary['calls']} calls, {summary['prompt_tokens']}+{summary['completion_tokens']} "
+                     f"tokens, p50 {summary['latency_p50']}s, p99 {summary['latency_p99']}s, "
+                     f"~${summary['estimated_cost']}")
+    except Exception as e:
+        logging.info(f"Error saving run metrics: {e}")
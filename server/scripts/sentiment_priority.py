@@ -0,0 +1,106 @@
+"""Priority scheduling of sentiment work by portfolio exposure.
+
+Headlines are not classified in file order any more but in waves taken from a
+priority queue:
+
+    0. tickers held in a portfolio
+    1. tickers of active strategies (target positions, Composer holdings)
+    2. everything else
+
+and, within a wave, newest first. After each priority wave the scores of its
+tickers are published into the score file (on top of the previous scores of the
+other tickers), so trading decisions get fresh sentiment for the names that
+matter long before the tail is done.
+
+The priority list is written by the Node server
+(services/sentimentPriorityService.js) as:
+
+    {"generatedAt": "...", "held": ["AAPL", ...], "strategies": ["NVDA", ...]}
+"""
+
+import heapq
+import logging
+import os
+
+from json_io import read_json, write_json_atomic
+from news_records import article_timestamp
+from sentiment_stream import ScoreAccumulator
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PRIORITY_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'sentimentPriority.json')
+
+HELD, STRATEGY, OTHER = 0, 1, 2
+TIER_NAMES = {HELD: 'held', STRATEGY: 'strategies', OTHER: 'other'}
+
+
+def load_priority_list(path=DEFAULT_PRIORITY_PATH):
+    """Return {ticker: tier} from a priority list file ({} if there is none)."""
+    try:
+        data = read_json(path)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.info(f"Error loading priority list: {e}")
+        return {}
+    priorities = {}
+    for tier, key in ((STRATEGY, 'strategies'), (HELD, 'held')):
+        for ticker in data.get(key) or []:
+            priorities[str(ticker).strip().upper()] = tier
+    return priorities
+
+
+def priority_waves(news, priorities):
+    """Return [(tier, articles)] in priority order, newest first within a tier."""
+    queue = []
+    for sequence, article in enumerate(news):
+        tier = priorities.get(str(article.get('Ticker') or '').upper(), OTHER)
+        heapq.heappush(queue, (tier, -article_timestamp(article), sequence, article))
+
+    waves = []
+    while queue:
+        tier, _, _, article = heapq.heappop(queue)
+        if not waves or waves[-1][0] != tier:
+            waves.append((tier, []))
+        waves[-1][1].append(article)
+    return waves
+
+
+def merge_scores(fresh, previous):
+    """Overlay fresh score records on previous ones, by ticker, renumbering IDs."""
+    tickers = {entry['Ticker'] for entry in fresh}
+    merged = [entry for entry in previous if entry.get('Ticker') not in tickers] + list(fresh)
+    return [dict(entry, ID=number) for number, entry in enumerate(merged, start=1)]
+
+
+def process_by_priority(analyzer, news, scores_path, priorities, date_key='DATE', accumulator=None,
+                        on_publish=None, **process_options):
+    """Classify `news` wave by wave and publish the scores of each priority wave as soon as it is done.
+
+    Every classified record is fed to `accumulator` (a fresh ScoreAccumulator
+    by default). `on_publish`, if given, is called with the merged scores each
+    time they are published. `process_options` are passed to `analyzer.process_news`.
+    Returns the classified articles, like `process_news`; the final score
+    file is left to the caller.
+    """
+    try:
+        previous = read_json(scores_path)
+    except Exception:
+        previous = []
+
+    accumulator = accumulator if accumulator is not None else ScoreAccumulator()
+    results = []
+    for tier, wave in priority_waves(news, priorities):
+        logging.info(f"Priority wave '{TIER_NAMES[tier]}': {len(wave)} headlines")
+        classified = analyzer.process_news(wave, **process_options)
+        results.extend(classified)
+        for entry in classified:
+            accumulator.add(entry)
+        if tier == OTHER:
+            continue
+        merged = merge_scores(accumulator.results(date_key), previous)
+        write_json_atomic(scores_path, merged)
+        if on_publish is not None:
+            on_publish(merged)
+        logging.info(f"Published scores for the '{TIER_NAMES[tier]}' wave to {scores_path}")
+    return results
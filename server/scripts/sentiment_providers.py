@@ -0,0 +1,308 @@
+"""One interface over the LLM providers used for sentiment, plus a weighted router.
+
+A provider only has to implement `complete(text, max_tokens)` and return the
+raw answer (raising on errors). A `timeout` in seconds is given to the client
+as its request timeout, so that a slow call fails instead of running on.
+Providers whose API reports token usage also implement `last_usage()` (see
+sentiment_metrics). ClaudeProvider, VertexProvider and OpenAIProvider wrap the three APIs the scripts have used so far; each imports
+its SDK when it is built, so a script only needs the SDKs of the providers it
+uses.
+
+WeightedRouter spreads requests over several backends (a provider and its API
+key), picking among the ready ones at random, weighted by configured weight and
+by observed latency. It keeps a per-backend request quota, an EWMA of latency
+and a cooldown after errors, and fails over to another backend when a call
+fails. Aggregate throughput is the sum of every configured backend.
+
+Backends are configured from the environment:
+    ANTHROPIC_API_KEY, OPENAI_API_KEY       comma-separated lists of keys
+    GOOGLE_APPLICATION_CREDENTIALS_PATH     enables Vertex (VERTEX_PROJECT, VERTEX_LOCATION)
+    SENTIMENT_PROVIDER_WEIGHTS              e.g. "claude=2,vertex=1,openai=1"
+    SENTIMENT_PROVIDER_RPM                  requests per minute per key, e.g. "claude=50,openai=60"
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from request_driver import is_overload, retry_after_hint
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LATENCY_EWMA_ALPHA = 0.2
+# Latency assumed for a backend that has not answered yet
+DEFAULT_LATENCY = 2.0
+MAX_COOLDOWN = 60.0
+
+REPLY_RE = re.compile(r'^\W*(YES|NO|UNKNOWN)\b[\s.:,;|\-–]*(.*)$', re.IGNORECASE | re.DOTALL)
+
+
+def normalize_reply(text):
+    """Turn a single-headline answer from any provider into (sentiment, description)."""
+    text = (text or '').strip()
+    match = REPLY_RE.match(text)
+    if not match:
+        return 'UNKNOWN', text
+    sentiment, description = match.groups()
+    return sentiment.upper(), ' '.join(description.split())
+
+
+class ClaudeProvider:
+    name = 'claude'
+    max_output_tokens = None
+
+    def __init__(self, api_key, model='claude-v1', timeout=None):
+        import anthropic
+
+        self.model = model
+        if timeout:
+            self.client = anthropic.Client(api_key=api_key, default_request_timeout=timeout)
+        else:
+            self.client = anthropic.Client(api_key=api_key)
+
+    def complete(self, text, max_tokens=100):
+        import anthropic
+
+        response = self.client.completion(
+            prompt=f'{anthropic.HUMAN_PROMPT}{text} {anthropic.AI_PROMPT}',
+            stop_sequences=[anthropic.HUMAN_PROMPT],
+            model=self.model,
+            max_tokens_to_sample=max_tokens,
+            temperature=0
+        )
+        return response['completion']
+
+
+class VertexProvider:
+    name = 'vertex'
+    # text-bison caps a single answer at 1024 tokens
+    max_output_tokens = 1024
+
+    # TextGenerationModel.predict takes no request timeout: a call lasts until the SDK gives up
+    def __init__(self, client=None, model='text-bison@001', parameters=None):
+        self.model = model
+        if client is None:
+            from vertexai.language_models import TextGenerationModel
+
+            client = TextGenerationModel.from_pretrained(model)
+        self.client = client
+        self.parameters = parameters or {"temperature": 0.2, "max_output_tokens": 256, "top_p": 0.8, "top_k": 40}
+
+    def complete(self, text, max_tokens=None):
+        parameters = dict(self.parameters)
+        if max_tokens:
+            parameters['max_output_tokens'] = min(max_tokens, self.max_output_tokens)
+        response = self.client.predict(text, **parameters)
+        return response.text or None
+
+
+class OpenAIProvider:
+    name = 'openai'
+    max_output_tokens = None
+
+    def __init__(self, api_key, model='gpt-3.5-turbo', timeout=None):
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.usage = threading.local()
+
+    def last_usage(self):
+        """(prompt tokens, completion tokens) of this thread's last call, if reported."""
+        return getattr(self.usage, 'tokens', None)
+
+    def complete(self, text, max_tokens=100):
+        import openai
+
+        response = openai.ChatCompletion.create(
+            api_key=self.api_key,
+            model=self.model,
+            messages=[{"role": "user", "content": text}],
+            max_tokens=max_tokens,
+            temperature=0,
+            request_timeout=self.timeout,
+        )
+        usage = response.get('usage') or {}
+        self.usage.tokens = (usage['prompt_tokens'], usage['completion_tokens']) if usage else None
+        return response['choices'][0]['message']['content']
+
+
+class NoBackendAvailable(Exception):
+    """Every backend is cooling down, out of quota or failed for this request."""
+
+    # Reported as throttling so that the request driver backs off
+    status_code = 429
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Backend:
+    """A provider plus its routing state: weight, quota, latency and cooldown."""
+
+    def __init__(self, provider, weight=1.0, requests_per_minute=None, label=None):
+        self.provider = provider
+        self.weight = weight
+        self.requests_per_minute = requests_per_minute
+        self.label = label or provider.name
+        self.tokens = float(requests_per_minute or 0)
+        self.refilled_at = time.monotonic()
+        self.latency = None
+        self.available_at = 0.0
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.errors = 0
+
+    def _refill(self, now):
+        if self.requests_per_minute:
+            elapsed = now - self.refilled_at
+            self.tokens = min(self.requests_per_minute, self.tokens + elapsed * self.requests_per_minute / 60.0)
+        self.refilled_at = now
+
+    def wait_time(self, now):
+        """Seconds until this backend may take a request (0 if it can now)."""
+        self._refill(now)
+        wait = max(0.0, self.available_at - now)
+        if self.requests_per_minute and self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) * 60.0 / self.requests_per_minute)
+        return wait
+
+    def routing_weight(self):
+        return self.weight * DEFAULT_LATENCY / max(self.latency or DEFAULT_LATENCY, 0.05)
+
+    def take(self):
+        if self.requests_per_minute:
+            self.tokens -= 1
+        self.calls += 1
+
+    def record_success(self, latency):
+        self.consecutive_failures = 0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_EWMA_ALPHA * (latency - self.latency)
+
+    def record_failure(self, exc, now):
+        self.errors += 1
+        self.consecutive_failures += 1
+        hint = retry_after_hint(exc) if is_overload(exc) else None
+        cooldown = hint if hint is not None else 2 ** min(self.consecutive_failures, 6)
+        self.available_at = max(self.available_at, now + min(cooldown, MAX_COOLDOWN))
+
+    def summary(self):
+        return {
+            'backend': self.label,
+            'weight': self.weight,
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency_ewma': round(self.latency, 4) if self.latency is not None else None,
+        }
+
+
+class WeightedRouter:
+    """Provider-compatible object spreading `complete` calls over several backends."""
+
+    name = 'router'
+
+    def __init__(self, backends, seed=None):
+        if not backends:
+            raise ValueError("WeightedRouter needs at least one backend")
+        self.backends = list(backends)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        caps = [b.provider.max_output_tokens for b in self.backends if b.provider.max_output_tokens]
+        self.max_output_tokens = min(caps) if caps else None
+
+    @property
+    def model(self):
+        """Identifies the mix of models, e.g. for cache keys."""
+        return '+'.join(sorted({backend.provider.model for backend in self.backends}))
+
+    def _pick(self, excluded):
+        """Choose a ready backend, or return None if none is."""
+        with self.lock:
+            now = time.monotonic()
+            ready = [backend for backend in self.backends
+                     if backend not in excluded and backend.wait_time(now) <= 0]
+            if not ready:
+                return None
+            backend = self.random.choices(ready, weights=[b.routing_weight() for b in ready])[0]
+            backend.take()
+            return backend
+
+    def _earliest_recovery(self):
+        """Seconds until the first backend, tried or not, may take a request again."""
+        with self.lock:
+            now = time.monotonic()
+            return min(backend.wait_time(now) for backend in self.backends) or None
+
+    def complete(self, text, max_tokens=100):
+        tried = set()
+        last_error = None
+        while True:
+            backend = self._pick(tried)
+            if backend is None:
+                break
+            started = time.monotonic()
+            try:
+                answer = backend.provider.complete(text, max_tokens)
+            except Exception as e:
+                with self.lock:
+                    backend.record_failure(e, time.monotonic())
+                logging.info(f"Backend {backend.label} failed ({e}), failing over")
+                tried.add(backend)
+                last_error = e
+                continue
+            with self.lock:
+                backend.record_success(time.monotonic() - started)
+            return answer
+
+        if last_error is not None and not is_overload(last_error) and len(tried) == len(self.backends):
+            raise last_error
+        raise NoBackendAvailable("No sentiment backend available", retry_after=self._earliest_recovery())
+
+    def summary(self):
+        with self.lock:
+            return [backend.summary() for backend in self.backends]
+
+
+def _parse_mapping(value, cast=float):
+    mapping = {}
+    for part in (value or '').split(','):
+        name, _, number = part.partition('=')
+        if name.strip() and number.strip():
+            mapping[name.strip()] = cast(number)
+    return mapping
+
+
+def _keys(variable):
+    return [key.strip() for key in (os.getenv(variable) or '').split(',') if key.strip()]
+
+
+def build_router(names=('claude', 'vertex', 'openai'), seed=None, timeout=None):
+    """Build a WeightedRouter over every configured backend among `names`.
+
+    `timeout` is the request timeout of the Claude and OpenAI clients; the
+    Vertex text models take none.
+    """
+    weights = _parse_mapping(os.getenv('SENTIMENT_PROVIDER_WEIGHTS'))
+    rpm = _parse_mapping(os.getenv('SENTIMENT_PROVIDER_RPM'), int)
+    backends = []
+    if 'claude' in names:
+        for i, key in enumerate(_keys('ANTHROPIC_API_KEY')):
+            backends.append(Backend(ClaudeProvider(key, timeout=timeout), weights.get('claude', 1.0), rpm.get('claude'), f'claude#{i}'))
+    if 'openai' in names:
+        for i, key in enumerate(_keys('OPENAI_API_KEY')):
+            backends.append(Backend(OpenAIProvider(key, timeout=timeout), weights.get('openai', 1.0), rpm.get('openai'), f'openai#{i}'))
+    if 'vertex' in names and os.getenv('GOOGLE_APPLICATION_CREDENTIALS_PATH'):
+        import vertexai
+
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.path.join(SCRIPT_DIR, os.getenv('GOOGLE_APPLICATION_CREDENTIALS_PATH'))
+        vertexai.init(project=os.getenv('VERTEX_PROJECT', 'ghc-026'), location=os.getenv('VERTEX_LOCATION', 'us-central1'))
+        backends.append(Backend(VertexProvider(), weights.get('vertex', 1.0), rpm.get('vertex'), 'vertex'))
+    logging.info(f"Sentiment router backends: {[backend.label for backend in backends]}")
+    return WeightedRouter(backends, seed)
@@ -0,0 +1,196 @@
+"""Incremental, time-decayed sentiment scores with persistent per-ticker state.
+
+`calculate_sentiment_score` rebuilds the scores from the whole results file on
+every run and weighs a month-old headline like today's. DecayedScoreAggregator
+keeps, per (stock, ticker) and per half-life, an exponentially decayed count of
+positive stories and of all stories, as of the ticker's latest headline. A run
+only feeds it the records it has not seen yet, so an update costs O(new
+records) and history is never reprocessed.
+
+A story published `age` before the ticker's latest headline weighs
+2 ** (-age / half_life). The score is the decayed positive share, as a
+percentage; decay to the run time scales both counts alike, so it does not move
+the score but shows in the 'Weight' (effective number of stories as of the run)
+of the published records. Tickers whose weight has fallen below
+MIN_RESULT_WEIGHT are left out of the results, so that a lone YES from weeks
+ago does not keep scoring 100.
+
+Which stories were already counted is remembered by hash, for
+RETENTION_HALF_LIVES times the longest half-life before the newest headline;
+older headlines weigh too little to matter and are ignored. The state is a SQLite file, like the
+sentiment cache. A half-life added later starts from empty counters.
+
+Usage:
+    aggregator = DecayedScoreAggregator(path, half_lives=(7.0, 1.0, 30.0))
+    for entry in results:
+        aggregator.add(entry)
+    aggregator.save()
+    save_json(output_path, aggregator.results())
+"""
+
+import datetime
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+from news_records import article_id, article_timestamp
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STATE_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'sentimentScores.sqlite3')
+# In days; the first one gives 'Score', all of them are published under 'Scores'
+DEFAULT_HALF_LIVES = (7.0, 1.0, 30.0)
+RETENTION_HALF_LIVES = 10
+# Tickers whose decayed story count falls below this are dropped
+MIN_WEIGHT = 1e-3
+# Tickers whose decayed story count as of the run falls below this are not published:
+# one story two half-lives old
+MIN_RESULT_WEIGHT = 0.25
+
+
+def story_hash(entry):
+    """Hash of the (stock, ticker, story) a record counts for."""
+    story = entry.get('Story') or article_id(entry)
+    return hashlib.sha1(f"{entry.get('Stock name')}|{entry.get('Ticker')}|{story}".encode()).hexdigest()[:16]
+
+
+class DecayedScoreAggregator:
+    """Per-ticker decayed positive and total story counts, updated record by record."""
+
+    def __init__(self, path=DEFAULT_STATE_PATH, half_lives=DEFAULT_HALF_LIVES):
+        self.path = path
+        self.half_lives = tuple(float(days) for days in half_lives)
+        self.retention = RETENTION_HALF_LIVES * max(self.half_lives) * 86400
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS seen (
+                story_hash TEXT PRIMARY KEY,
+                published_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS counters (
+                stock_name TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                half_life REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                positive REAL NOT NULL,
+                total REAL NOT NULL,
+                PRIMARY KEY (stock_name, ticker, half_life)
+            )
+        """)
+        self.connection.commit()
+        self.latest = self.connection.execute("SELECT MAX(published_at) FROM seen").fetchone()[0] or 0.0
+        self.added = 0
+        self.skipped = 0
+
+    def _counters(self, stock_name, ticker):
+        rows = self.connection.execute(
+            "SELECT half_life, updated_at, positive, total FROM counters WHERE stock_name = ? AND ticker = ?",
+            (stock_name, ticker),
+        )
+        return {half_life: [updated_at, positive, total] for half_life, updated_at, positive, total in rows}
+
+    def add(self, entry):
+        """Count a classified record, unless its story was already counted. Returns True if counted."""
+        stock_name = entry.get('Stock name')
+        ticker = entry.get('Ticker')
+        sentiment = entry.get('Sentiment')
+        if stock_name is None or ticker is None or sentiment is None:
+            return False
+        published_at = article_timestamp(entry) or time.time()
+        if published_at < self.latest - self.retention:
+            self.skipped += 1
+            return False
+        self.latest = max(self.latest, published_at)
+        inserted = self.connection.execute(
+            "INSERT OR IGNORE INTO seen VALUES (?, ?)", (story_hash(entry), published_at)
+        ).rowcount
+        if not inserted:
+            self.skipped += 1
+            return False
+
+        positive = 1.0 if sentiment.lower() == 'yes' else 0.0
+        counters = self._counters(stock_name, ticker)
+        for half_life in self.half_lives:
+            updated_at, decayed_positive, decayed_total = counters.get(half_life, [published_at, 0.0, 0.0])
+            if published_at > updated_at:
+                # Move the reference time forward to the newest headline
+                factor = 2 ** (-(published_at - updated_at) / (half_life * 86400))
+                decayed_positive, decayed_total, updated_at = decayed_positive * factor, decayed_total * factor, published_at
+                weight = 1.0
+            else:
+                weight = 2 ** (-(updated_at - published_at) / (half_life * 86400))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO counters VALUES (?, ?, ?, ?, ?, ?)",
+                (stock_name, ticker, half_life, updated_at, decayed_positive + positive * weight, decayed_total + weight),
+            )
+        self.added += 1
+        return True
+
+    def prune(self):
+        """Forget stories past the retention window and tickers whose weight has decayed away.
+
+        Both are measured from the newest headline, not the clock, so a pause in
+        collection does not wipe the state.
+        """
+        now = self.latest
+        self.connection.execute("DELETE FROM seen WHERE published_at < ?", (now - self.retention,))
+        stale = [
+            (stock_name, ticker)
+            for stock_name, ticker, half_life, updated_at, total in self.connection.execute(
+                "SELECT stock_name, ticker, MAX(half_life), updated_at, total FROM counters GROUP BY stock_name, ticker"
+            )
+            if total * 2 ** (-(now - updated_at) / (half_life * 86400)) < MIN_WEIGHT
+        ]
+        self.connection.executemany("DELETE FROM counters WHERE stock_name = ? AND ticker = ?", stale)
+        if stale:
+            logging.info(f"Dropped {len(stale)} tickers without recent headlines from the score state")
+
+    def save(self):
+        """Prune and commit the state."""
+        self.prune()
+        self.connection.commit()
+        logging.info(f"Score state updated: {self.added} new stories, {self.skipped} already counted or too old")
+
+    def results(self, date_key='DATE', now=None, min_weight=MIN_RESULT_WEIGHT):
+        """Return the score records, in the format of scoreResults.json plus per-half-life scores.
+
+        Tickers whose stories weigh less than `min_weight` at `now` (the run
+        time by default) are left out.
+        """
+        now = now or time.time()
+        tickers = {}
+        for stock_name, ticker, half_life, updated_at, positive, total in self.connection.execute(
+            "SELECT stock_name, ticker, half_life, updated_at, positive, total FROM counters ORDER BY stock_name, ticker"
+        ):
+            if half_life in self.half_lives:
+                tickers.setdefault((stock_name, ticker), {})[half_life] = (updated_at, positive, total)
+
+        results = []
+        for (stock_name, ticker), counters in tickers.items():
+            primary = counters.get(self.half_lives[0])
+            # As before, stocks without any positive story are not listed
+            if primary is None or primary[1] <= 0:
+                continue
+            updated_at, positive, total = primary
+            weight = total * 2 ** (-(now - updated_at) / (self.half_lives[0] * 86400))
+            if weight < min_weight:
+                continue
+            results.append({
+                "ID": len(results) + 1,
+                date_key: datetime.datetime.now().isoformat(),
+                "Stock Name": stock_name,
+                "Ticker": ticker,
+                "Score": round(positive / total * 100, 2),
+                "Weight": round(weight, 4),
+                "Scores": {
+                    f"{half_life:g}d": round(p / t * 100, 2) for half_life, (_, p, t) in sorted(counters.items()) if t
+                },
+            })
+        return results
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,204 @@
+"""Streaming sentiment runs: incremental input, NDJSON results, crash-safe progress.
+
+The batch mode loads the whole news file, keeps every annotated article in
+memory and writes the results at the very end. In streaming mode:
+
+- input records are parsed incrementally from the JSON array (or NDJSON) file
+  and classified `chunk_size` at a time
+- every classified record is appended to the results file as one JSON line,
+  flushed and synced after each chunk
+- per-stock scores are aggregated on the fly and the score file is rewritten
+  (atomically) after each chunk
+- on restart, records whose (Ticker, Id) is already in the results file are
+  skipped and the scores are rebuilt from it, so an interrupted run loses
+  nothing
+
+Memory stays bounded by the chunk size plus the set of classified keys. Story
+clustering (see story_clusters) only groups copies found in the same chunk, and
+the results file does not keep the stories: scores rebuilt on restart count the
+copies of earlier chunks one by one.
+
+Usage:
+    stream_sentiment(analyzer, 'newsData.json', 'sentimentResults.ndjson', 'scoreResults.json')
+"""
+
+import datetime
+import json
+import logging
+import os
+
+from json_io import dumps, loads, write_json_atomic
+from news_records import article_id, record_key, without_story
+
+
+DEFAULT_CHUNK_SIZE = 500
+READ_SIZE = 1 << 16
+
+
+def iter_json_records(path, read_size=READ_SIZE):
+    """Yield the records of a JSON array file, or of an NDJSON file, without loading it whole."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer = f.read(read_size).lstrip()
+        in_array = buffer.startswith('[')
+        if in_array:
+            buffer = buffer[1:]
+        position = 0
+        while True:
+            # Skip separators between records
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer):
+                    break
+                buffer, position = f.read(read_size), 0
+                if not buffer:
+                    return
+            if in_array and buffer[position] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                more = f.read(read_size)
+                if not more:
+                    raise
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+            # A number may have been cut at the end of the buffer
+            if end == len(buffer) and not isinstance(record, (dict, list, str)):
+                more = f.read(read_size)
+                if more:
+                    buffer = buffer[position:] + more
+                    position = 0
+                    continue
+            yield record
+            position = end
+
+
+def iter_chunks(records, size):
+    """Group an iterable into lists of at most `size` items."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ScoreAccumulator:
+    """Per-stock share of positive stories, built one record at a time.
+
+    Counts the same way as calculate_sentiment_score: each story once per
+    stock, however many outlets copied it.
+    """
+
+    def __init__(self):
+        self.stock_counts = {}
+        self.positive_counts = {}
+        self.counted_stories = set()
+
+    def add(self, entry):
+        stock_name = entry.get('Stock name')
+        ticker = entry.get('Ticker')
+        sentiment = entry.get('Sentiment')
+        if stock_name is None or ticker is None or sentiment is None:
+            return
+        story = (stock_name, ticker, entry.get('Story') or article_id(entry))
+        if story in self.counted_stories:
+            return
+        self.counted_stories.add(story)
+        self.stock_counts[(stock_name, ticker)] = self.stock_counts.get((stock_name, ticker), 0) + 1
+        if sentiment.lower() == 'yes':
+            self.positive_counts[(stock_name, ticker)] = self.positive_counts.get((stock_name, ticker), 0) + 1
+
+    def results(self, date_key='DATE'):
+        """Return the score records, in the format of scoreResults.json."""
+        results = []
+        for (stock_name, ticker), positive_count in self.positive_counts.items():
+            score = (positive_count / self.stock_counts[(stock_name, ticker)]) * 100  # score as a percentage
+            results.append({
+                "ID": len(results) + 1,
+                date_key: datetime.datetime.now().isoformat(),
+                "Stock Name": stock_name,
+                "Ticker": ticker,
+                "Score": round(score, 2)
+            })
+        return results
+
+
+def merge_results(previous, results):
+    """Results of earlier runs overlaid with this run's, by (ticker, article id)."""
+    fresh = {record_key(entry) for entry in results}
+    return [entry for entry in previous if record_key(entry) not in fresh] + list(results)
+
+
+def recover_results(path, accumulator):
+    """Return the (ticker, id) keys already in an NDJSON results file, feeding its records to `accumulator`.
+
+    A last line cut short by a crash is truncated away.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    valid_size = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                entry = loads(line)
+            except ValueError:
+                break
+            valid_size += len(line)
+            done.add(record_key(entry))
+            accumulator.add(entry)
+    if valid_size != os.path.getsize(path):
+        logging.info(f"Truncating an incomplete record at the end of {path}")
+        with open(path, 'r+b') as f:
+            f.truncate(valid_size)
+    return done
+
+
+def stream_sentiment(analyzer, input_path, results_path, scores_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                     date_key='DATE', accumulator=None, classified_ids=None, **process_options):
+    """Classify `input_path` (a file, or any iterable of records) chunk by chunk, appending results to
+    `results_path` as NDJSON.
+
+    Scores come from `accumulator` (a ScoreAccumulator by default; anything
+    with add(entry) and results(date_key) will do). `process_options` are
+    passed to `analyzer.process_news`. Returns the number of records
+    classified by this run. If `classified_ids` is a set, the record_key of the
+    input records that have a result (from this run or an earlier one) are
+    added to it.
+    """
+    accumulator = accumulator if accumulator is not None else ScoreAccumulator()
+    done = recover_results(results_path, accumulator)
+    if done:
+        logging.info(f"Resuming: {len(done)} records already classified in {results_path}")
+
+    classified = 0
+    with open(results_path, 'a', encoding='utf-8') as results:
+        records = iter_json_records(input_path) if isinstance(input_path, str) else input_path
+        for chunk in iter_chunks(records, chunk_size):
+            pending = [article for article in chunk if record_key(article) not in done]
+            if classified_ids is not None:
+                classified_ids.update(record_key(article) for article in chunk if record_key(article) in done)
+            if not pending:
+                continue
+            for entry in analyzer.process_news(pending, **process_options):
+                results.write(dumps(without_story(entry)) + '\n')
+                done.add(record_key(entry))
+                if classified_ids is not None:
+                    classified_ids.add(record_key(entry))
+                accumulator.add(entry)
+                classified += 1
+            results.flush()
+            os.fsync(results.fileno())
+            write_json_atomic(scores_path, accumulator.results(date_key))
+            logging.info(f"Streamed {classified} classified records so far")
+
+    write_json_atomic(scores_path, accumulator.results(date_key))
+    return classified
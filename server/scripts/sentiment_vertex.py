@@ -1,167 +1,310 @@
 import os
-import json
-import datetime
 from dotenv import load_dotenv
 import argparse
 import logging
-import sys
+import functools
 import vertexai
 from vertexai.language_models import TextGenerationModel
 
+from json_io import load_json, save_json
+from news_columns import load_records
+from news_records import record_key, without_story
+from request_driver import DEFAULT_MAX_CONCURRENCY, AIMDLimiter, RequestDriver
+from score_history import DEFAULT_HISTORY_PATH, append_score_file
+from score_ranking import DEFAULT_RANKING_PATH, DEFAULT_TOP_K, priority_universes, publish_ranking, publish_ranking_file
+from sentiment_batch import BatchClassifier
+from sentiment_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_AGE_DAYS, SentimentCache, classify_with_cache
+from sentiment_fanin import FanInClassifier, group_by_headline
+from sentiment_metrics import DEFAULT_METRICS_PATH, CallRecorder, append_run_summary, instrument
+from sentiment_priority import load_priority_list, process_by_priority
+from sentiment_providers import VertexProvider, normalize_reply
+from sentiment_scores import DEFAULT_HALF_LIVES, DEFAULT_STATE_PATH, DecayedScoreAggregator
+from sentiment_stream import DEFAULT_CHUNK_SIZE, ScoreAccumulator, merge_results, stream_sentiment
+from story_clusters import DEFAULT_STORY_THRESHOLD, assign_stories, spread_story_verdicts
+
 # Load .env file
 dotenv_path = os.path.join(os.path.dirname(__file__), '../config/.env')
 load_dotenv(dotenv_path)
 
-# Set the GOOGLE_APPLICATION_CREDENTIALS environment variable
-os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.path.join(os.path.dirname(__file__), os.getenv('GOOGLE_APPLICATION_CREDENTIALS_PATH'))
-
-# Initialize Vertex AI
-# Make sure the project is the same here than in your googlecredentials.json file
-vertexai.init(project="ghc-026", location="us-central1")
-model = TextGenerationModel.from_pretrained("text-bison@001")
+MODEL_NAME = "text-bison@001"
 parameters = {
     "temperature": 0.2,
     "max_output_tokens": 256,
     "top_p": 0.8,
     "top_k": 40
 }
+# text-bison caps a single answer at 1024 tokens, which bounds the batch size
+DEFAULT_BATCH_SIZE = 20
+# Bump when the prompts change so that cached verdicts are not reused
+PROMPT_VERSION = '2'
 
 logging.basicConfig(level=logging.INFO)
 
+
+def load_model():
+    """Initialize Vertex AI and load the text model.
+
+    Done on first use rather than at import, so that the module can be imported
+    (e.g. by benchmarks) without Google credentials.
+    """
+    # Set the GOOGLE_APPLICATION_CREDENTIALS environment variable
+    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.path.join(os.path.dirname(__file__), os.getenv('GOOGLE_APPLICATION_CREDENTIALS_PATH'))
+
+    # Initialize Vertex AI
+    # Make sure the project is the same here than in your googlecredentials.json file
+    vertexai.init(project="ghc-026", location="us-central1")
+    return TextGenerationModel.from_pretrained(MODEL_NAME)
+
+
 class SentimentAnalyzer:
-    def __init__(self):
-        self.model = model
-        self.parameters = parameters
+    def __init__(self, provider=None):
+        self.provider = provider or VertexProvider(load_model(), MODEL_NAME, parameters)
+
+    def complete(self, text, max_tokens=None):
+        """Send one prediction request and return the raw answer, or None if empty."""
+        return self.provider.complete(text, max_tokens)
 
     def analyze_sentiment(self, headline):
         prompt_base = """Forget all your previous instructions. Pretend you are a financial expert. You are a financial expert with stock recommendation experience. Answer “YES” if good news, “NO” if bad news, or “UNKNOWN” if uncertain in the first line. Then elaborate with one short and concise sentence on the next line. """
         prompt = f'{prompt_base} {headline}'
-        response = self.model.predict(prompt, **self.parameters)
-        if response.text:
-            sentiment = response.text
+        sentiment = self.complete(prompt)
+        if sentiment:
             logging.info(f"Sentiment for '{headline}': {sentiment}")
             return sentiment
         else:
             logging.warning(f"No sentiment returned for '{headline}'")
             return None
 
-    def process_news(self, news):
-        """Process a list of news articles."""
-        results = []
+    def classify_headline(self, headline):
+        """Return (sentiment, description) for one headline, or None."""
+        sentiment = self.analyze_sentiment(headline)
+        if sentiment is None:
+            return None
+        return normalize_reply(sentiment)
+
+    def classify_articles(self, articles, batch_size=1, driver=None, fan_in=False):
+        """Return {index: (sentiment, description)} for the articles the model answered.
+
+        With `fan_in`, each unique headline is sent once for all of its tickers.
+        """
+        if driver is None:
+            with RequestDriver() as driver:
+                return self.classify_articles(articles, batch_size, driver, fan_in)
+        if batch_size > 1:
+            classifier_class = FanInClassifier if fan_in else BatchClassifier
+            classifier = classifier_class(self.complete, batch_size, fallback=self.classify_headline,
+                                          max_tokens=self.provider.max_output_tokens, driver=driver)
+            return classifier.classify(articles)
+        logging.info(f"Processing {len(articles)} articles one by one")
+        if not fan_in:
+            return dict(enumerate(driver.map(self.classify_headline, [a.get('News headline') for a in articles])))
+        # The single-headline prompt does not mention the ticker, so each text is asked once
+        groups = group_by_headline(articles)
+        answers = driver.map(self.classify_headline, [group['News headline'] for group in groups])
+        return {index: answer for group, answer in zip(groups, answers) for index in group['members']}
+
+    def process_news(self, news, story_threshold=0, batch_size=1, driver=None,
+                     cache=None, cascade=None, fan_in=False):
+        """Process a list of news articles.
+
+        With a `story_threshold` (e.g. DEFAULT_STORY_THRESHOLD), copies of the
+        same story are grouped first and only one headline per story is
+        analyzed; its verdict is copied to the others. By default every
+        headline is analyzed. Headlines are sent `batch_size` at a time (e.g.
+        DEFAULT_BATCH_SIZE); the default of 1 sends one request each.
+        Requests run concurrently through `driver` (a default RequestDriver).
+        With a SentimentCache, only headlines it does not know are sent.
+        With a CascadeAnalyzer, only headlines the local engine is unsure
+        about are sent.
+        With `fan_in`, a headline collected for several tickers is sent once,
+        asking for a verdict per ticker.
+        """
+        valid_news = []
         for article in news:
-            headline = article.get('News headline')
-            stock_name = article.get('Stock name')
-            ticker = article.get('Ticker')
-            if headline is not None and stock_name is not None and ticker is not None:
-                logging.info(f"Processing article: {headline}")
-                sentiment = self.analyze_sentiment(headline)
-                if sentiment is not None:
-                    sentiment = sentiment.strip()
-                    if sentiment.startswith('YES'):
-                        sentiment, description = sentiment.split(' ', 1) if ' ' in sentiment else (sentiment, '')
-                    elif sentiment.startswith('NO'):
-                        sentiment, description = sentiment.split(' ', 1) if ' ' in sentiment else (sentiment, '')
-                    elif sentiment.startswith('UNKNOWN'):
-                        sentiment, description = sentiment.split(' ', 1) if ' ' in sentiment else (sentiment, '')
-                    else:
-                        description = sentiment
-                        sentiment = 'UNKNOWN'  # or some default value
-                    article['Sentiment'] = sentiment
-                    article['Description'] = description
-                    results.append(article)
-                else:
-                    logging.warning(f"No sentiment returned for article: {headline}")
+            if article.get('News headline') is not None and article.get('Stock name') is not None and article.get('Ticker') is not None:
+                valid_news.append(article)
             else:
                 logging.warning(f"Missing data in article: {article}")
+        to_analyze = assign_stories(valid_news, story_threshold) if story_threshold else valid_news
+        classify = functools.partial(self.classify_articles, batch_size=batch_size, driver=driver, fan_in=fan_in)
+        if cache is not None:
+            classify = functools.partial(classify_with_cache, cache, classify=classify)
+        if cascade is not None:
+            classify = functools.partial(cascade.classify_articles, classify=classify)
+        verdicts = classify(to_analyze)
+        results = []
+        for i, article in enumerate(to_analyze):
+            verdict = verdicts.get(i)
+            if verdict is not None:
+                article['Sentiment'], article['Description'] = verdict
+                results.append(article)
+            else:
+                logging.warning(f"No sentiment returned for article: {article.get('News headline')}")
+        if story_threshold:
+            results = spread_story_verdicts(valid_news, results)
         return results
 
 
-def calculate_sentiment_score(path, output_path):
-    """Load the JSON data, calculate the sentiment score for each stock, and save the results."""
-    try:
-        with open(path) as f:
-            data = json.load(f)
-    except Exception as e:
-        logging.error(f"Error loading JSON: {e}")
+def calculate_sentiment_score(path, output_path, data=None):
+    """Load the JSON data (or take `data`), calculate the sentiment score for each stock, and save the results.
+
+    Pass the records of the run as `data` to count copies of a story once: the
+    file is written without their 'Story' key.
+    """
+    data = load_json(path) if data is None else data
+    if data is None:
         return
 
-    stock_counts = {}
-    positive_counts = {}
+    accumulator = ScoreAccumulator()
     for entry in data:
-        stock_name = entry.get('Stock name')
-        ticker = entry.get('Ticker')
-        sentiment = entry.get('Sentiment')
-
-        if stock_name is not None and ticker is not None and sentiment is not None:
-            # Increment the count for this stock
-            stock_counts[(stock_name, ticker)] = stock_counts.get((stock_name, ticker), 0) + 1
-            # If the sentiment is positive, increment the positive count
-            if sentiment.lower() == 'yes':
-                positive_counts[(stock_name, ticker)] = positive_counts.get((stock_name, ticker), 0) + 1
-
-    # Calculate the sentiment scores and save the results
-    results = []
-    for (stock_name, ticker), positive_count in positive_counts.items():
-        total_count = stock_counts[(stock_name, ticker)]
-        score = (positive_count / total_count) * 100  # score as a percentage
-        result = {
-            "ID": len(results) + 1,
-            "Date": datetime.datetime.now().isoformat(),
-            "Stock Name": stock_name,
-            "Ticker": ticker,
-            "Score": round(score, 2)
-        }
-        results.append(result)
+        accumulator.add(entry)
+    results = accumulator.results("Date")
 
     save_json(output_path, results)
 
-def load_json(path):
-    """Load a JSON file."""
-    try:
-        with open(path) as f:
-            data = json.load(f)
-        logging.info(f"Loaded {len(data)} entries from {path}")
-        return data
-    except Exception as e:
-        logging.error(f"Error loading JSON: {e}")
-        return None
-
-def save_json(path, data):
-    """Save data to a JSON file."""
-    try:
-        with open(path, 'w') as f:
-            json.dump(data, f, indent=4)
-        logging.info(f"Saved {len(data)} entries to {path}")
-    except Exception as e:
-        logging.error(f"Error saving JSON: {e}")
-
 def main():
     print("Starting sentiment analysis...")
     
     # Define the paths to the input and output files
     input_path = '../data/newsData.json'
     output_path = '../data/sentimentResults.json'
+    stream_output_path = '../data/sentimentResults.ndjson'
     output2_path = '../data/scoreResults.json'
 
+    parser = argparse.ArgumentParser(description='Analyze sentiment of news articles with Vertex AI.')
+    parser.add_argument('--story-threshold', type=float, default=0,
+                        help='Similarity above which headlines count as one story, e.g. '
+                             f'{DEFAULT_STORY_THRESHOLD} (0, the default, analyzes every headline).')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help=f'Headlines sent per request, e.g. {DEFAULT_BATCH_SIZE} (1, the default, sends one '
+                             'request per headline).')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help='Upper bound for concurrent requests (1 sends them one at a time); the actual level '
+                             'adapts to throttling.')
+    parser.add_argument('--fan-in', action='store_true',
+                        help='Send a headline collected for several tickers once instead of once per ticker.')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH, default='',
+                        help='Reuse verdicts from a sentiment cache file (the shared cache if no file is given); '
+                             'off by default.')
+    parser.add_argument('--cache-max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help='Cached verdicts older than this are evicted.')
+    parser.add_argument('--priority', default=None,
+                        help='Priority list (see sentiment_priority): held and strategy tickers are scored first '
+                             'and their scores published early. Ignored with --stream.')
+    parser.add_argument('--stream', action='store_true',
+                        help='Classify the news chunk by chunk, appending results to sentimentResults.ndjson and '
+                             'skipping records already in it.')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Records per chunk in --stream mode.')
+    parser.add_argument('--from-mongo', action='store_true',
+                        help='Read the headlines added since the last completed run straight from the News '
+                             'collection instead of newsData.json.')
+    parser.add_argument('--since', default=None,
+                        help='With --from-mongo: an _id or ISO date to read after instead of the saved watermark '
+                             '("all" reads the whole collection).')
+    parser.add_argument('--score-state', nargs='?', const=DEFAULT_STATE_PATH, default='',
+                        help='Give "Score" as a time-decayed score kept in a persistent state (the shared state if '
+                             'no file is given) and updated with each run\'s new results. By default "Score" is the '
+                             'share of positive headlines among all results.')
+    parser.add_argument('--half-life', type=float, nargs='+', default=list(DEFAULT_HALF_LIVES),
+                        help='With --score-state: half-lives in days for the decayed scores; the first one gives '
+                             '"Score".')
+    parser.add_argument('--ranking', default=DEFAULT_RANKING_PATH,
+                        help='Versioned top-K ranking published for the Node consumers ("" disables it).')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Tickers per universe in the ranking.')
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH,
+                        help='Daily score history the run\'s scores are appended to ("" disables it).')
+    parser.add_argument('--metrics', default=DEFAULT_METRICS_PATH,
+                        help='File the run summary (tokens, latency, cost) is appended to ("" disables it).')
+    parser.add_argument('--call-log', default=None, help='NDJSON file to record every provider call to.')
+    args = parser.parse_args()
+
     analyzer = SentimentAnalyzer()
+    recorder = CallRecorder(call_log=args.call_log)
+    analyzer.provider = instrument(analyzer.provider, recorder)
     print("SentimentAnalyzer initialized.")
+    cache = None
+    if args.cache:
+        cache = SentimentCache(args.cache, MODEL_NAME, PROMPT_VERSION)
+        cache.evict(args.cache_max_age_days)
+    # One driver for the whole run, so that its concurrency limit carries over between calls
+    driver = RequestDriver(AIMDLimiter(maximum=args.max_concurrency))
+    aggregator = DecayedScoreAggregator(args.score_state, args.half_life) if args.score_state else None
+    priorities = load_priority_list(args.priority) if args.priority else load_priority_list()
+    universes = priority_universes(priorities)
+    publish = functools.partial(publish_ranking, args.ranking, k=args.top_k, universes=universes) if args.ranking else None
+
+    reader = None
+    if args.from_mongo:
+        from news_store import NewsReader, load_retry, load_watermark, news_collection
+        if args.since:
+            since, retry = None if args.since == 'all' else args.since, {}
+        else:
+            since, retry = load_watermark(), load_retry()
+        reader = NewsReader(news_collection(), since=since, retry=retry)
+    # Keys of the records read that have a result, so the watermark does not skip failed ones
+    classified_ids = set()
 
-    news = load_json(input_path)
-    if news is not None:
+    options = dict(story_threshold=args.story_threshold, batch_size=args.batch_size, fan_in=args.fan_in, driver=driver,
+                   cache=cache)
+    headlines = None
+    if args.stream:
+        print("Starting streaming sentiment analysis")
+        classified = stream_sentiment(analyzer, reader if reader is not None else input_path, stream_output_path,
+                                      output2_path, args.chunk_size, "Date", aggregator, classified_ids=classified_ids,
+                                      **options)
+        print(f"Sentiment analysis completed: {classified} new results appended, scores saved.")
+    else:
+        news = list(reader) if reader is not None else load_records(input_path)
+        if news is None:
+            print("Failed to load news data.")
+            driver.close()
+            return
         print("News data loaded successfully.")
         print("Starting sentiment analysis")
-        results = analyzer.process_news(news)
+        if args.priority:
+            results = process_by_priority(analyzer, news, output2_path, priorities, "Date", aggregator, publish,
+                                          **options)
+        else:
+            results = analyzer.process_news(news, **options)
+            if aggregator is not None:
+                for entry in results:
+                    aggregator.add(entry)
         print("Sentiment analysis completed.")
-        save_json(output_path, results)
+        headlines, classified = len(news), len(results)
+        classified_ids.update(record_key(entry) for entry in results)
+        if reader is not None and os.path.exists(output_path):
+            # Only the new headlines were read: keep the results of earlier runs
+            results = merge_results(load_json(output_path) or [], results)
+        save_json(output_path, [without_story(entry) for entry in results])
         print("Sentiment analysis results saved.")
         print("Starting sentiment score calculation")
-        calculate_sentiment_score(output_path, output2_path)
+        if aggregator is not None:
+            save_json(output2_path, aggregator.results("Date"))
+        else:
+            calculate_sentiment_score(output_path, output2_path, results)
         print("Sentiment scores calculated and saved.")
-    else:
-        print("Failed to load news data.")
 
-    print("Sentiment analysis process finished.")
+    driver.close()
+    if aggregator is not None:
+        aggregator.save()
+        aggregator.close()
+    if reader is not None:
+        from news_store import save_watermark
+        save_watermark(reader.watermark, reader.unresolved(classified_ids))
+    if args.ranking:
+        publish_ranking_file(args.ranking, output2_path, args.top_k, universes)
+    if args.history:
+        append_score_file(args.history, output2_path)
 
+    if args.metrics:
+        append_run_summary(args.metrics, recorder.summary(
+            script='sentiment_vertex',
+            headlines=headlines,
+            classified=classified,
+            cache_hits=cache.hits if cache is not None else None,
+            cache_misses=cache.misses if cache is not None else None,
+        ))
+    print("Sentiment analysis process finished.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""Group syndicated headlines into stories.
+
+Headlines are vectorized with a hashing TF-IDF (no vocabulary to keep in memory)
+into a sparse matrix, and pairs whose cosine similarity reaches the threshold are
+linked using batched sparse matrix products. With groups (the ticker), pairs
+are only looked for within each group, so the products cover the headlines of
+one ticker at a time. Connected pairs form a story; the most connected member
+is the story's representative. Only representatives need to be classified, and
+scores can count each story once instead of once per copy.
+
+The story of a record is kept under its internal 'Story' key while the run
+scores it; news_records.without_story drops it before records are written out.
+"""
+
+import logging
+import re
+import zlib
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from news_records import article_id
+
+
+DEFAULT_STORY_THRESHOLD = 0.6
+DEFAULT_N_FEATURES = 2 ** 18
+DEFAULT_BATCH_SIZE = 1024
+
+TOKEN_RE = re.compile(r"[a-z0-9$%]+(?:'[a-z]+)?")
+# Trailing " - Reuters" / " | Barron's" attributions added by syndicating outlets
+ATTRIBUTION_RE = re.compile(r"\s+[-|]\s+[^-|]{1,40}$")
+
+
+def tokenize(headline):
+    """Lowercase word unigrams and bigrams of a headline, without outlet attribution."""
+    words = TOKEN_RE.findall(ATTRIBUTION_RE.sub('', headline).lower())
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+class HashingTfidf:
+    """Stateless TF-IDF vectorizer using the hashing trick."""
+
+    def __init__(self, n_features=DEFAULT_N_FEATURES):
+        self.n_features = n_features
+
+    def _bucket(self, token):
+        # crc32 is stable across processes, unlike hash()
+        return zlib.crc32(token.encode()) % self.n_features
+
+    def transform(self, headlines):
+        """Return an L2-normalized CSR matrix with one row per headline."""
+        indptr = [0]
+        indices = []
+        data = []
+        for headline in headlines:
+            counts = {}
+            for token in tokenize(headline or ''):
+                bucket = self._bucket(token)
+                counts[bucket] = counts.get(bucket, 0) + 1
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+
+        tf = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(headlines), self.n_features),
+        )
+        tf.sort_indices()
+        # Sublinear term frequency and smoothed inverse document frequency
+        tf.data = 1.0 + np.log(tf.data)
+        df = np.bincount(tf.indices, minlength=self.n_features)
+        idf = np.log((1.0 + len(headlines)) / (1.0 + df)).astype(np.float32) + 1.0
+        tf.data *= idf[tf.indices]
+
+        norms = np.sqrt(np.asarray(tf.multiply(tf).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(tf).tocsr()
+
+
+def similar_pairs(matrix, threshold, batch_size=DEFAULT_BATCH_SIZE):
+    """Return (rows, cols, similarities) of all pairs i < j with cosine similarity >= threshold."""
+    transposed = matrix.T.tocsc()
+    rows, cols, sims = [], [], []
+    for start in range(0, matrix.shape[0], batch_size):
+        block = (matrix[start:start + batch_size] @ transposed).tocoo()
+        block_rows = block.row + start
+        keep = (block.data >= threshold) & (block.col > block_rows)
+        rows.append(block_rows[keep])
+        cols.append(block.col[keep])
+        sims.append(block.data[keep])
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(sims)
+
+
+def cluster_headlines(headlines, threshold=DEFAULT_STORY_THRESHOLD, groups=None, n_features=DEFAULT_N_FEATURES,
+                      batch_size=DEFAULT_BATCH_SIZE):
+    """Cluster headlines into stories.
+
+    When `groups` is given (one key per headline, e.g. the ticker), only
+    headlines sharing a key can end up in the same story.
+
+    Returns (labels, representatives): `labels[i]` is the story number of
+    headline i and `representatives[k]` the index of the member standing for
+    story k (the one linked to the most other members, earliest on ties).
+    """
+    n = len(headlines)
+    if n == 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+
+    matrix = HashingTfidf(n_features).transform(headlines)
+    if groups is None:
+        rows, cols, _ = similar_pairs(matrix, threshold, batch_size)
+    else:
+        # Compare headlines within each group only; the IDF weights stay those of the whole list
+        _, codes = np.unique(np.asarray(groups, dtype=object).astype(str), return_inverse=True)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        rows, cols = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for members in np.split(order, bounds):
+            if len(members) < 2:
+                continue
+            group_rows, group_cols, _ = similar_pairs(matrix[members], threshold, batch_size)
+            rows.append(members[group_rows])
+            cols.append(members[group_cols])
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+    graph = sparse.coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    n_stories, labels = connected_components(graph, directed=False)
+
+    degree = np.bincount(rows, minlength=n) + np.bincount(cols, minlength=n)
+    # Sort by story, then most links first, then original order
+    order = np.lexsort((np.arange(n), -degree, labels))
+    first = np.ones(n, dtype=bool)
+    first[1:] = labels[order][1:] != labels[order][:-1]
+    representatives = np.empty(n_stories, dtype=np.int64)
+    representatives[labels[order][first]] = order[first]
+    return labels, representatives
+
+
+def assign_stories(news, threshold=DEFAULT_STORY_THRESHOLD):
+    """Tag each article with the Id of its story's representative.
+
+    Stories never span tickers: templated headlines such as "<Company> stock
+    outperforms market" are near-identical text about different events.
+    Sets article['Story'] in place and returns the list of representative
+    articles, in their original order.
+    """
+    if not news:
+        return []
+    labels, representatives = cluster_headlines(
+        [article.get('News headline') for article in news],
+        threshold,
+        groups=[article.get('Ticker') for article in news],
+    )
+    for article, label in zip(news, labels):
+        article['Story'] = article_id(news[representatives[label]])
+    logging.info(f"Grouped {len(news)} headlines into {len(representatives)} stories")
+    return [news[i] for i in sorted(representatives)]
+
+
+def spread_story_verdicts(news, classified):
+    """Copy Sentiment and Description from classified representatives to the rest of their story.
+
+    Returns every article of `news` whose story got a verdict.
+    """
+    verdicts = {
+        article['Story']: (article['Sentiment'], article.get('Description'))
+        for article in classified if article.get('Story') is not None
+    }
+    results = []
+    for article in news:
+        verdict = verdicts.get(article.get('Story'))
+        if verdict is None:
+            continue
+        article['Sentiment'], article['Description'] = verdict
+        results.append(article)
+    return results
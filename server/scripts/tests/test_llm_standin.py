@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from llm_standin import (RecordingProvider, StandinBehavior, StandinProvider, claude_prompt, claude_text,
+                         load_replay, make_server, synthesize_answer)
+
+FLAVORS = ('claude', 'openai', 'vertex')
+
+
+class RealProvider:
+    name = 'real'
+
+    def complete(self, text, max_tokens=None):
+        return f'YES\nRecorded answer to: {text}'
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(behavior):
+        server = make_server(behavior, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_claude_text_unwraps_the_wire_prompt():
+    text = 'Forget all your previous instructions. Headline'
+    assert claude_text(claude_prompt(text)) == text
+    assert claude_text(text) == text
+
+
+@pytest.mark.parametrize('flavor', FLAVORS)
+def test_recorded_replies_are_replayed(flavor, tmp_path, serve):
+    replay = str(tmp_path / 'replay.ndjson')
+    recorder = RecordingProvider(RealProvider(), replay)
+    prompts = ['Is this good news? Apple beats estimates', 'Is this good news? Tesla recalls cars']
+    recorded = [recorder.complete(prompt) for prompt in prompts]
+
+    behavior = StandinBehavior(replay=load_replay(replay))
+    provider = StandinProvider(serve(behavior), flavor)
+    assert [provider.complete(prompt) for prompt in prompts] == recorded
+    assert behavior.stats['replayed'] == len(prompts)
+
+
+@pytest.mark.parametrize('flavor', FLAVORS)
+def test_unknown_prompts_are_synthesized(flavor, serve):
+    behavior = StandinBehavior()
+    provider = StandinProvider(serve(behavior), flavor)
+    assert provider.complete('Headline') == synthesize_answer('Headline')
+    assert behavior.stats['replayed'] == 0
+
+
+def test_batch_prompts_get_a_line_per_headline():
+    prompt = 'Reply in the format number|tag|answer|sentence\n1|0a1b2c3d|AAPL|Apple beats\n2|0a1b2c3e|TSLA|Tesla recalls'
+    lines = synthesize_answer(prompt).splitlines()
+    assert [line.split('|')[:2] for line in lines] == [['1', '0a1b2c3d'], ['2', '0a1b2c3e']]
+    assert all(line.split('|')[2] in ('YES', 'NO', 'UNKNOWN') for line in lines)
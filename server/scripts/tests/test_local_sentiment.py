@@ -0,0 +1,48 @@
+import json
+import sys
+
+import local_sentiment
+from local_sentiment import LocalSentimentAnalyzer, LocalSentimentEngine, load_vader_lexicon
+
+
+def article(headline, ticker='AAPL'):
+    return {'News headline': headline, 'Ticker': ticker, 'Stock name': ticker, 'DATE': '2023-07-12'}
+
+
+def test_lexicon_is_read_once():
+    assert load_vader_lexicon() is load_vader_lexicon()
+    engine = LocalSentimentEngine()
+    assert engine.tokens == LocalSentimentEngine().tokens
+    assert 'beats' in engine.tokens
+
+
+def test_classify_uses_the_finance_overlay_and_negations():
+    engine = LocalSentimentEngine()
+    verdicts = engine.classify([
+        'Apple beats estimates and raises guidance',
+        'Analysts downgrade Tesla after guidance cut',
+        'Microsoft did not beat estimates',
+        'Company holds annual meeting',
+    ])
+    assert [sentiment for sentiment, _, _ in verdicts] == ['YES', 'NO', 'NO', 'UNKNOWN']
+    assert verdicts[0][2] > 0 > verdicts[1][2]
+
+
+def test_process_news_skips_incomplete_articles():
+    news = [article('Apple beats estimates'), {'News headline': 'No ticker'}]
+    results = LocalSentimentAnalyzer().process_news(news)
+    assert len(results) == 1
+    assert results[0]['Sentiment'] == 'YES'
+    assert results[0]['Description'].startswith('Lexicon score')
+
+
+def test_cli_runs_without_any_provider(tmp_path, monkeypatch):
+    news = tmp_path / 'news.json'
+    news.write_text(json.dumps([article('Apple beats estimates'), article('Apple shares plunge on probe'),
+                                article('Tesla soars to record', 'TSLA')]))
+    results, scores = tmp_path / 'results.json', tmp_path / 'scores.json'
+    monkeypatch.setattr(sys, 'argv', ['local_sentiment.py', str(news), str(results), str(scores)])
+    local_sentiment.main()
+    assert len(json.loads(results.read_text())) == 3
+    by_ticker = {entry['Ticker']: entry['Score'] for entry in json.loads(scores.read_text())}
+    assert by_ticker == {'AAPL': 50.0, 'TSLA': 100.0}
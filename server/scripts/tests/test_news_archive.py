@@ -0,0 +1,53 @@
+import datetime
+
+import news_archive
+from news_archive import NewsArchive
+
+
+def record(number, ticker='AAPL', date='2023-07-12T10:00:00', headline=None):
+    return {'Id': f'id{number}', 'News headline': headline or f'Headline {number}', 'Ticker': ticker,
+            'Stock name': ticker, 'Date': date}
+
+
+def headlines(records):
+    return [entry['News headline'] for entry in records]
+
+
+def test_append_and_query_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(news_archive, 'BLOCK_RECORDS', 4)
+    archive = NewsArchive(str(tmp_path))
+    news = [record(number, 'AAPL' if number % 2 else 'MSFT', f'2023-07-{10 + number % 3}T{number % 24:02d}:00:00')
+            for number in range(30)]
+    assert archive.append(news + [record(99, date=None)]) == 30
+    assert sorted(archive.parts()) == ['2023-07-10', '2023-07-11', '2023-07-12']
+
+    aapl = archive.query('AAPL', '2023-07-11', '2023-07-12')
+    expected = sorted((entry for entry in news if entry['Ticker'] == 'AAPL' and entry['Date'] >= '2023-07-11'),
+                      key=lambda entry: entry['Date'])
+    assert aapl == expected
+    assert headlines(archive.query('AAPL', end='2023-07-10')) == headlines(
+        sorted((entry for entry in news if entry['Ticker'] == 'AAPL' and entry['Date'] < '2023-07-11'),
+               key=lambda entry: entry['Date']))
+    assert len(archive.query()) == 30
+    assert archive.query('TSLA') == []
+
+
+def test_later_parts_replace_copies_and_compact_merges_them(tmp_path):
+    archive = NewsArchive(str(tmp_path))
+    archive.append([record(1), record(2)])
+    archive.append([dict(record(1), Sentiment='YES'), record(3)])
+    assert len(archive.parts()['2023-07-12']) == 2
+    assert len(archive.query('AAPL')) == 3
+    assert archive.query('AAPL')[0].get('Sentiment') == 'YES'
+
+    assert archive.compact() == 1
+    assert len(archive.parts()['2023-07-12']) == 1
+    assert [entry.get('Sentiment') for entry in archive.query('AAPL')] == ['YES', None, None]
+
+
+def test_retain_drops_old_days(tmp_path):
+    archive = NewsArchive(str(tmp_path))
+    archive.append([record(1, date='2023-01-01T10:00:00'), record(2, date='2023-07-12T10:00:00')])
+    assert archive.retain(30, today=datetime.date(2023, 7, 20)) == 1
+    assert list(archive.parts()) == ['2023-07-12']
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == ['.idx', '.seg']
@@ -0,0 +1,88 @@
+import json
+import time
+
+import pytest
+
+from news_columns import NULL_TIMESTAMP, NewsColumns, read_records, to_milliseconds, write_columns
+from news_records import article_timestamp
+
+
+RECORDS = [
+    {'Id': 'a1', 'News headline': 'Apple beats estimates', 'Date': '2023-07-10T12:00:00', 'Ticker': 'AAPL',
+     'Description': ''},
+    {'Id': 'b2', 'News headline': None, 'Date': '2023-07-11T08:30:15.250', 'Ticker': 'MSFT',
+     'Description': 'Empty, not missing'},
+    {'Id': 'c3', 'News headline': 'Apple suppliers slip', 'Date': None, 'Ticker': 'AAPL'},
+]
+
+
+def test_round_trip_keeps_none_apart_from_empty_strings(tmp_path):
+    path = str(tmp_path / 'news.cols')
+    write_columns(path, RECORDS)
+    records = read_records(path)
+    assert [record['News headline'] for record in records] == ['Apple beats estimates', None, 'Apple suppliers slip']
+    assert [record['Description'] for record in records] == ['', 'Empty, not missing', None]
+    assert [record['Date'] for record in records] == ['2023-07-10T12:00:00', '2023-07-11T08:30:15.250', None]
+    assert [record for record in records if record.get('News headline') is not None] == [records[0], records[2]]
+
+
+def test_columns_without_nulls_have_no_bitmap(tmp_path):
+    path = str(tmp_path / 'news.cols')
+    write_columns(path, RECORDS)
+    columns = NewsColumns(path)
+    try:
+        assert 'nulls' not in columns.columns['Id']['blocks']
+        assert 'nulls' in columns.columns['News headline']['blocks']
+        assert columns.rows_where('Ticker', 'AAPL').tolist() == [0, 2]
+        assert columns.is_null('News headline', 1) and not columns.is_null('Id', 1)
+    finally:
+        columns.close()
+
+
+def test_json_input_is_read_as_is(tmp_path):
+    path = tmp_path / 'news.json'
+    path.write_text(json.dumps(RECORDS))
+    assert read_records(str(path)) == RECORDS
+
+
+def test_to_milliseconds():
+    assert to_milliseconds('2023-07-10T12:00:00Z') == 1688990400000
+    assert to_milliseconds(1688990400) == 1688990400000
+    assert to_milliseconds('') == NULL_TIMESTAMP
+    assert to_milliseconds('soon') == NULL_TIMESTAMP
+
+
+def test_scalars_keep_their_type(tmp_path):
+    path = str(tmp_path / 'news.cols')
+    records = [{'Id': 'a1', 'n': 5, 'flag': True, 'score': 0.5, '__v': 0},
+               {'Id': 'b2', 'n': None, 'flag': False, 'score': 2, '__v': 0},
+               {'Id': 'c3', 'n': -7}]
+    write_columns(path, records)
+    assert read_records(path) == [{'Id': 'a1', 'n': 5, 'flag': True, 'score': 0.5, '__v': 0},
+                                  {'Id': 'b2', 'n': None, 'flag': False, 'score': 2.0, '__v': 0},
+                                  {'Id': 'c3', 'n': -7, 'flag': None, 'score': None, '__v': None}]
+    columns = NewsColumns(path)
+    try:
+        assert [columns.kind(name) for name in ('n', 'flag', 'score')] == ['int64', 'bool', 'float64']
+        assert columns.scalars('n').tolist() == [5, 0, -7]
+        assert type(columns.value('n', 0)) is int and type(columns.value('flag', 0)) is bool
+    finally:
+        columns.close()
+
+
+def test_mixed_columns_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="'n'"):
+        write_columns(str(tmp_path / 'news.cols'), [{'n': 5}, {'n': '5'}])
+    with pytest.raises(ValueError):
+        write_columns(str(tmp_path / 'news.cols'), [{'tags': ['a', 'b']}])
+
+
+def test_naive_dates_are_utc_everywhere(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    try:
+        for date in ('2023-07-10T12:00:00', '2023-07-10T12:00:00Z', '2023-07-10T08:00:00-04:00'):
+            assert article_timestamp({'Date': date}) * 1000 == to_milliseconds(date) == 1688990400000
+    finally:
+        monkeypatch.undo()
+        time.tzset()
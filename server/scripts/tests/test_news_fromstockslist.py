@@ -0,0 +1,100 @@
+import datetime
+
+import pytest
+
+import news_fromstockslist
+from proxy_health import ProxyHealth
+
+
+class Response:
+    def __init__(self, status_code=200, payload=None, text=''):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = text
+
+    def json(self):
+        if self.payload is None:
+            raise ValueError('No JSON object could be decoded')
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise news_fromstockslist.requests.exceptions.HTTPError(f'{self.status_code} Error')
+
+
+def story(number):
+    return {'id': str(number), 'title': f'Story {number}', 'time': datetime.datetime.now().timestamp() * 1000,
+            'tickers': ['aapl']}
+
+
+@pytest.fixture
+def health(tmp_path):
+    return ProxyHealth(str(tmp_path / 'proxyhealth.json'))
+
+
+def serve(monkeypatch, responses):
+    """Make requests.get return `responses` in turn, recording the proxies used."""
+    used = []
+
+    def get(url, proxies=None, timeout=None):
+        used.append(proxies['http'] if proxies else None)
+        return responses.pop(0)
+
+    monkeypatch.setattr(news_fromstockslist.requests, 'get', get)
+    return used
+
+
+def test_ticker_without_stories_is_not_a_proxy_fault(monkeypatch, health):
+    proxies = [f'http://10.0.0.{number}:8080' for number in range(5)]
+    serve(monkeypatch, [Response(payload={'stories': []}) for _ in range(3)])
+    for ticker in ('AAA', 'BBB', 'CCC'):
+        assert news_fromstockslist.fetch_tickertick_news(ticker, 1, health.rank(proxies), health) == []
+    assert health.rank(proxies) == proxies
+    assert all(record['circuit'] == 'closed' for record in health.records.values())
+
+
+def test_empty_page_ends_the_feed(monkeypatch, health):
+    used = serve(monkeypatch, [Response(payload={'stories': [story(1), story(2)]}),
+                               Response(payload={'stories': []})])
+    news = news_fromstockslist.fetch_tickertick_news('AAPL', 1, ['http://a:1', 'http://b:1', 'http://c:1'], health)
+    assert [article['News headline'] for article in news] == ['Story 1', 'Story 2']
+    assert used == ['http://a:1', 'http://b:1']
+
+
+def test_rate_limit_and_bad_bodies_count_against_the_proxy(monkeypatch, health):
+    serve(monkeypatch, [Response(429), Response(200, payload=None), Response(503),
+                        Response(payload={'stories': [story(1)]}), Response(payload={'stories': []})])
+    proxies = ['http://a:1', 'http://b:1', 'http://c:1', 'http://d:1', 'http://e:1']
+    news = news_fromstockslist.fetch_tickertick_news('AAPL', 1, proxies, health)
+    assert len(news) == 1
+    assert [health.records[proxy]['last_failure'] for proxy in proxies[:3]] == ['rate_limited', 'protocol',
+                                                                               'http_status']
+    assert health.success_ratio('http://d:1') == 1.0
+
+
+def trip(health, proxy):
+    for _ in range(3):
+        health.record_failure(proxy, 'timeout')
+
+
+def test_open_circuits_fall_back_to_a_direct_connection(monkeypatch, health):
+    proxies = ['http://a:1', 'http://b:1']
+    for proxy in proxies:
+        trip(health, proxy)
+    used = serve(monkeypatch, [Response(payload={'stories': [story(1)]}), Response(payload={'stories': []})])
+    news = news_fromstockslist.fetch_tickertick_news('AAPL', 1, proxies, health)
+    # The direct connection is the last route: its page is kept and the feed not read further
+    assert used == [None]
+    assert [article['News headline'] for article in news] == ['Story 1']
+    assert list(news_fromstockslist.proxy_attempts(proxies, health)) == [None]
+    assert list(news_fromstockslist.proxy_attempts(['http://c:1', None, 'http://a:1'], health)) == ['http://c:1', None]
+    assert list(news_fromstockslist.proxy_attempts(None, health)) == [None]
+
+
+def test_google_news_goes_direct_when_every_circuit_is_open(monkeypatch, health):
+    trip(health, 'http://a:1')
+    monkeypatch.setenv('http_proxy', 'http://stale:1')
+    used = serve(monkeypatch, [Response(200)])
+    assert news_fromstockslist.fetch_google_news('AAPL', 1, ['http://a:1'], health) == []
+    assert used == [None]
+    assert 'http_proxy' not in news_fromstockslist.os.environ
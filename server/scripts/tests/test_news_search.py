@@ -0,0 +1,70 @@
+import numpy as np
+
+import news_search
+from news_search import NewsSearch, decode_varints, encode_varints, parse_query
+
+
+def record(number, headline, ticker='JPM', day=10):
+    return {'Id': f'id{number}', 'News headline': headline, 'Ticker': ticker, 'Stock name': ticker,
+            'Date': f'2023-07-{day:02d}T10:00:00'}
+
+
+NEWS = [
+    record(1, 'Fed signals another rate hike', day=10),
+    record(2, 'JPMorgan beats as rate hike lifts margins', day=11),
+    record(3, 'Hike in rates weighs on lenders', day=12),
+    record(4, 'Apple rate of growth slows', 'AAPL', day=13),
+    record(5, 'Fed signals another rate hike', 'BAC', day=14),
+]
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 2 ** 32, 2 ** 62], dtype=np.uint64)
+    encoded = encode_varints(values)
+    assert len(encoded) == 1 + 1 + 1 + 2 + 2 + 5 + 9
+    assert decode_varints(encoded).tolist() == values.tolist()
+    assert encode_varints([]) == b'' and decode_varints(b'').tolist() == []
+
+
+def test_parse_query_splits_words_and_phrases():
+    assert parse_query('"Rate Hike" fed margins') == (['fed', 'margins'], [['rate', 'hike']])
+    assert parse_query('rate-hike') == ([], [['rate', 'hike']])
+
+
+def test_search_round_trip_newest_first(tmp_path):
+    index = NewsSearch(str(tmp_path))
+    assert index.add(NEWS) == 5
+    assert [entry['Id'] for entry in index.search('rate')] == ['id5', 'id4', 'id2', 'id1']
+    assert [entry['Id'] for entry in index.search('"rate hike"')] == ['id5', 'id2', 'id1']
+    assert [entry['Id'] for entry in index.search('hike rate')] == ['id5', 'id2', 'id1']
+    assert [entry['Id'] for entry in index.search('"hike rate"')] == []
+    assert [entry['Id'] for entry in index.search('"rate hike"', ticker='JPM')] == ['id2', 'id1']
+    assert [entry['Id'] for entry in index.search('', ticker='AAPL')] == ['id4']
+    assert index.search('rate', limit=1) == [NEWS[4]]
+    assert index.count('fed') == 2
+    index.close()
+
+
+def test_reopened_index_skips_known_headlines(tmp_path):
+    index = NewsSearch(str(tmp_path))
+    index.add(NEWS[:3])
+    index.close()
+    reopened = NewsSearch(str(tmp_path))
+    assert reopened.add(NEWS) == 2
+    assert len(reopened) == 5
+    assert len(reopened.segments) == 2
+    assert reopened.count('rate') == 4
+    reopened.close()
+
+
+def test_merge_keeps_doc_ids_and_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(news_search, 'MAX_SEGMENTS', 2)
+    index = NewsSearch(str(tmp_path))
+    for entry in NEWS:
+        index.add([entry])
+    assert len(index.segments) <= 2
+    index.merge()
+    assert len(index.segments) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['manifest.json', index.manifest['segments'][0]]
+    assert [entry['Id'] for entry in index.search('"rate hike"')] == ['id5', 'id2', 'id1']
+    index.close()
@@ -0,0 +1,87 @@
+import datetime
+
+import pytest
+
+pytest.importorskip('pymongo')
+
+from mongo_standin import MemoryCollection  # noqa: E402
+from news_store import NewsReader, NewsWriter, load_retry, load_watermark, save_watermark  # noqa: E402
+from news_records import record_key  # noqa: E402
+from sentiment_stream import merge_results  # noqa: E402
+
+
+def headline(number, ticker='AAPL'):
+    return {
+        'Id': f'id-{number}',
+        'News headline': f'Headline {number}',
+        'Date': datetime.datetime(2023, 7, 12, 10, number).isoformat(),
+        'Ticker': ticker,
+        'Stock name': ticker,
+        'Source': 'google_news',
+    }
+
+
+@pytest.fixture
+def collection():
+    collection = MemoryCollection()
+    writer = NewsWriter(collection, batch_size=2)
+    writer.ensure_indexes()
+    writer.write([headline(number) for number in range(5)])
+    return collection
+
+
+def test_writer_is_idempotent(collection):
+    stats = NewsWriter(collection).write([headline(number) for number in range(6)])
+    assert stats['inserted'] == 1
+    assert stats['existing'] == 5
+    assert collection.count_documents({}) == 6
+
+
+def test_reader_resumes_after_watermark(collection, tmp_path):
+    path = str(tmp_path / 'watermark.json')
+    reader = NewsReader(collection, batch_size=2)
+    first = list(reader)
+    assert [record['newsId'] for record in first] == [f'id-{number}' for number in range(5)]
+    save_watermark(reader.watermark, reader.unresolved({record_key(record) for record in first}), path=path)
+
+    NewsWriter(collection).write([headline(5)])
+    reader = NewsReader(collection, since=load_watermark(path), retry=load_retry(path))
+    assert [record['newsId'] for record in reader] == ['id-5']
+
+
+def test_failed_headlines_are_read_again(collection, tmp_path):
+    path = str(tmp_path / 'watermark.json')
+    reader = NewsReader(collection)
+    records = list(reader)
+    # The provider failed on id-1 and id-3
+    classified = {record_key(record) for record in records} - {('AAPL', 'id-1'), ('AAPL', 'id-3')}
+    save_watermark(reader.watermark, reader.unresolved(classified), path=path)
+    assert sorted(load_retry(path).values()) == [1, 1]
+
+    NewsWriter(collection).write([headline(5)])
+    reader = NewsReader(collection, since=load_watermark(path), retry=load_retry(path))
+    records = list(reader)
+    assert [record['newsId'] for record in records] == ['id-1', 'id-3', 'id-5']
+    save_watermark(reader.watermark, reader.unresolved({record_key(record) for record in records}), path=path)
+    assert load_retry(path) == {}
+    assert [record['newsId'] for record in NewsReader(collection, since=load_watermark(path))] == []
+
+
+def test_headlines_failing_every_run_are_given_up(collection, tmp_path, monkeypatch):
+    monkeypatch.setattr('news_store.MAX_RETRIES', 2)
+    path = str(tmp_path / 'watermark.json')
+    reader = NewsReader(collection)
+    list(reader)
+    save_watermark(reader.watermark, reader.unresolved(set()), path=path)
+    assert len(load_retry(path)) == 5
+    reader = NewsReader(collection, since=load_watermark(path), retry=load_retry(path))
+    list(reader)
+    assert reader.unresolved(set()) == {}
+
+
+def test_merge_results_keeps_earlier_runs():
+    previous = [dict(headline(0), Sentiment='YES'), dict(headline(1), Sentiment='NO')]
+    fresh = [dict(headline(1), Sentiment='YES'), dict(headline(2), Sentiment='NO')]
+    merged = merge_results(previous, fresh)
+    assert [(record['Id'], record['Sentiment']) for record in merged] == [('id-0', 'YES'), ('id-1', 'YES'),
+                                                                         ('id-2', 'NO')]
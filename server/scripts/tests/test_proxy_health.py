@@ -0,0 +1,108 @@
+import pytest
+import requests
+
+from proxy_health import BASE_COOLDOWN, FAILURE_THRESHOLD, ProxyHealth, classify_failure
+
+NOW = 1_000_000.0
+
+
+@pytest.fixture
+def health(tmp_path):
+    return ProxyHealth(str(tmp_path / 'proxyhealth.json'))
+
+
+def trip(health, proxy, now=NOW):
+    for _ in range(FAILURE_THRESHOLD):
+        health.record_failure(proxy, 'timeout', now)
+
+
+def test_latency_is_an_ewma(health):
+    health.record_success('a', 1.0, NOW)
+    health.record_success('a', 2.0, NOW)
+    assert health.records['a']['latency'] == pytest.approx(0.3 * 2.0 + 0.7 * 1.0)
+
+
+def test_success_ratio_is_rolling(health, monkeypatch):
+    monkeypatch.setattr('proxy_health.WINDOW', 4)
+    for outcome in (False, False, True, True, True, True):
+        if outcome:
+            health.record_success('a', 1.0, NOW)
+        else:
+            health.record_failure('a', 'timeout', NOW)
+    assert health.success_ratio('a') == 1.0
+    assert health.success_ratio('unknown') is None
+
+
+def test_circuit_opens_after_consecutive_failures(health):
+    for _ in range(FAILURE_THRESHOLD - 1):
+        health.record_failure('a', 'refused', NOW)
+    assert health.allows('a', NOW)
+    health.record_failure('a', 'refused', NOW)
+    assert health.records['a']['circuit'] == 'open'
+    assert health.records['a']['last_failure'] == 'refused'
+    assert not health.allows('a', NOW + BASE_COOLDOWN - 1)
+
+
+def test_half_open_allows_one_trial(health):
+    trip(health, 'a')
+    later = NOW + BASE_COOLDOWN
+    assert health.allows('a', later)
+    assert health.records['a']['circuit'] == 'half_open'
+    assert not health.allows('a', later + 1)  # the trial is still out
+
+
+def test_successful_trial_closes_the_circuit(health):
+    trip(health, 'a')
+    health.allows('a', NOW + BASE_COOLDOWN)
+    health.record_success('a', 0.5, NOW + BASE_COOLDOWN + 1)
+    assert health.records['a']['circuit'] == 'closed'
+    assert health.allows('a', NOW + BASE_COOLDOWN + 2)
+
+
+def test_failed_trial_reopens_with_a_longer_cooldown(health):
+    trip(health, 'a')
+    health.allows('a', NOW + BASE_COOLDOWN)
+    reopened = NOW + BASE_COOLDOWN + 1
+    health.record_failure('a', 'timeout', reopened)
+    assert health.records['a']['circuit'] == 'open'
+    assert health.records['a']['trips'] == 2
+    assert not health.allows('a', reopened + BASE_COOLDOWN)
+    assert health.allows('a', reopened + 2 * BASE_COOLDOWN)
+
+
+def test_rank_puts_fast_live_proxies_first(health):
+    health.record_success('slow', 2.0, NOW)
+    health.record_success('fast', 0.2, NOW)
+    health.record_success('flaky', 0.2, NOW)
+    for _ in range(2):
+        health.record_failure('flaky', 'timeout', NOW)
+    trip(health, 'dead')
+    assert health.rank(['dead', 'new', 'slow', 'flaky', 'fast'], NOW) == ['fast', 'flaky', 'slow', 'new']
+
+
+def test_records_persist(health):
+    health.record_success('a', 0.4, NOW)
+    trip(health, 'b')
+    health.save(now=NOW)
+    loaded = ProxyHealth(health.path)
+    assert loaded.rank(['b', 'a'], NOW) == ['a']
+    assert loaded.records['b']['last_failure'] == 'timeout'
+
+
+def test_validator_results_are_recorded(health):
+    health.record_results([
+        {'proxy': 'a', 'ok': True, 'stage': 'target', 'failure': None, 'latency': 0.3},
+        {'proxy': 'b', 'ok': False, 'stage': 'connect', 'failure': 'refused', 'latency': None},
+        {'proxy': 'c', 'ok': False, 'stage': None, 'failure': 'cancelled', 'latency': None},
+    ], NOW)
+    assert health.success_ratio('a') == 1.0
+    assert health.records['b']['last_failure'] == 'refused'
+    assert 'c' not in health.records
+
+
+def test_classify_failure():
+    assert classify_failure(requests.exceptions.ConnectTimeout()) == 'timeout'
+    assert classify_failure(requests.exceptions.ProxyError()) == 'proxy_error'
+    assert classify_failure(requests.exceptions.ConnectionError('Connection refused')) == 'refused'
+    assert classify_failure(requests.exceptions.HTTPError()) == 'http_status'
+    assert classify_failure(ValueError('No JSON')) == 'protocol'
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from request_driver import AIMDLimiter, DeadlineExceeded, RequestDriver, is_overload, parse_retry_after
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+def test_limiter_halves_on_overload_and_grows_on_success():
+    limiter = AIMDLimiter(initial=8, maximum=16)
+    limiter.on_overload()
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.limit == pytest.approx(5, abs=0.2)
+    limiter.limit = 1
+    limiter.on_overload()
+    assert limiter.limit == 1
+    assert AIMDLimiter(initial=8, maximum=1).limit == 1
+
+
+def test_limiter_pauses_on_retry_after():
+    limiter = AIMDLimiter()
+    limiter.on_overload(retry_after=30)
+    assert limiter.paused_until - time.monotonic() > 25
+
+
+def test_overload_signals():
+    assert is_overload(Throttled())
+    assert is_overload(DeadlineExceeded())
+    assert not is_overload(ValueError('bad reply'))
+    assert parse_retry_after('2') == 2.0
+    assert parse_retry_after('soon') is None
+
+
+def test_call_retries_and_lowers_the_limit_on_overload():
+    attempts = []
+
+    def flaky(item):
+        attempts.append(item)
+        if len(attempts) < 3:
+            raise Throttled()
+        return item * 2
+
+    with RequestDriver(AIMDLimiter(initial=8), backoff=0) as driver:
+        assert driver.call(flaky, 21) == 42
+        assert driver.retries == 2
+        assert driver.limiter.limit < 8
+
+
+def test_call_gives_up_after_max_attempts():
+    def failing(item):
+        raise ValueError('bad reply')
+
+    with RequestDriver(max_attempts=2, backoff=0) as driver:
+        assert driver.call(failing, 1) is None
+        assert driver.retries == 1
+
+
+def test_map_keeps_input_order():
+    with RequestDriver() as driver:
+        assert driver.map(lambda item: item * item, range(20)) == [item * item for item in range(20)]
+        assert driver.map(str, []) == []
+
+
+def test_timeouts_are_overloads():
+    class ReadTimeout(Exception):
+        pass
+
+    assert is_overload(ReadTimeout())
+    assert is_overload(TimeoutError())
+
+
+def test_a_retry_waits_for_the_timed_out_attempt():
+    class ReadTimeout(Exception):
+        pass
+
+    limiter = AIMDLimiter(initial=4)
+    attempts = []
+
+    def slow_then_fine(item):
+        started = time.monotonic()
+        if not attempts:
+            time.sleep(0.05)
+            attempts.append((started, time.monotonic(), limiter.in_flight))
+            raise ReadTimeout()
+        attempts.append((started, time.monotonic(), limiter.in_flight))
+        return item
+
+    with RequestDriver(limiter, backoff=0) as driver:
+        assert driver.call(slow_then_fine, 7) == 7
+    (_, first_end, first_slots), (second_start, _, second_slots) = attempts
+    assert second_start >= first_end
+    assert first_slots == second_slots == 1
+    assert limiter.limit < 4 and limiter.in_flight == 0
+
+
+def test_errors_are_failures_not_successes():
+    limiter = AIMDLimiter(initial=4)
+
+    def failing(item):
+        raise ConnectionError('reset')
+
+    with RequestDriver(limiter, max_attempts=3, backoff=0) as driver:
+        assert driver.call(failing, 1) is None
+        assert driver.retries == 2
+    assert limiter.limit == 4
+
+
+def test_close_shuts_the_pool_down():
+    with RequestDriver() as driver:
+        driver.map(str, range(10))
+    with pytest.raises(RuntimeError):
+        driver.map(str, range(2))
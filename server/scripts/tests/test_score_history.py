@@ -0,0 +1,62 @@
+import datetime
+
+import numpy as np
+import pytest
+
+import score_history
+from score_history import ScoreHistory
+
+
+DAY = datetime.date(2023, 7, 10)
+
+
+def scores(count, value=1.0):
+    return {f'T{number}': value + number for number in range(count)}
+
+
+def test_append_and_read_back(tmp_path):
+    path = str(tmp_path / 'history.f32')
+    history = ScoreHistory(path)
+    history.append(DAY, {'AAPL': 60.0, 'MSFT': 40.0})
+    history.append(DAY + datetime.timedelta(days=2), {'AAPL': 70.0})
+    reopened = ScoreHistory(path)
+    assert [str(day) for day in reopened.dates()] == ['2023-07-10', '2023-07-11', '2023-07-12']
+    assert np.isnan(reopened.history('MSFT')[1:]).all()
+    assert reopened.history('AAPL')[[0, 2]].tolist() == [60.0, 70.0]
+    with pytest.raises(ValueError):
+        reopened.append(DAY, {'AAPL': 1.0})
+
+
+def test_growth_keeps_rows_aligned(tmp_path, monkeypatch):
+    monkeypatch.setattr(score_history, 'INITIAL_CAPACITY', 4)
+    path = str(tmp_path / 'history.f32')
+    history = ScoreHistory(path)
+    history.append(DAY, scores(3))
+    history.append(DAY + datetime.timedelta(days=1), scores(10, value=100.0))
+    reopened = ScoreHistory(path)
+    assert reopened.index['capacity'] == 16
+    assert reopened.history('T2').tolist() == [3.0, 102.0]
+    assert np.isnan(reopened.history('T9')[0])
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['history.f32.16', 'history.f32.index.json']
+
+
+def test_crash_while_growing_leaves_the_old_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(score_history, 'INITIAL_CAPACITY', 4)
+    path = str(tmp_path / 'history.f32')
+    ScoreHistory(path).append(DAY, scores(3))
+
+    def crash(self):
+        raise OSError('disk gone')
+
+    history = ScoreHistory(path)
+    monkeypatch.setattr(ScoreHistory, '_commit', crash)
+    with pytest.raises(OSError):
+        history.append(DAY + datetime.timedelta(days=1), scores(10))
+    monkeypatch.undo()
+
+    reopened = ScoreHistory(path)
+    assert reopened.index['capacity'] == 4
+    assert reopened.history('T2').tolist() == [3.0]
+    # The next growth overwrites the orphaned file and goes through
+    reopened.append(DAY + datetime.timedelta(days=1), scores(10))
+    assert ScoreHistory(path).history('T2').tolist() == [3.0, 3.0]
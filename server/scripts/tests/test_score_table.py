@@ -0,0 +1,41 @@
+import numpy as np
+
+from score_table import HeadlineTable, latest_snapshot, rolling_scores
+
+
+def entry(headline, sentiment, date='2023-07-12T10:00:00Z', ticker='AAPL'):
+    return {'News headline': headline, 'Ticker': ticker, 'Stock name': ticker, 'Sentiment': sentiment, 'Date': date}
+
+
+def test_undated_records_are_skipped():
+    table = HeadlineTable.from_records([
+        entry('Apple beats', 'YES'),
+        entry('Apple misses', 'NO', date=None),
+        entry('Apple probe', 'NO', date='not a date'),
+    ])
+    assert len(table) == 1
+    assert table.day.min() > 0
+
+
+def test_stories_count_once_per_stock():
+    table = HeadlineTable.from_records([
+        entry('Apple beats', 'YES'),
+        entry('Apple beats', 'YES'),
+        entry('Apple beats', 'YES', ticker='MSFT'),
+    ])
+    assert len(table) == 2
+    assert sorted(table.tickers.tolist()) == ['AAPL', 'MSFT']
+
+
+def test_rolling_ratio_over_a_window():
+    table = HeadlineTable.from_records([
+        entry('Apple beats', 'YES', '2023-07-10T10:00:00Z'),
+        entry('Apple misses', 'NO', '2023-07-11T10:00:00Z'),
+        entry('Apple soars', 'YES', '2023-07-12T10:00:00Z'),
+    ])
+    scores = rolling_scores(table, windows=(1, 7))
+    code = table.code('AAPL')
+    assert scores['days'] == 3
+    assert scores['ratio'][1][code].tolist() == [1.0, 0.0, 1.0]
+    assert np.allclose(scores['ratio'][7][code], [1.0, 0.5, 2 / 3])
+    assert latest_snapshot(table, scores)[0]['count_7d'] == 3
@@ -0,0 +1,43 @@
+from sentiment_batch import BatchClassifier, build_batch_prompt, item_tag, parse_batch_reply
+
+
+def article(number, ticker='AAPL', headline=None):
+    return {'Id': f'id{number}', 'News headline': headline or f'Headline {number}', 'Ticker': ticker,
+            'Stock name': ticker}
+
+
+ARTICLES = [article(1), article(2), article(3)]
+
+
+def test_batch_prompt_lists_every_article():
+    prompt = build_batch_prompt(ARTICLES)
+    assert prompt.splitlines()[-3:] == [f'{number}|{item_tag(a)}|AAPL|Headline {number}'
+                                        for number, a in enumerate(ARTICLES, start=1)]
+
+
+def test_batch_reply_matched_by_tag_then_number():
+    reply = '\n'.join([
+        'Here are the answers:',
+        f'1|{item_tag(ARTICLES[2])}|YES|Strong quarter.',
+        '2. NO - Weak guidance.',
+        f'3|{item_tag(ARTICLES[2])}|NO|Second answer for the same headline is ignored.',
+        '7|UNKNOWN|Out of range.',
+    ])
+    assert parse_batch_reply(reply, ARTICLES) == {2: ('YES', 'Strong quarter.'), 1: ('NO', 'Weak guidance.')}
+    assert parse_batch_reply(None, ARTICLES) == {}
+
+
+def test_batch_classifier_requeues_then_falls_back():
+    prompts = []
+
+    def complete(prompt, max_tokens):
+        prompts.append(prompt)
+        # Only the first headline is ever answered
+        return f'1|{item_tag(ARTICLES[0])}|yes|Good.' if item_tag(ARTICLES[0]) in prompt else 'Sorry.'
+
+    classifier = BatchClassifier(complete, batch_size=2, max_rounds=2, fallback=lambda headline: ('NO', headline))
+    verdicts = classifier.classify(ARTICLES)
+    assert verdicts == {0: ('YES', 'Good.'), 1: ('NO', 'Headline 2'), 2: ('NO', 'Headline 3')}
+    # Round 1 sends two batches, round 2 the two missing headlines, then one fallback request each
+    assert len(prompts) == 3
+    assert classifier.requests == 5
@@ -0,0 +1,73 @@
+import sqlite3
+
+from sentiment_cache import SentimentCache, classify_with_cache
+
+
+def article(headline, ticker):
+    return {'News headline': headline, 'Ticker': ticker, 'Stock name': ticker}
+
+
+class Classifier:
+    """Per-ticker verdicts like the fan-in prompt gives; records what it was asked."""
+
+    def __init__(self, verdicts):
+        self.verdicts = verdicts
+        self.calls = []
+
+    def __call__(self, articles):
+        self.calls.append([(a['News headline'], a['Ticker']) for a in articles])
+        return {index: self.verdicts.get(a['Ticker']) for index, a in enumerate(articles)}
+
+
+def test_shared_headline_keeps_a_verdict_per_ticker(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    articles = [article('Apple wins a contract over Microsoft', 'AAPL'),
+                article('Apple wins a contract over Microsoft', 'MSFT')]
+    classify = Classifier({'AAPL': ('YES', 'Good for Apple.'), 'MSFT': ('NO', 'Bad for Microsoft.')})
+    first = classify_with_cache(SentimentCache(path, 'model', '1'), articles, classify)
+    assert first == {0: ('YES', 'Good for Apple.'), 1: ('NO', 'Bad for Microsoft.')}
+
+    cache = SentimentCache(path, 'model', '1')
+    again = classify_with_cache(cache, articles, Classifier({}))
+    assert again == first
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_only_missing_tickers_are_sent(tmp_path):
+    cache = SentimentCache(str(tmp_path / 'cache.sqlite3'), 'model', '1')
+    classify_with_cache(cache, [article('Chip stocks rally', 'NVDA')], Classifier({'NVDA': ('YES', '')}))
+    classify = Classifier({'AMD': ('YES', '')})
+    verdicts = classify_with_cache(cache, [article('chip  stocks rally', 'NVDA'), article('Chip stocks rally', 'AMD')],
+                                   classify)
+    assert classify.calls == [[('Chip stocks rally', 'AMD')]]
+    assert verdicts == {0: ('YES', ''), 1: ('YES', '')}
+
+
+def test_model_and_prompt_version_separate_verdicts(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    SentimentCache(path, 'model', '1').put_many({('Headline', 'AAPL'): ('YES', '')})
+    assert SentimentCache(path, 'model', '2').get_many([('Headline', 'AAPL')]) == {}
+    assert SentimentCache(path, 'other', '1').get_many([('Headline', 'AAPL')]) == {}
+    assert SentimentCache(path, 'model', '1').get_many([('Headline', 'AAPL')]) == {('Headline', 'AAPL'): ('YES', '')}
+
+
+def test_cache_without_tickers_is_dropped(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE verdicts (headline_hash TEXT, model TEXT, prompt_version TEXT, sentiment TEXT, "
+                       "description TEXT, created_at REAL, PRIMARY KEY (headline_hash, model, prompt_version))")
+    connection.commit()
+    connection.close()
+    cache = SentimentCache(path, 'model', '1')
+    cache.put_many({('Headline', 'AAPL'): ('NO', '')})
+    assert cache.get_many([('Headline', 'AAPL'), ('Headline', 'MSFT')]) == {('Headline', 'AAPL'): ('NO', '')}
+
+
+def test_evict_drops_old_verdicts(tmp_path, monkeypatch):
+    cache = SentimentCache(str(tmp_path / 'cache.sqlite3'), 'model', '1')
+    monkeypatch.setattr('sentiment_cache.time.time', lambda: 0.0)
+    cache.put_many({('Old', 'AAPL'): ('YES', '')})
+    monkeypatch.setattr('sentiment_cache.time.time', lambda: 100 * 86400.0)
+    cache.put_many({('New', 'AAPL'): ('YES', '')})
+    assert cache.evict(90) == 1
+    assert list(cache.get_many([('Old', 'AAPL'), ('New', 'AAPL')])) == [('New', 'AAPL')]
@@ -0,0 +1,30 @@
+import pytest
+
+from request_driver import AIMDLimiter, RequestDriver
+from sentiment_claude5 import SentimentAnalyzer
+
+
+class BrokenProvider:
+    name = 'broken'
+    model = 'broken'
+    max_output_tokens = None
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, text, max_tokens=None):
+        self.calls += 1
+        raise ConnectionError('connection reset')
+
+
+def test_provider_errors_reach_the_driver_as_failures():
+    provider = BrokenProvider()
+    analyzer = SentimentAnalyzer(provider=provider)
+    with pytest.raises(ConnectionError):
+        analyzer.complete('Apple beats estimates')
+
+    limiter = AIMDLimiter(initial=4)
+    with RequestDriver(limiter, max_attempts=2, backoff=0) as driver:
+        assert driver.call(analyzer.classify_headline, 'Apple beats estimates') is None
+    assert provider.calls == 3
+    assert limiter.limit == 4
@@ -0,0 +1,41 @@
+from sentiment_fanin import FanInClassifier, group_by_headline, group_tag, parse_fanin_reply
+
+
+def article(number, ticker='AAPL', headline=None):
+    return {'Id': f'id{number}', 'News headline': headline or f'Headline {number}', 'Ticker': ticker,
+            'Stock name': ticker}
+
+
+def test_fanin_groups_copies_of_a_headline():
+    news = [article(1, 'AAPL', 'Tech stocks rally'), article(2, 'MSFT', 'TECH  stocks rally'),
+            article(3, 'AAPL', 'Apple recalls phones'), article(4, 'AAPL', 'Tech stocks rally')]
+    groups = group_by_headline(news)
+    assert [(group['Tickers'], group['members']) for group in groups] == [(['AAPL', 'MSFT'], [0, 1, 3]),
+                                                                          (['AAPL'], [2])]
+
+
+def test_fanin_reply_needs_every_ticker():
+    groups = group_by_headline([article(1, 'AAPL', 'Tech stocks rally'), article(2, 'MSFT', 'Tech stocks rally'),
+                                article(3, 'AAPL', 'Apple recalls phones')])
+    reply = '\n'.join([
+        f'1|{group_tag(groups[0])}|AAPL|YES|Good for Apple.',
+        f'2|{group_tag(groups[1])}|Apple Inc|NO|Recall costs.',
+        '1|aapl|UNKNOWN|No ticker column.',
+    ])
+    # The first group lacks MSFT; the lone ticker of the second may be spelled differently
+    assert parse_fanin_reply(reply, groups) == {1: {'AAPL': ('NO', 'Recall costs.')}}
+    reply += f'\n1|{group_tag(groups[0])}|msft|NO|Bad for Microsoft.'
+    assert parse_fanin_reply(reply, groups)[0] == {'AAPL': ('YES', 'Good for Apple.'), 'MSFT': ('NO', 'Bad for Microsoft.')}
+
+
+def test_fanin_classifier_copies_verdicts_to_every_record():
+    news = [article(1, 'AAPL', 'Tech stocks rally'), article(2, 'MSFT', 'Tech stocks rally'),
+            article(3, 'AAPL', 'Tech stocks rally')]
+    tag = group_tag(group_by_headline(news)[0])
+
+    def complete(prompt, max_tokens):
+        return f'1|{tag}|AAPL|YES|Up.\n1|{tag}|MSFT|NO|Down.'
+
+    classifier = FanInClassifier(complete, batch_size=10)
+    assert classifier.classify(news) == {0: ('YES', 'Up.'), 1: ('NO', 'Down.'), 2: ('YES', 'Up.')}
+    assert classifier.requests == 1
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sentiment_providers import Backend, NoBackendAvailable, WeightedRouter, normalize_reply
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+class FakeProvider:
+    name = 'fake'
+    model = 'fake-1'
+    max_output_tokens = None
+
+    def __init__(self, answer=None, error=None):
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+
+    def complete(self, text, max_tokens=100):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.answer
+
+
+def test_importing_needs_no_provider_sdk():
+    code = ('import sys, sentiment_providers; '
+            'print(sorted(name for name in ("anthropic", "openai", "vertexai") if name in sys.modules))')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert output.strip() == '[]'
+
+
+def test_normalize_reply():
+    assert normalize_reply('Yes. Record sales lift the outlook.') == ('YES', 'Record sales lift the outlook.')
+    assert normalize_reply('maybe') == ('UNKNOWN', 'maybe')
+
+
+def test_router_fails_over_to_a_working_backend():
+    broken, working = FakeProvider(error=Throttled()), FakeProvider('NO - weak guidance')
+    router = WeightedRouter([Backend(broken, label='broken'), Backend(working, label='working')], seed=1)
+    for _ in range(3):
+        assert router.complete('headline') == 'NO - weak guidance'
+    assert broken.calls <= 1 and working.calls == 3
+
+
+def test_no_backend_reports_the_earliest_recovery():
+    router = WeightedRouter([Backend(FakeProvider(error=Throttled()), label='a'),
+                             Backend(FakeProvider(error=Throttled()), label='b')])
+    with pytest.raises(NoBackendAvailable) as first:
+        router.complete('headline')
+    # Both backends failed once: each cools down for two seconds
+    assert first.value.retry_after == pytest.approx(2.0, abs=0.5)
+    with pytest.raises(NoBackendAvailable) as second:
+        router.complete('headline')
+    assert second.value.retry_after == pytest.approx(2.0, abs=0.5)
+
+
+def test_errors_are_raised_once_every_backend_failed():
+    router = WeightedRouter([Backend(FakeProvider(error=ValueError('bad key')))])
+    with pytest.raises(ValueError):
+        router.complete('headline')
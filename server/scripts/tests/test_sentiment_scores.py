@@ -0,0 +1,81 @@
+import pytest
+
+from sentiment_scores import DecayedScoreAggregator
+
+
+DAY = 86400
+
+
+def entry(number, sentiment, day, ticker='AAPL'):
+    return {'Id': f'id{number}', 'News headline': f'Headline {number}', 'Ticker': ticker, 'Stock name': ticker,
+            'Sentiment': sentiment, 'Date': 1688990400 + day * DAY}
+
+
+@pytest.fixture
+def state(tmp_path):
+    return str(tmp_path / 'scores.sqlite3')
+
+
+def scores_by_ticker(aggregator, now=None):
+    # As of the newest headline unless told otherwise: the entries are from 2023
+    return {record['Ticker']: record for record in aggregator.results(now=now or aggregator.latest)}
+
+
+def test_recent_stories_weigh_more(state):
+    aggregator = DecayedScoreAggregator(state, half_lives=(1.0, 1000.0))
+    aggregator.add(entry(1, 'NO', 0))
+    aggregator.add(entry(2, 'YES', 1))
+    record = scores_by_ticker(aggregator)['AAPL']
+    # One half-life later the old NO weighs half as much as the new YES
+    assert record['Score'] == pytest.approx(100 / 1.5, abs=0.01)
+    assert record['Scores']['1000d'] == pytest.approx(50, abs=0.1)
+    aggregator.close()
+
+
+def test_each_story_counts_once_across_runs(state):
+    aggregator = DecayedScoreAggregator(state, half_lives=(7.0,))
+    assert aggregator.add(entry(1, 'YES', 0))
+    assert not aggregator.add(entry(1, 'YES', 0))
+    assert not aggregator.add({'News headline': 'No ticker', 'Sentiment': 'YES'})
+    aggregator.save()
+    aggregator.close()
+
+    reopened = DecayedScoreAggregator(state, half_lives=(7.0,))
+    assert not reopened.add(entry(1, 'YES', 0))
+    assert reopened.add(entry(2, 'NO', 0))
+    assert scores_by_ticker(reopened)['AAPL']['Score'] == 50.0
+    reopened.close()
+
+
+def test_stocks_without_positive_stories_are_not_listed(state):
+    aggregator = DecayedScoreAggregator(state, half_lives=(7.0,))
+    aggregator.add(entry(1, 'NO', 0, 'MSFT'))
+    aggregator.add(entry(2, 'YES', 0, 'AAPL'))
+    assert list(scores_by_ticker(aggregator)) == ['AAPL']
+    aggregator.close()
+
+
+def test_old_stories_are_ignored_and_pruned(state):
+    aggregator = DecayedScoreAggregator(state, half_lives=(1.0,))
+    aggregator.add(entry(1, 'YES', 0, 'MSFT'))
+    aggregator.add(entry(2, 'YES', 100, 'AAPL'))
+    # Older than RETENTION_HALF_LIVES half-lives before the newest headline
+    assert not aggregator.add(entry(3, 'NO', 50, 'AAPL'))
+    aggregator.save()
+    assert list(scores_by_ticker(aggregator)) == ['AAPL']
+    assert aggregator.connection.execute("SELECT COUNT(*) FROM seen").fetchone()[0] == 1
+    aggregator.close()
+
+
+def test_stale_tickers_are_dropped_as_of_the_run(state):
+    aggregator = DecayedScoreAggregator(state, half_lives=(7.0,))
+    aggregator.add(entry(1, 'YES', 0, 'MSFT'))
+    aggregator.add(entry(2, 'YES', 20, 'AAPL'))
+    # MSFT's lone YES is 20 days (almost three half-lives) older than the run
+    records = scores_by_ticker(aggregator, now=aggregator.latest)
+    assert list(records) == ['AAPL']
+    assert records['AAPL']['Score'] == 100.0
+    assert list(scores_by_ticker(aggregator, now=aggregator.latest + 7 * DAY)) == ['AAPL']
+    assert scores_by_ticker(aggregator, now=aggregator.latest + 14 * DAY)['AAPL']['Weight'] == 0.25
+    assert scores_by_ticker(aggregator, now=aggregator.latest + 15 * DAY) == {}
+    aggregator.close()
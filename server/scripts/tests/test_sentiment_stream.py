@@ -0,0 +1,101 @@
+import json
+
+from sentiment_stream import ScoreAccumulator, iter_json_records, recover_results, stream_sentiment
+
+
+class FakeAnalyzer:
+    """Answers YES for even ids and NO for odd ones; fails on the ids in `failing`."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.seen = []
+
+    def process_news(self, news, **options):
+        results = []
+        for article in news:
+            self.seen.append(article['Id'])
+            if article['Id'] in self.failing:
+                continue
+            results.append(dict(article, Sentiment='YES' if int(article['Id']) % 2 == 0 else 'NO'))
+        return results
+
+
+def article(number, ticker='AAPL'):
+    return {'Id': str(number), 'News headline': f'Headline {number}', 'Ticker': ticker, 'Stock name': ticker}
+
+
+def keys(*ids, ticker='AAPL'):
+    return {(ticker, identifier) for identifier in ids}
+
+
+def write_news(path, records):
+    path.write_text(json.dumps(records))
+    return str(path)
+
+
+def test_stream_reports_only_classified_ids(tmp_path):
+    news = write_news(tmp_path / 'news.json', [article(number) for number in range(6)])
+    classified_ids = set()
+    classified = stream_sentiment(FakeAnalyzer(failing={'3'}), news, str(tmp_path / 'results.ndjson'),
+                                  str(tmp_path / 'scores.json'), chunk_size=4, classified_ids=classified_ids)
+    assert classified == 5
+    assert classified_ids == keys('0', '1', '2', '4', '5')
+
+
+def test_stream_counts_earlier_results_as_classified(tmp_path):
+    news = write_news(tmp_path / 'news.json', [article(number) for number in range(4)])
+    results, scores = str(tmp_path / 'results.ndjson'), str(tmp_path / 'scores.json')
+    stream_sentiment(FakeAnalyzer(failing={'2'}), news, results, scores, chunk_size=2)
+    analyzer = FakeAnalyzer()
+    classified_ids = set()
+    assert stream_sentiment(analyzer, news, results, scores, chunk_size=2, classified_ids=classified_ids) == 1
+    assert analyzer.seen == ['2']
+    assert classified_ids == keys('0', '1', '2', '3')
+
+
+def test_iter_json_records_across_reads(tmp_path):
+    records = [{'Id': str(number), 'News headline': 'x' * number, 'Score': number / 3} for number in range(50)]
+    path = write_news(tmp_path / 'news.json', records)
+    assert list(iter_json_records(path, read_size=7)) == records
+    ndjson = tmp_path / 'news.ndjson'
+    ndjson.write_text('\n'.join(json.dumps(record) for record in records) + '\n')
+    assert list(iter_json_records(str(ndjson), read_size=7)) == records
+    empty = write_news(tmp_path / 'empty.json', [])
+    assert list(iter_json_records(empty)) == []
+
+
+def test_recover_results_truncates_a_cut_record(tmp_path):
+    path = tmp_path / 'results.ndjson'
+    complete = [dict(article(number), Sentiment='YES') for number in range(2)]
+    lines = ''.join(json.dumps(record) + '\n' for record in complete)
+    path.write_text(lines + '{"Id": "2", "News hea')
+    accumulator = ScoreAccumulator()
+    assert recover_results(str(path), accumulator) == keys('0', '1')
+    assert path.read_text() == lines
+    assert accumulator.results()[0]['Score'] == 100.0
+    assert recover_results(str(tmp_path / 'missing.ndjson'), ScoreAccumulator()) == set()
+
+
+def test_stream_resumes_after_a_crash(tmp_path):
+    news = write_news(tmp_path / 'news.json', [article(number) for number in range(4)])
+    results, scores = tmp_path / 'results.ndjson', str(tmp_path / 'scores.json')
+    results.write_text(json.dumps(dict(article(0), Sentiment='YES')) + '\n{"Id": "1"')
+    analyzer = FakeAnalyzer()
+    assert stream_sentiment(analyzer, news, str(results), scores, chunk_size=2) == 3
+    assert analyzer.seen == ['1', '2', '3']
+    assert [json.loads(line)['Id'] for line in results.read_text().splitlines()] == ['0', '1', '2', '3']
+    assert json.loads((tmp_path / 'scores.json').read_text())[0]['Score'] == 50.0
+
+
+def test_a_headline_is_resumed_per_ticker(tmp_path):
+    # The collector gives a headline the same Id for every ticker it was found for
+    news = write_news(tmp_path / 'news.json', [article(0), article(0, 'MSFT'), article(1)])
+    results, scores = tmp_path / 'results.ndjson', str(tmp_path / 'scores.json')
+    results.write_text(json.dumps(dict(article(0), Sentiment='YES')) + '\n')
+    analyzer = FakeAnalyzer()
+    classified_ids = set()
+    assert stream_sentiment(analyzer, news, str(results), scores, chunk_size=5, classified_ids=classified_ids) == 2
+    assert analyzer.seen == ['0', '1']
+    assert [(record['Ticker'], record['Id']) for record in map(json.loads, results.read_text().splitlines())] == [
+        ('AAPL', '0'), ('MSFT', '0'), ('AAPL', '1')]
+    assert classified_ids == keys('0', '1') | keys('0', ticker='MSFT')
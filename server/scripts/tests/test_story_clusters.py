@@ -0,0 +1,64 @@
+import numpy as np
+
+import story_clusters
+from news_records import without_story
+from story_clusters import assign_stories, cluster_headlines, spread_story_verdicts
+
+
+def article(number, headline, ticker='AAPL'):
+    return {'Id': f'id{number}', 'News headline': headline, 'Ticker': ticker, 'Stock name': ticker}
+
+
+def test_syndicated_copies_merge_into_one_story():
+    labels, representatives = cluster_headlines([
+        'Apple shares jump after record iPhone sales - Reuters',
+        'Apple shares jump after record iPhone sales | Barron\'s',
+        'Apple shares jump after record iPhone sales, analysts say',
+        'Federal Reserve holds interest rates steady',
+    ])
+    assert labels[0] == labels[1] == labels[2] != labels[3]
+    assert len(representatives) == 2
+    assert representatives[labels[3]] == 3
+
+
+def test_stories_never_span_groups():
+    headlines = ['Stock outperforms market on strong trading day'] * 3
+    labels, _ = cluster_headlines(headlines, groups=['AAPL', 'MSFT', 'AAPL'])
+    assert labels[0] == labels[2] != labels[1]
+
+
+def test_pairs_are_only_compared_within_a_group(monkeypatch):
+    sizes = []
+    similar_pairs = story_clusters.similar_pairs
+
+    def recording(matrix, *args):
+        sizes.append(matrix.shape[0])
+        return similar_pairs(matrix, *args)
+
+    monkeypatch.setattr(story_clusters, 'similar_pairs', recording)
+    groups = ['AAPL', 'MSFT', 'AAPL', 'TSLA', 'MSFT', 'AAPL']
+    labels, _ = cluster_headlines([f'Headline number {n}' for n in range(6)], groups=groups)
+    # One product per ticker with several headlines; TSLA's lone headline is not compared at all
+    assert sorted(sizes) == [2, 3]
+    assert len(np.unique(labels)) == 6
+
+
+def test_verdict_is_copied_to_every_copy():
+    news = [
+        article(1, 'Apple shares jump after record iPhone sales - Reuters'),
+        article(2, 'Tesla recalls vehicles over brake issue', 'TSLA'),
+        article(3, 'Apple shares jump after record iPhone sales | MarketWatch'),
+        article(4, 'Apple shares jump after record iPhone sales - Reuters', 'MSFT'),
+    ]
+    representatives = assign_stories(news)
+    assert [entry['Id'] for entry in representatives] == ['id1', 'id2', 'id4']
+    assert news[0]['Story'] == news[2]['Story'] != news[3]['Story']
+
+    classified = [dict(representatives[0], Sentiment='YES', Description='Strong sales.'),
+                  dict(representatives[2], Sentiment='NO', Description='Bad for rivals.')]
+    results = spread_story_verdicts(news, classified)
+    assert [(entry['Id'], entry['Sentiment']) for entry in results] == [('id1', 'YES'), ('id3', 'YES'),
+                                                                        ('id4', 'NO')]
+    assert results[1]['Description'] == 'Strong sales.'
+    assert 'Story' not in without_story(results[1])
+    assert without_story(results[1])['Sentiment'] == 'YES'
@@ -0,0 +1,63 @@
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+
+const {
+  collectPrioritySymbols,
+  writeSentimentPriorityList,
+} = require('../sentimentPriorityService');
+
+describe('sentimentPriorityService', () => {
+  it('separates held symbols from strategy symbols', () => {
+    const result = collectPrioritySymbols([
+      {
+        stocks: [
+          { symbol: 'aapl', quantity: 3 },
+          { symbol: 'MSFT', quantity: 0 },
+        ],
+        targetPositions: [{ symbol: 'NVDA' }, { symbol: 'AAPL' }],
+      },
+      {
+        stocks: [{ symbol: ' tsla ', quantity: 1 }],
+        composerHoldings: [{ symbol: 'SPY' }, { symbol: '' }],
+      },
+    ]);
+
+    expect(result).toEqual({
+      held: ['AAPL', 'TSLA'],
+      strategies: ['NVDA', 'SPY'],
+    });
+  });
+
+  it('leaves out the targets of portfolios whose strategy is gone', () => {
+    const result = collectPrioritySymbols([
+      { strategy_id: 's1', stocks: [{ symbol: 'AAPL', quantity: 1 }], targetPositions: [{ symbol: 'NVDA' }] },
+      { strategy_id: 'deleted', stocks: [{ symbol: 'TSLA', quantity: 2 }], composerHoldings: [{ symbol: 'SPY' }] },
+      { targetPositions: [{ symbol: 'QQQ' }] },
+    ], new Set(['s1']));
+
+    expect(result).toEqual({
+      held: ['AAPL', 'TSLA'],
+      strategies: ['NVDA'],
+    });
+  });
+
+  it('writes the priority list for the sentiment scripts', async () => {
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'sentiment-priority-'));
+    const filePath = path.join(dir, 'sentimentPriority.json');
+    const portfolios = [
+      { strategy_id: 's1', stocks: [{ symbol: 'AMD', quantity: 2 }], targetPositions: [{ symbol: 'META' }] },
+      { strategy_id: 's2', targetPositions: [{ symbol: 'GOOG' }] },
+    ];
+    const portfolioModel = { find: jest.fn(() => ({ lean: async () => portfolios })) };
+    const strategyModel = { find: jest.fn(() => ({ lean: async () => [{ strategy_id: 's1' }] })) };
+
+    const priorityList = await writeSentimentPriorityList({ filePath, portfolioModel, strategyModel });
+
+    const written = JSON.parse(fs.readFileSync(filePath, 'utf8'));
+    expect(written).toEqual(priorityList);
+    expect(written.held).toEqual(['AMD']);
+    expect(written.strategies).toEqual(['META']);
+    expect(fs.existsSync(`${filePath}.tmp`)).toBe(false);
+  });
+});
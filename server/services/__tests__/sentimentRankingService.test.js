@@ -0,0 +1,67 @@
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+
+const { getTopSentimentAssets, readSentimentRanking } = require('../sentimentRankingService');
+
+const writeJson = (filePath, data, mtime) => {
+  fs.writeFileSync(filePath, JSON.stringify(data));
+  fs.utimesSync(filePath, mtime, mtime);
+};
+
+describe('sentimentRankingService', () => {
+  let dir;
+  let rankingPath;
+  let scoresPath;
+
+  beforeEach(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'sentiment-ranking-'));
+    rankingPath = path.join(dir, 'scoreRanking.json');
+    scoresPath = path.join(dir, 'scoreResults.json');
+    writeJson(scoresPath, [
+      { Ticker: 'AAPL', Score: 40 },
+      { Ticker: 'MSFT', Score: 70 },
+      { Ticker: 'NVDA', Score: 55 },
+    ], 1000);
+  });
+
+  it('falls back to sorting the score file when no ranking is published', () => {
+    const assets = getTopSentimentAssets({ count: 2, rankingPath, scoresPath });
+    expect(assets.map((asset) => asset.Ticker)).toEqual(['MSFT', 'NVDA']);
+  });
+
+  it('reads the published ranking and picks up a new generation', () => {
+    writeJson(rankingPath, {
+      generation: 1,
+      k: 2,
+      universes: { all: [{ Ticker: 'MSFT', Score: 70 }, { Ticker: 'NVDA', Score: 55 }], held: [{ Ticker: 'AAPL', Score: 40 }] },
+    }, 1000);
+
+    expect(getTopSentimentAssets({ count: 1, rankingPath, scoresPath })).toEqual([{ Ticker: 'MSFT', Score: 70 }]);
+    expect(getTopSentimentAssets({ count: 1, universe: 'held', rankingPath, scoresPath })[0].Ticker).toBe('AAPL');
+
+    writeJson(rankingPath, {
+      generation: 2,
+      k: 2,
+      universes: { all: [{ Ticker: 'TSLA', Score: 90 }, { Ticker: 'MSFT', Score: 70 }] },
+    }, 2000);
+
+    expect(readSentimentRanking({ rankingPath }).generation).toBe(2);
+    expect(getTopSentimentAssets({ count: 1, rankingPath, scoresPath })[0].Ticker).toBe('TSLA');
+  });
+
+  it('sorts the score file when more assets are asked than the ranking holds', () => {
+    writeJson(rankingPath, { generation: 1, k: 1, universes: { all: [{ Ticker: 'MSFT', Score: 70 }] } }, 1000);
+    const assets = getTopSentimentAssets({ count: 3, rankingPath, scoresPath });
+    expect(assets.map((asset) => asset.Ticker)).toEqual(['MSFT', 'NVDA', 'AAPL']);
+  });
+
+  it('picks up a new generation written with the same mtime and size', () => {
+    writeJson(rankingPath, { generation: 11, k: 1, universes: { all: [{ Ticker: 'MSFT', Score: 70 }] } }, 1000);
+    expect(getTopSentimentAssets({ count: 1, rankingPath, scoresPath })[0].Ticker).toBe('MSFT');
+
+    writeJson(rankingPath, { generation: 12, k: 1, universes: { all: [{ Ticker: 'NVDA', Score: 55 }] } }, 1000);
+    expect(getTopSentimentAssets({ count: 1, rankingPath, scoresPath })[0].Ticker).toBe('NVDA');
+    expect(readSentimentRanking({ rankingPath }).generation).toBe(12);
+  });
+});
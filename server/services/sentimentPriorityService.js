@@ -0,0 +1,74 @@
+const fs = require('fs');
+const path = require('path');
+const Portfolio = require('../models/portfolioModel');
+const Strategy = require('../models/strategyModel');
+
+// Read by scripts/sentiment_priority.py to score exposed tickers first.
+const DEFAULT_PRIORITY_PATH = path.join(__dirname, '..', 'data', 'sentimentPriority.json');
+
+const normalizeSymbol = (value) => String(value || '').trim().toUpperCase();
+
+// A portfolio's strategy is active while its Strategy document exists; deleting a
+// strategy leaves its portfolio's last targets behind. Without the ids every
+// portfolio counts.
+const collectPrioritySymbols = (portfolios = [], activeStrategyIds = null) => {
+  const held = new Set();
+  const strategies = new Set();
+
+  for (const portfolio of portfolios || []) {
+    for (const stock of portfolio?.stocks || []) {
+      const symbol = normalizeSymbol(stock?.symbol);
+      if (symbol && Number(stock?.quantity) !== 0) {
+        held.add(symbol);
+      }
+    }
+    if (activeStrategyIds && !activeStrategyIds.has(String(portfolio?.strategy_id || ''))) {
+      continue;
+    }
+    for (const position of [...(portfolio?.targetPositions || []), ...(portfolio?.composerHoldings || [])]) {
+      const symbol = normalizeSymbol(position?.symbol);
+      if (symbol) {
+        strategies.add(symbol);
+      }
+    }
+  }
+
+  return {
+    held: [...held].sort(),
+    strategies: [...strategies].filter((symbol) => !held.has(symbol)).sort(),
+  };
+};
+
+const buildSentimentPriorityList = async ({ portfolioModel = Portfolio, strategyModel = Strategy } = {}) => {
+  const [portfolios, strategies] = await Promise.all([
+    portfolioModel
+      .find({}, { strategy_id: 1, stocks: 1, targetPositions: 1, composerHoldings: 1 })
+      .lean(),
+    strategyModel.find({}, { strategy_id: 1 }).lean(),
+  ]);
+  const activeStrategyIds = new Set(strategies.map((strategy) => String(strategy.strategy_id)));
+  return {
+    generatedAt: new Date().toISOString(),
+    ...collectPrioritySymbols(portfolios, activeStrategyIds),
+  };
+};
+
+const writeSentimentPriorityList = async ({
+  filePath = DEFAULT_PRIORITY_PATH,
+  portfolioModel = Portfolio,
+  strategyModel = Strategy,
+} = {}) => {
+  const priorityList = await buildSentimentPriorityList({ portfolioModel, strategyModel });
+  // Write then rename so the Python side never reads half a file.
+  const tempPath = `${filePath}.tmp`;
+  await fs.promises.writeFile(tempPath, JSON.stringify(priorityList));
+  await fs.promises.rename(tempPath, filePath);
+  return priorityList;
+};
+
+module.exports = {
+  DEFAULT_PRIORITY_PATH,
+  collectPrioritySymbols,
+  buildSentimentPriorityList,
+  writeSentimentPriorityList,
+};
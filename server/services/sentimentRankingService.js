@@ -0,0 +1,86 @@
+const fs = require('fs');
+const path = require('path');
+
+// Published by scripts/score_ranking.py after every sentiment run.
+const DEFAULT_RANKING_PATH = path.join(__dirname, '..', 'data', 'scoreRanking.json');
+const DEFAULT_SCORES_PATH = path.join(__dirname, '..', 'data', 'scoreResults.json');
+
+// score_ranking.py writes the generation as the first key, so it can be read from the first bytes.
+const GENERATION_HEAD_BYTES = 64;
+const GENERATION_PATTERN = /^\{\s*"generation"\s*:\s*(\d+)/;
+
+// filePath -> { mtimeMs, size, data }, plus the generation for rankings
+const fileCache = new Map();
+
+// Re-read a JSON file only when its stat changed; the Python side swaps files in with a rename.
+const readJsonIfChanged = (filePath) => {
+  const stat = fs.statSync(filePath);
+  const cached = fileCache.get(filePath);
+  if (cached && cached.mtimeMs === stat.mtimeMs && cached.size === stat.size) {
+    return cached.data;
+  }
+  const data = JSON.parse(fs.readFileSync(filePath, 'utf8'));
+  fileCache.set(filePath, { mtimeMs: stat.mtimeMs, size: stat.size, data });
+  return data;
+};
+
+const readGeneration = (filePath) => {
+  const fd = fs.openSync(filePath, 'r');
+  try {
+    const head = Buffer.alloc(GENERATION_HEAD_BYTES);
+    const bytesRead = fs.readSync(fd, head, 0, GENERATION_HEAD_BYTES, 0);
+    const match = GENERATION_PATTERN.exec(head.toString('utf8', 0, bytesRead));
+    return match ? Number(match[1]) : null;
+  } finally {
+    fs.closeSync(fd);
+  }
+};
+
+// Re-read the ranking when its generation or its stat changed: two publications can share an mtime
+// and a size, and a ranking file written anew starts again from generation 1.
+const readRankingIfChanged = (filePath) => {
+  const stat = fs.statSync(filePath);
+  const generation = readGeneration(filePath);
+  const cached = fileCache.get(filePath);
+  if (cached && cached.generation === generation && cached.mtimeMs === stat.mtimeMs && cached.size === stat.size) {
+    return cached.data;
+  }
+  const data = JSON.parse(fs.readFileSync(filePath, 'utf8'));
+  fileCache.set(filePath, { generation, mtimeMs: stat.mtimeMs, size: stat.size, data });
+  return data;
+};
+
+const readSentimentRanking = ({ rankingPath = DEFAULT_RANKING_PATH } = {}) => {
+  try {
+    return readRankingIfChanged(rankingPath);
+  } catch (error) {
+    if (error.code !== 'ENOENT') {
+      console.warn(`[SentimentRanking] Unable to read ${rankingPath}: ${error.message}`);
+    }
+    return null;
+  }
+};
+
+const getTopSentimentAssets = ({
+  count = 5,
+  universe = 'all',
+  rankingPath = DEFAULT_RANKING_PATH,
+  scoresPath = DEFAULT_SCORES_PATH,
+} = {}) => {
+  const ranking = readSentimentRanking({ rankingPath });
+  const assets = ranking?.universes?.[universe];
+  if (Array.isArray(assets) && count <= Number(ranking.k)) {
+    return assets.slice(0, count);
+  }
+
+  // No ranking yet (or a deeper one is needed): sort the full score file.
+  const scores = readJsonIfChanged(scoresPath);
+  return [...scores].sort((a, b) => b.Score - a.Score).slice(0, count);
+};
+
+module.exports = {
+  DEFAULT_RANKING_PATH,
+  DEFAULT_SCORES_PATH,
+  readSentimentRanking,
+  getTopSentimentAssets,
+};
@@ -0,0 +1,64 @@
+const fs = require('fs');
+const path = require('path');
+
+const { isNewsColumnsBuffer, openNewsColumns } = require('../newsColumns');
+
+// Written by scripts/news_columns.py from three records.
+const FIXTURE_PATH = path.join(__dirname, 'fixtures', 'news.cols');
+// Written by scripts/news_columns.py from records with a null headline and a missing Description.
+const NULLS_FIXTURE_PATH = path.join(__dirname, 'fixtures', 'news-nulls.cols');
+// Written by scripts/news_columns.py from records with integer, boolean and number fields, some missing.
+const SCALARS_FIXTURE_PATH = path.join(__dirname, 'fixtures', 'news-scalars.cols');
+
+describe('newsColumns', () => {
+  it('recognizes columns files', () => {
+    expect(isNewsColumnsBuffer(fs.readFileSync(FIXTURE_PATH))).toBe(true);
+    expect(isNewsColumnsBuffer(Buffer.from('[{"Id": "a1"}]'))).toBe(false);
+  });
+
+  it('reads the records back as the JSON pipeline wrote them', () => {
+    const columns = openNewsColumns(FIXTURE_PATH);
+
+    expect(columns.rows).toBe(3);
+    expect(columns.records()).toEqual([
+      { Id: 'a1', 'News headline': 'Apple beats estimates', Date: '2023-07-10T12:00:00', Ticker: 'AAPL', 'Stock name': 'AAPL', Source: 'google_news', Sentiment: 'YES' },
+      { Id: 'b2', 'News headline': 'Microsoft déçoit', Date: '2023-07-11T08:30:15.250', Ticker: 'MSFT', 'Stock name': 'MSFT', Source: 'tickertick_news', Sentiment: 'NO' },
+      { Id: 'c3', 'News headline': 'Apple suppliers slip', Date: null, Ticker: 'AAPL', 'Stock name': 'AAPL', Source: 'google_news', Sentiment: null },
+    ]);
+  });
+
+  it('selects rows by dictionary value without decoding the other columns', () => {
+    const columns = openNewsColumns(FIXTURE_PATH);
+
+    expect(columns.values('Ticker')).toEqual(['AAPL', 'MSFT']);
+    expect(Array.from(columns.codes('Ticker'))).toEqual([0, 1, 0]);
+    expect(columns.rowsWhere('Ticker', 'AAPL')).toEqual([0, 2]);
+    expect(columns.rowsWhere('Ticker', 'TSLA')).toEqual([]);
+    expect(columns.timestamps()[0]).toBe(1688990400000n);
+    expect(columns.string('News headline', 2)).toBe('Apple suppliers slip');
+  });
+
+  it('reads null strings back as null, and empty strings as empty', () => {
+    const columns = openNewsColumns(NULLS_FIXTURE_PATH);
+
+    expect(columns.records()).toEqual([
+      { Id: 'a1', 'News headline': 'Apple beats estimates', Ticker: 'AAPL', Description: '' },
+      { Id: 'b2', 'News headline': null, Ticker: 'MSFT', Description: 'Empty, not missing' },
+      { Id: 'c3', 'News headline': 'Apple suppliers slip', Ticker: 'AAPL', Description: null },
+    ]);
+    expect(columns.isNull('News headline', 1)).toBe(true);
+    expect(columns.isNull('Id', 1)).toBe(false);
+  });
+
+  it('reads integers, booleans and numbers back with their type', () => {
+    const columns = openNewsColumns(SCALARS_FIXTURE_PATH);
+
+    expect(columns.records()).toEqual([
+      { Id: 'a1', n: 5, flag: true, score: 0.5 },
+      { Id: 'b2', n: null, flag: false, score: 2 },
+      { Id: 'c3', n: -7, flag: null, score: null },
+    ]);
+    expect(Array.from(columns.scalars('n'))).toEqual([5n, 0n, -7n]);
+    expect(columns.scalar('flag', 0)).toBe(true);
+  });
+});
@@ -0,0 +1,156 @@
+const fs = require('fs');
+
+// Reader for the news columns files written by scripts/news_columns.py.
+// Dictionary columns are Uint32Array codes into `values`, timestamps are
+// BigInt64Array milliseconds, int64/float64/bool columns are BigInt64Array,
+// Float64Array and Uint8Array values, strings are BigUint64Array offsets into a
+// UTF-8 heap. All but dictionary and timestamp columns may have a null bitmap
+// (bit i set, least significant first, when value i is null).
+const MAGIC = Buffer.from('NEWSCOL\x01', 'latin1');
+// Version 1 files only have dictionary, timestamp and strings columns
+const READABLE_VERSIONS = [1, 2];
+const NULL_TIMESTAMP = -(2n ** 63n);
+const BLOCK_TYPES = {
+  codes: Uint32Array,
+  offsets: BigUint64Array,
+  heap: Uint8Array,
+  nulls: Uint8Array,
+  values: BigInt64Array,
+  floats: Float64Array,
+  flags: Uint8Array,
+};
+// Block holding the values of each scalar column kind
+const SCALAR_BLOCKS = {
+  int64: 'values',
+  float64: 'floats',
+  bool: 'flags',
+};
+
+const isNewsColumnsBuffer = (buffer) => buffer.length >= MAGIC.length && buffer.subarray(0, MAGIC.length).equals(MAGIC);
+
+const openNewsColumns = (filePath) => {
+  let buffer = fs.readFileSync(filePath);
+  if (!isNewsColumnsBuffer(buffer)) {
+    throw new Error(`${filePath} is not a news columns file`);
+  }
+  // Typed arrays need aligned offsets; Buffers from the shared pool may not be.
+  if (buffer.byteOffset % 8 !== 0) {
+    buffer = Buffer.from(buffer);
+  }
+
+  const headerLength = buffer.readUInt32LE(MAGIC.length);
+  const headerStart = MAGIC.length + 4;
+  const header = JSON.parse(buffer.toString('utf8', headerStart, headerStart + headerLength));
+  if (!READABLE_VERSIONS.includes(header.version)) {
+    throw new Error(`Unsupported news columns version ${header.version} in ${filePath}`);
+  }
+  const columns = new Map(header.columns.map((column) => [column.name, column]));
+  const blocks = new Map();
+
+  const block = (name, kind) => {
+    const key = `${name}:${kind}`;
+    if (!blocks.has(key)) {
+      const column = columns.get(name);
+      if (!column || !column.blocks[kind]) {
+        throw new Error(`No ${kind} block for column "${name}"`);
+      }
+      const [offset, length] = column.blocks[kind];
+      const Type = BLOCK_TYPES[kind];
+      blocks.set(key, new Type(buffer.buffer, buffer.byteOffset + offset, length / Type.BYTES_PER_ELEMENT));
+    }
+    return blocks.get(key);
+  };
+
+  const isNull = (name, row) => {
+    if (!columns.get(name).blocks.nulls) {
+      return false;
+    }
+    return ((block(name, 'nulls')[row >> 3] >> (row & 7)) & 1) === 1;
+  };
+
+  const string = (name, row) => {
+    if (isNull(name, row)) {
+      return null;
+    }
+    const offsets = block(name, 'offsets');
+    const [heapOffset] = columns.get(name).blocks.heap;
+    return buffer.toString('utf8', heapOffset + Number(offsets[row]), heapOffset + Number(offsets[row + 1]));
+  };
+
+  const timestamp = (name, row) => {
+    const value = block(name, 'values')[row];
+    return value === NULL_TIMESTAMP ? null : new Date(Number(value)).toISOString().replace(/(\.000)?Z$/, '');
+  };
+
+  // int64 values beyond Number.MAX_SAFE_INTEGER lose precision; use scalars() for exact BigInts
+  const scalar = (name, row) => {
+    if (isNull(name, row)) {
+      return null;
+    }
+    const { kind } = columns.get(name);
+    const raw = block(name, SCALAR_BLOCKS[kind])[row];
+    if (kind === 'bool') {
+      return raw === 1;
+    }
+    return kind === 'int64' ? Number(raw) : raw;
+  };
+
+  const value = (name, row) => {
+    const column = columns.get(name);
+    if (column.kind === 'dictionary') {
+      return column.values[block(name, 'codes')[row]];
+    }
+    if (column.kind === 'timestamp') {
+      return timestamp(name, row);
+    }
+    if (SCALAR_BLOCKS[column.kind]) {
+      return scalar(name, row);
+    }
+    return string(name, row);
+  };
+
+  const rowsWhere = (name, wanted) => {
+    const code = columns.get(name).values.indexOf(wanted);
+    const rows = [];
+    if (code === -1) {
+      return rows;
+    }
+    const codes = block(name, 'codes');
+    for (let row = 0; row < codes.length; row += 1) {
+      if (codes[row] === code) {
+        rows.push(row);
+      }
+    }
+    return rows;
+  };
+
+  const record = (row) => {
+    const result = {};
+    for (const name of columns.keys()) {
+      result[name] = value(name, row);
+    }
+    return result;
+  };
+
+  return {
+    rows: header.rows,
+    columnNames: [...columns.keys()],
+    codes: (name) => block(name, 'codes'),
+    values: (name) => columns.get(name).values,
+    timestamps: (name = 'Date') => block(name, 'values'),
+    scalars: (name) => block(name, SCALAR_BLOCKS[columns.get(name).kind]),
+    isNull,
+    string,
+    scalar,
+    value,
+    rowsWhere,
+    record,
+    records: () => Array.from({ length: header.rows }, (_, row) => record(row)),
+  };
+};
+
+module.exports = {
+  MAGIC,
+  isNewsColumnsBuffer,
+  openNewsColumns,
+};